@@ -0,0 +1,205 @@
+"""Benchmark de contención lectura/escritura sobre SQLite.
+
+Compara el acceso actual (journal de rollback, una conexión por consulta y
+un commit por escritura) con el modo WAL + escritor único de models/database.py
+bajo una carga mixta de lectores y escritores concurrentes.
+
+Uso:
+    python benchmarks/bench_db_contention.py --filas 50000 --lectores 8 --escritores 4 --segundos 5
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import Database
+
+DEPARTAMENTOS = ["Ventas", "IT", "Marketing", "Finanzas", "Recursos Humanos"]
+CIUDADES = ["Ciudad de México", "Guadalajara", "Monterrey", "Puebla", "Tijuana"]
+NIVELES = ["Licenciatura", "Maestría", "Doctorado", "Técnico"]
+
+READ_QUERIES = [
+    ("SELECT COUNT(*) FROM empleados", ()),
+    ("SELECT AVG(edad), AVG(salario), AVG(experiencia_anos) FROM empleados", ()),
+    ("SELECT nombre, departamento, salario FROM empleados ORDER BY salario DESC LIMIT 1", ()),
+    ("SELECT COUNT(*) FROM empleados WHERE LOWER(departamento) = ?", ("ventas",)),
+]
+
+UPDATE_SQL = "UPDATE empleados SET salario = salario + 1 WHERE id = ?"
+
+def create_test_database(path, filas):
+    """Crear una base de datos de prueba con el esquema de empleados"""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE empleados (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT NOT NULL,
+            departamento TEXT NOT NULL,
+            salario INTEGER NOT NULL,
+            edad INTEGER NOT NULL,
+            ciudad TEXT NOT NULL,
+            experiencia_anos INTEGER NOT NULL,
+            nivel_educacion TEXT NOT NULL,
+            fecha_ingreso DATE NOT NULL
+        )
+    ''')
+    rng = random.Random(42)
+    conn.executemany(
+        "INSERT INTO empleados (nombre, departamento, salario, edad, ciudad, experiencia_anos, "
+        "nivel_educacion, fecha_ingreso) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            (f"Empleado {i}", rng.choice(DEPARTAMENTOS), rng.randint(25000, 90000), rng.randint(22, 55),
+             rng.choice(CIUDADES), rng.randint(0, 20), rng.choice(NIVELES), "2024-01-01")
+            for i in range(filas)
+        )
+    )
+    conn.commit()
+    conn.close()
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+class LegacyAccess:
+    """Patrón actual: conexión nueva por consulta y commit por escritura"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def read(self, sql, params):
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def write(self, sql, params):
+        conn = sqlite3.connect(self.path)
+        try:
+            conn.execute(sql, params)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def close(self):
+        pass
+
+class WALAccess:
+    """Lectores por hilo en WAL y escritor único con transacciones por lote"""
+
+    def __init__(self, path):
+        self.db = Database(path)
+        self.db.enable_wal()
+
+    def read(self, sql, params):
+        return self.db.reader().execute(sql, params).fetchall()
+
+    def write(self, sql, params):
+        self.db.execute(sql, params).result()
+
+    def close(self):
+        self.db.close()
+
+def run_mode(name, access, filas, lectores, escritores, segundos):
+    stop = threading.Event()
+    lock = threading.Lock()
+    results = {"lecturas": 0, "escrituras": 0, "errores_bloqueo": 0, "latencias_lectura": [], "latencias_escritura": []}
+
+    def reader_loop(seed):
+        rng = random.Random(seed)
+        latencies = []
+        count = errors = 0
+        while not stop.is_set():
+            sql, params = rng.choice(READ_QUERIES)
+            start = time.perf_counter()
+            try:
+                access.read(sql, params)
+                count += 1
+                latencies.append(time.perf_counter() - start)
+            except sqlite3.OperationalError:
+                errors += 1
+        with lock:
+            results["lecturas"] += count
+            results["errores_bloqueo"] += errors
+            results["latencias_lectura"].extend(latencies)
+
+    def writer_loop(seed):
+        rng = random.Random(seed)
+        latencies = []
+        count = errors = 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                access.write(UPDATE_SQL, (rng.randint(1, filas),))
+                count += 1
+                latencies.append(time.perf_counter() - start)
+            except sqlite3.OperationalError:
+                errors += 1
+        with lock:
+            results["escrituras"] += count
+            results["errores_bloqueo"] += errors
+            results["latencias_escritura"].extend(latencies)
+
+    threads = [threading.Thread(target=reader_loop, args=(i,)) for i in range(lectores)]
+    threads += [threading.Thread(target=writer_loop, args=(1000 + i,)) for i in range(escritores)]
+    for thread in threads:
+        thread.start()
+    time.sleep(segundos)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    access.close()
+
+    read_lat = results.pop("latencias_lectura")
+    write_lat = results.pop("latencias_escritura")
+    results.update({
+        "modo": name,
+        "lecturas_por_segundo": results["lecturas"] / segundos,
+        "escrituras_por_segundo": results["escrituras"] / segundos,
+        "lectura_p50_ms": percentile(read_lat, 0.50) * 1000,
+        "lectura_p99_ms": percentile(read_lat, 0.99) * 1000,
+        "escritura_p50_ms": percentile(write_lat, 0.50) * 1000,
+        "escritura_p99_ms": percentile(write_lat, 0.99) * 1000,
+    })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de contención SQLite (rollback vs WAL + escritor único)")
+    parser.add_argument("--filas", type=int, default=50000)
+    parser.add_argument("--lectores", type=int, default=8)
+    parser.add_argument("--escritores", type=int, default=4)
+    parser.add_argument("--segundos", type=float, default=5.0)
+    parser.add_argument("--json", action="store_true", help="Imprimir resultados como JSON")
+    args = parser.parse_args()
+
+    all_results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, access_cls in (("rollback", LegacyAccess), ("wal_escritor_unico", WALAccess)):
+            path = os.path.join(tmp, f"{name}.db")
+            create_test_database(path, args.filas)
+            all_results.append(run_mode(name, access_cls(path), args.filas,
+                                        args.lectores, args.escritores, args.segundos))
+
+    if args.json:
+        print(json.dumps(all_results, indent=2))
+        return
+
+    print(f"\n📊 CONTENCIÓN SQLITE ({args.filas} filas, {args.lectores} lectores, "
+          f"{args.escritores} escritores, {args.segundos:.0f}s)")
+    for r in all_results:
+        print(f"\n  {r['modo']}:")
+        print(f"    - Lecturas/s: {r['lecturas_por_segundo']:,.0f} (p50 {r['lectura_p50_ms']:.2f} ms, p99 {r['lectura_p99_ms']:.2f} ms)")
+        print(f"    - Escrituras/s: {r['escrituras_por_segundo']:,.0f} (p50 {r['escritura_p50_ms']:.2f} ms, p99 {r['escritura_p99_ms']:.2f} ms)")
+        print(f"    - Errores 'database is locked': {r['errores_bloqueo']}")
+
+if __name__ == "__main__":
+    main()
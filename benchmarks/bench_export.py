@@ -0,0 +1,112 @@
+"""Benchmark de memoria de la exportación de empleados.
+
+Crea una base de datos grande y exporta la tabla completa de dos formas, cada
+una en su propio proceso para medir el pico de memoria (ru_maxrss):
+  - pandas: pd.read_sql_query + to_csv, todo el resultado en memoria
+  - streaming: iter_row_chunks + export_stream, un lote a la vez (lo que hace /empleados/export)
+
+El pico del streaming no crece con el número de filas; el de pandas sí. Lo poco
+que sube el streaming son páginas del archivo mapeadas por SQLite (mmap_size):
+memoria compartida de la caché del sistema, acotada, no del proceso.
+
+Uso:
+    python benchmarks/bench_export.py --filas 500000 --formato csv --lote 1000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+def peak_rss_mb():
+    # Linux da ru_maxrss en KB, macOS en bytes
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+def export_pandas(db_path, formato, lote):
+    import sqlite3
+    import pandas as pd
+    conn = sqlite3.connect(db_path)
+    df = pd.read_sql_query("SELECT * FROM empleados ORDER BY id", conn)
+    conn.close()
+    if formato == "parquet":
+        data = df.to_parquet(compression="zstd")
+    elif formato == "ndjson":
+        data = df.to_json(orient="records", lines=True, force_ascii=False).encode('utf-8')
+    else:
+        data = df.to_csv(index=False).encode('utf-8')
+    return len(data)
+
+def export_streaming(db_path, formato, lote):
+    from models.export import build_export_query, export_stream, iter_row_chunks
+    sql, params, columnas = build_export_query()
+    total = 0
+    for chunk in export_stream(formato, columnas, iter_row_chunks(sql, params, lote, db_path)):
+        total += len(chunk)
+    return total
+
+def child(args):
+    """Ejecutar una sola variante y devolver su medición por stdout"""
+    # Importar antes de medir la base: el pico que cuenta es el de la exportación
+    import pandas  # noqa: F401
+    import models.export  # noqa: F401
+    base = peak_rss_mb()
+    export = export_pandas if args.variante == "pandas" else export_streaming
+    start = time.perf_counter()
+    size = export(args.db, args.formato, args.lote)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        "variante": args.variante,
+        "segundos": elapsed,
+        "bytes": size,
+        "pico_mb": peak_rss_mb(),
+        "pico_sobre_base_mb": peak_rss_mb() - base,
+    }))
+
+def run_child(variante, db_path, args):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--hijo", "--variante", variante, "--db", db_path,
+         "--formato", args.formato, "--lote", str(args.lote)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de memoria de la exportación de empleados")
+    parser.add_argument("--filas", type=int, default=500000)
+    parser.add_argument("--formato", choices=["csv", "ndjson", "parquet"], default="csv")
+    parser.add_argument("--lote", type=int, default=1000)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--hijo", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--variante", choices=["pandas", "streaming"], help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        child(args)
+        return
+
+    from bench_db_contention import create_test_database
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "export.db")
+        create_test_database(db_path, args.filas)
+        results = [run_child(variante, db_path, args) for variante in ("pandas", "streaming")]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"\n📊 EXPORTACIÓN ({args.filas} filas, {args.formato}, lotes de {args.lote})")
+    for r in results:
+        print(f"  - {r['variante']}: {r['segundos']:.2f}s, {r['bytes'] / 1024 / 1024:.1f} MB exportados, "
+              f"pico {r['pico_mb']:.0f} MB (+{r['pico_sobre_base_mb']:.0f} MB sobre el arranque)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark de consultas con filtros compuestos del chatbot.
+
+Compila preguntas como "¿cuántos empleados de IT en Monterrey con maestría
+ganan entre 50000 y 52000?" a las plantillas de models/query_compiler.py y
+mide la latencia del conteo en tablas de tamaño creciente:
+  - sin_indices: la plantilla sobre la tabla sin índices (recorrido completo)
+  - con_indices: tras ensure_indexes (búsqueda en índice compuesto, sin tocar la tabla)
+  - con_indices_sin_cache: igual, pero sin caché de sentencias (cached_statements=0),
+    así cada consulta vuelve a preparar el SQL
+
+Con índices la latencia depende de las filas que coinciden, no del tamaño de la tabla.
+
+Uso:
+    python benchmarks/bench_filter_query.py --filas 10000,100000,1000000 --repeticiones 200
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_db_contention import create_test_database, percentile
+from models.database import Database, configure_connection
+from models.query_compiler import QueryCompiler, ensure_indexes, parse_filter_question
+
+PREGUNTAS = [
+    "¿cuántos empleados de IT en Monterrey con maestría ganan entre 50000 y 52000?",
+    "¿cuántos de Ventas en Puebla con licenciatura ganan más de 89000?",
+    "¿cuántos empleados en Tijuana con doctorado ganan menos de 26000?",
+    "¿cuántos empleados con técnico ganan entre 40,000 y 40,500 pesos?",
+    "¿cuántos de Finanzas en Guadalajara con maestría tienen 30 años?",
+]
+
+def measure(conn, compiler, filtros, repeticiones):
+    latencies = []
+    count = 0
+    for _ in range(repeticiones):
+        for f in filtros:
+            start = time.perf_counter()
+            count = compiler.count(conn, f)
+            latencies.append(time.perf_counter() - start)
+    return {
+        "p50_us": percentile(latencies, 0.50) * 1e6,
+        "p99_us": percentile(latencies, 0.99) * 1e6,
+        "ultimo_conteo": count,
+    }
+
+def run_size(filas, repeticiones):
+    filtros = [parse_filter_question(p) for p in PREGUNTAS]
+    result = {"filas": filas}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "filtros.db")
+        create_test_database(path, filas)
+        db = Database(path)
+
+        conn = db.connect(read_only=True)
+        result["sin_indices"] = measure(conn, QueryCompiler(), filtros, max(1, repeticiones // 20))
+        conn.close()
+
+        ensure_indexes(db)
+        db.close()
+
+        conn = db.connect(read_only=True)
+        result["con_indices"] = measure(conn, QueryCompiler(), filtros, repeticiones)
+        conn.close()
+
+        conn = configure_connection(sqlite3.connect(path, cached_statements=0), read_only=True)
+        result["con_indices_sin_cache"] = measure(conn, QueryCompiler(), filtros, repeticiones)
+        conn.close()
+
+        conn = db.connect(read_only=True)
+        result["coincidencias"] = [QueryCompiler().count(conn, f) for f in filtros]
+        conn.close()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de consultas con filtros compuestos")
+    parser.add_argument("--filas", default="10000,100000,1000000", help="Tamaños de tabla separados por comas")
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = [run_size(int(n), args.repeticiones) for n in args.filas.split(',')]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"\n📊 FILTROS COMPUESTOS ({len(PREGUNTAS)} preguntas, {args.repeticiones} repeticiones)")
+    for r in results:
+        print(f"\n  {r['filas']:,} filas (coincidencias por pregunta: {r['coincidencias']}):")
+        for variante in ("sin_indices", "con_indices", "con_indices_sin_cache"):
+            m = r[variante]
+            print(f"    - {variante}: p50 {m['p50_us']:.1f} µs, p99 {m['p99_us']:.1f} µs")
+
+if __name__ == "__main__":
+    main()
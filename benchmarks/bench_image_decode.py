@@ -0,0 +1,151 @@
+"""Benchmark de decodificación de imágenes para OCR.
+
+Compara el camino anterior de process_image (PIL -> np.array -> cvtColor) con
+models/image_decode.decode_grayscale en distintos modos de imagen. Cada caso se
+mide en un subproceso nuevo para que el pico de memoria (ru_maxrss) sea
+comparable; también se reporta el pico de tracemalloc (búferes de NumPy/OpenCV).
+
+Uso:
+    python benchmarks/bench_image_decode.py --repeticiones 20
+    python benchmarks/bench_image_decode.py --json > benchmarks/baselines/image_decode.json
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CASES = {
+    # nombre: (modo PIL, tamaño, formato)
+    "png_rgb_tarjeta": ("RGB", (400, 300), "PNG"),
+    "png_rgba": ("RGBA", (1600, 1200), "PNG"),
+    "png_paleta": ("P", (1600, 1200), "PNG"),
+    "png_gris_16bits": ("I;16", (1600, 1200), "PNG"),
+    "jpeg_foto_12mp": ("RGB", (4000, 3000), "JPEG"),
+    "jpeg_foto_48mp": ("RGB", (8000, 6000), "JPEG"),
+}
+
+def make_image(mode, size, fmt):
+    """Generar una tarjeta sintética con texto en el modo pedido"""
+    from PIL import Image, ImageDraw
+    import numpy as np
+
+    base = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(base)
+    step = max(20, size[1] // 15)
+    for i, y in enumerate(range(step, size[1] - step, step)):
+        draw.text((step, y), f"Campo {i}: Valor de prueba {i * 37}", fill='black')
+    # Ruido suave para que el JPEG no comprima a casi nada
+    noise = np.random.default_rng(0).integers(0, 24, (size[1], size[0], 3), dtype=np.uint8)
+    base = Image.fromarray(np.clip(np.asarray(base).astype(np.int16) - noise, 0, 255).astype(np.uint8))
+
+    if mode == "RGBA":
+        image = base.convert("RGBA")
+        image.putalpha(Image.eval(base.convert("L"), lambda v: 255 - v))
+    elif mode == "P":
+        image = base.convert("P", palette=Image.ADAPTIVE, colors=16)
+    elif mode == "I;16":
+        image = Image.fromarray((np.asarray(base.convert("L")).astype(np.uint16) * 257))
+    else:
+        image = base
+
+    buffer = io.BytesIO()
+    if fmt == "JPEG":
+        image.save(buffer, format=fmt, quality=90)
+    else:
+        image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+def legacy_decode(data):
+    """Camino anterior de OCRProcessor.process_image (antes del preprocesado)"""
+    import cv2
+    import numpy as np
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    image_np = np.array(image)
+    if len(image_np.shape) == 3:
+        return cv2.cvtColor(image_np, cv2.COLOR_BGR2GRAY)
+    return image_np
+
+def run_child(path, mode, repeticiones):
+    """Medir un caso en este proceso (invocado como subproceso)"""
+    import cv2  # noqa: F401 - cargar antes de medir la memoria base
+    from models.image_decode import decode_grayscale
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    decode = legacy_decode if mode == "anterior" else decode_grayscale
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        for _ in range(repeticiones):
+            output = decode(data)
+        elapsed = (time.perf_counter() - start) / repeticiones
+        error = None
+    except Exception as e:
+        output, elapsed, error = None, 0.0, str(e)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print(json.dumps({
+        "ms": elapsed * 1000,
+        "pico_rss_mb": (rss_after - rss_before) / 1024,
+        "pico_tracemalloc_mb": traced_peak / (1024 * 1024),
+        "salida": list(output.shape) + [str(output.dtype)] if output is not None else None,
+        "error": error
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de decodificación de imágenes para OCR")
+    parser.add_argument("--repeticiones", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="Imprimir resultados como JSON")
+    parser.add_argument("--interno", nargs=2, metavar=("RUTA", "MODO"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.interno:
+        run_child(args.interno[0], args.interno[1], args.repeticiones)
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (mode, size, fmt) in CASES.items():
+            path = os.path.join(tmp, name)
+            with open(path, 'wb') as f:
+                f.write(make_image(mode, size, fmt))
+
+            results[name] = {}
+            for decode_mode in ("anterior", "directo"):
+                output = subprocess.run(
+                    [sys.executable, __file__, "--interno", path, decode_mode,
+                     "--repeticiones", str(args.repeticiones)],
+                    capture_output=True, text=True, check=True
+                )
+                results[name][decode_mode] = json.loads(output.stdout.strip().splitlines()[-1])
+
+    if args.json:
+        print(json.dumps({"repeticiones": args.repeticiones, "casos": results}, indent=2))
+        return
+
+    print("\n📊 DECODIFICACIÓN DE IMÁGENES (anterior vs directo)")
+    for name, modes in results.items():
+        print(f"\n  {name}:")
+        for decode_mode, r in modes.items():
+            if r["error"]:
+                print(f"    - {decode_mode}: ERROR {r['error']}")
+                continue
+            print(f"    - {decode_mode}: {r['ms']:.1f} ms, pico RSS +{r['pico_rss_mb']:.1f} MB, "
+                  f"pico tracemalloc {r['pico_tracemalloc_mb']:.1f} MB, salida {r['salida']}")
+
+if __name__ == "__main__":
+    main()
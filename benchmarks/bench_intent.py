@@ -0,0 +1,195 @@
+"""Benchmark de clasificación de intenciones sobre un corpus generado.
+
+Expande las frases de IntentClassifier.create_training_data en un corpus
+grande y aleatorio: plantillas de cortesía, departamentos, edades y años de
+experiencia como huecos, quitar acentos, errores de tecleo, mayúsculas y
+preguntas largas con relleno. Mide, a la vez:
+  - latencia por pregunta (p50/p95/p99) y QPS una a una
+  - QPS por lotes (predict_many)
+  - precisión global y por categoría
+
+Variantes: compilado (NumPy), sklearn (pipeline pickle) y enrutador (reglas + modelo).
+La salida --json/--salida es estable para comparar variantes a lo largo del tiempo.
+
+Uso:
+    python benchmarks/bench_intent.py --preguntas 20000 --variante compilado --salida resultados.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import time
+import unicodedata
+from collections import Counter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from asgi_driver import percentile
+from models.classifier import IntentClassifier
+from models.vocabulary import DEPARTAMENTOS, NIVELES_EDUCACION
+
+PREFIJOS = ["", "", "", "oye, ", "hola, ", "por favor dime ", "necesito saber ", "me podrías decir ",
+            "una pregunta: ", "quisiera saber "]
+SUFIJOS = ["", "", "", " por favor", " gracias", " ahora mismo", " en la empresa", "??", " :)"]
+RELLENO = ["para un reporte del trimestre", "es para mi jefe", "lo necesito para una presentación",
+           "estoy revisando los datos de nómina", "según la base de datos actual"]
+
+def strip_accents(text):
+    return ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn')
+
+def add_typo(text, rng):
+    """Un error de tecleo: intercambiar, borrar o duplicar una letra"""
+    positions = [i for i, c in enumerate(text) if c.isalpha()]
+    if len(positions) < 2:
+        return text
+    i = rng.choice(positions[:-1])
+    kind = rng.random()
+    if kind < 0.4:
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    if kind < 0.7:
+        return text[:i] + text[i + 1:]
+    return text[:i] + text[i] + text[i:]
+
+def fill_slots(text, rng):
+    """Cambiar departamento, nivel, edad y experiencia por otros valores del vocabulario"""
+    for keyword in DEPARTAMENTOS:
+        if keyword in text:
+            text = text.replace(keyword, rng.choice(list(DEPARTAMENTOS)), 1)
+            break
+    for keyword in NIVELES_EDUCACION:
+        if keyword in text:
+            text = text.replace(keyword, rng.choice(list(NIVELES_EDUCACION)), 1)
+            break
+    # Solo "N años": edad o años de experiencia (percentiles y top-k se dejan igual)
+    words = text.split(' ')
+    for i, word in enumerate(words[:-1]):
+        if word.isdigit() and words[i + 1].startswith('años'):
+            experience = ' '.join(words[i + 2:i + 4]).startswith('de experiencia')
+            words[i] = str(rng.randint(0, 30) if experience else rng.randint(18, 65))
+    return ' '.join(words)
+
+def generate_corpus(n, seed=42, typo_rate=0.15, accent_rate=0.3, long_rate=0.1):
+    """Generar n preguntas (texto, categoría) a partir de las frases de entrenamiento"""
+    rng = random.Random(seed)
+    X, y = IntentClassifier().create_training_data()
+    base = list(zip(X, y))
+    corpus = []
+    for _ in range(n):
+        text, category = rng.choice(base)
+        text = fill_slots(text, rng)
+        text = rng.choice(PREFIJOS) + text + rng.choice(SUFIJOS)
+        if rng.random() < long_rate:
+            text = f"{text} {rng.choice(RELLENO)}, {rng.choice(RELLENO)}"
+        if rng.random() < accent_rate:
+            text = strip_accents(text)
+        if rng.random() < typo_rate:
+            text = add_typo(text, rng)
+        if rng.random() < 0.2:
+            text = text.upper() if rng.random() < 0.5 else text.capitalize()
+        corpus.append((text, category))
+    return corpus
+
+def load_variant(name):
+    """Devolver (predict, predict_many) de la variante a medir"""
+    classifier = IntentClassifier()
+    if name == "sklearn":
+        classifier.load_pipeline()
+    else:
+        classifier.load_model()
+
+    if name == "enrutador":
+        from models.intent_router import IntentRouter
+        router = IntentRouter(classifier)
+        return router.predict, lambda questions: [router.predict(q) for q in questions]
+    return classifier.predict, classifier.predict_many
+
+def run(predict, predict_many, corpus, batch_size):
+    questions = [q for q, _ in corpus]
+    labels = [c for _, c in corpus]
+
+    # Una a una: latencia por pregunta
+    latencies = []
+    predictions = []
+    start = time.perf_counter()
+    for question in questions:
+        t = time.perf_counter()
+        predictions.append(predict(question)["categoria"])
+        latencies.append(time.perf_counter() - t)
+    single_elapsed = time.perf_counter() - start
+
+    # Por lotes
+    start = time.perf_counter()
+    batch_predictions = []
+    for i in range(0, len(questions), batch_size):
+        batch_predictions.extend(r["categoria"] for r in predict_many(questions[i:i + batch_size]))
+    batch_elapsed = time.perf_counter() - start
+
+    total = Counter(labels)
+    correct = Counter(label for label, pred in zip(labels, predictions) if label == pred)
+    return {
+        "una_a_una": {
+            "qps": len(questions) / single_elapsed,
+            "latencia_us": {
+                "p50": percentile(latencies, 0.50) * 1e6,
+                "p95": percentile(latencies, 0.95) * 1e6,
+                "p99": percentile(latencies, 0.99) * 1e6,
+                "max": max(latencies) * 1e6,
+            },
+        },
+        "por_lotes": {"tamano_lote": batch_size, "qps": len(questions) / batch_elapsed},
+        "precision": sum(correct.values()) / len(labels),
+        "precision_por_categoria": {c: correct[c] / total[c] for c in sorted(total)},
+        "lotes_coinciden": batch_predictions == predictions,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de clasificación de intenciones")
+    parser.add_argument("--preguntas", type=int, default=20000)
+    parser.add_argument("--variante", choices=["compilado", "sklearn", "enrutador"], default="compilado")
+    parser.add_argument("--lote", type=int, default=256)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--errores", type=float, default=0.15, help="Fracción de preguntas con un error de tecleo")
+    parser.add_argument("--sin-acentos", type=float, default=0.3, help="Fracción de preguntas sin acentos")
+    parser.add_argument("--largas", type=float, default=0.1, help="Fracción de preguntas con relleno")
+    parser.add_argument("--json", action="store_true", help="Imprimir el resultado como JSON")
+    parser.add_argument("--salida", help="Guardar el resultado JSON en este archivo")
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.preguntas, args.semilla, args.errores, args.sin_acentos, args.largas)
+    # Los mensajes de carga del modelo van a stderr para que stdout sea JSON puro
+    with contextlib.redirect_stdout(sys.stderr):
+        predict, predict_many = load_variant(args.variante)
+        predict(corpus[0][0])  # calentar (carga perezosa del modelo)
+
+    result = {
+        "variante": args.variante,
+        "preguntas": args.preguntas,
+        "semilla": args.semilla,
+        "corpus": {"errores": args.errores, "sin_acentos": args.sin_acentos, "largas": args.largas},
+        "python": platform.python_version(),
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        **run(predict, predict_many, corpus, args.lote),
+    }
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return
+
+    single = result["una_a_una"]
+    print(f"\n📊 CLASIFICACIÓN DE INTENCIONES ({args.variante}, {args.preguntas} preguntas)")
+    print(f"  - Una a una: {single['qps']:.0f} QPS, p50 {single['latencia_us']['p50']:.0f} µs, "
+          f"p99 {single['latencia_us']['p99']:.0f} µs")
+    print(f"  - Por lotes de {args.lote}: {result['por_lotes']['qps']:.0f} QPS")
+    print(f"  - Precisión: {result['precision']:.3f}")
+    for category, accuracy in result["precision_por_categoria"].items():
+        print(f"      {category}: {accuracy:.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Benchmark por etapas del camino OCR, sin Tesseract (motor OCR de prueba).
+
+Genera tarjetas con OCRProcessor.create_sample_card (una por empleado de una
+base de datos temporal) y mide por tarjeta cada etapa de process_image_bytes:
+  - decodificacion: bytes -> búfer gris (decode_grayscale)
+  - preprocesado: preprocess_image
+  - ocr: extract_text_from_image con FakeOCREngine (devuelve el texto de la
+    tarjeta con --latencia-ms de espera; mide el coste propio del camino)
+  - parseo: parse_employee_card
+  - validacion: validate_employee_data contra SQLite
+  - completo: process_image_bytes de principio a fin
+
+Con --guardar-base se registra la p50 de cada etapa; con --base se compara y el
+script termina con código 1 si alguna etapa es más lenta que la base por más
+de --umbral (por defecto 25%). Así un cambio de preprocesado o de parseo que
+frene el camino falla en CI. La base depende de la máquina: se registra en la
+misma donde se compara.
+
+Uso:
+    python benchmarks/bench_ocr_stages.py --tarjetas 500 --guardar-base benchmarks/baselines/ocr_stages.json
+    python benchmarks/bench_ocr_stages.py --tarjetas 500 --base benchmarks/baselines/ocr_stages.json
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_db_contention import create_test_database, percentile
+from models.image_decode import decode_grayscale
+from models.ocr_engine import FakeOCREngine
+from models.ocr_processor import OCRProcessor, sample_card_lines
+
+STAGES = ["decodificacion", "preprocesado", "ocr", "parseo", "validacion", "completo"]
+
+def load_employees(path, cantidad):
+    conn = sqlite3.connect(path)
+    rows = conn.execute(
+        "SELECT id, nombre, departamento, salario, edad, ciudad, experiencia_anos, nivel_educacion "
+        "FROM empleados ORDER BY id LIMIT ?", (cantidad,)
+    ).fetchall()
+    conn.close()
+    keys = ['id', 'nombre', 'departamento', 'salario', 'edad', 'ciudad', 'experiencia_anos', 'nivel_educacion']
+    return [dict(zip(keys, row)) for row in rows]
+
+def card_text(employee):
+    """Lo que leería un OCR perfecto de la tarjeta"""
+    return "\n".join(["TARJETA DE EMPLEADO"] + sample_card_lines(employee))
+
+def timed(latencies, stage, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    latencies[stage].append(time.perf_counter() - start)
+    return result
+
+def run_pass(processor, cards, latencies):
+    """Una pasada por todas las tarjetas: cada etapa por separado y el camino completo"""
+    validated = 0
+    for data in cards:
+        gray = timed(latencies, "decodificacion", decode_grayscale, data)
+        processed = timed(latencies, "preprocesado", processor.preprocess_image, gray)
+        text = timed(latencies, "ocr", processor.extract_text_from_image, processed)
+        extracted = timed(latencies, "parseo", processor.parse_employee_card, text)
+        timed(latencies, "validacion", processor.validate_employee_data, extracted)
+    # El motor de prueba devuelve los textos en orden: la segunda vuelta vuelve a empezar por la primera tarjeta
+    for data in cards:
+        result = timed(latencies, "completo", processor.process_image_bytes, data)
+        validated += bool(result.get('validacion', {}).get('coincidencia_id'))
+    return validated
+
+def compare(results, baseline, umbral, margen_us):
+    """Etapas cuya p50 supera la de la base por más del umbral (y por más de margen_us)"""
+    regressions = []
+    for stage in STAGES:
+        base = baseline["etapas"].get(stage)
+        if not base:
+            continue
+        ratio = results[stage]["p50_us"] / base["p50_us"] if base["p50_us"] else 0
+        results[stage]["vs_base"] = ratio
+        # Las etapas de pocos µs oscilan más que el umbral sin que nada haya cambiado
+        if ratio > 1 + umbral and results[stage]["p50_us"] - base["p50_us"] > margen_us:
+            regressions.append(stage)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark por etapas del camino OCR con un motor de prueba")
+    parser.add_argument("--tarjetas", type=int, default=200)
+    parser.add_argument("--repeticiones", type=int, default=3, help="Pasadas por todas las tarjetas")
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="Latencia simulada del motor OCR")
+    parser.add_argument("--formato", choices=["PNG", "JPEG"], default="PNG", help="Formato de las tarjetas")
+    parser.add_argument("--guardar-base", help="Guardar los resultados como línea base en esta ruta")
+    parser.add_argument("--base", help="Comparar con la línea base de esta ruta")
+    parser.add_argument("--umbral", type=float, default=0.25, help="Regresión máxima admitida por etapa (0.25 = 25%%)")
+    parser.add_argument("--margen-us", type=float, default=5.0,
+                        help="Diferencia mínima en µs para contar una regresión")
+    parser.add_argument("--json", action="store_true", help="Imprimir resultados como JSON")
+    args = parser.parse_args()
+
+    config = {"tarjetas": args.tarjetas, "latencia_ms": args.latencia_ms, "formato": args.formato}
+    latencies = {stage: [] for stage in STAGES}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "empresa.db")
+        create_test_database(path, args.tarjetas)
+        employees = load_employees(path, args.tarjetas)
+
+        engine = FakeOCREngine([card_text(e) for e in employees], latency=args.latencia_ms / 1000)
+        processor = OCRProcessor(db_path=path, engine=engine)
+        cards = [processor.create_sample_card(e, formato=args.formato) for e in employees]
+
+        # Calentar conexiones, caché de regex y OpenCV antes de medir
+        run_pass(processor, cards[:10], {stage: [] for stage in STAGES})
+        engine.rewind()
+
+        validated = 0
+        for _ in range(args.repeticiones):
+            validated = run_pass(processor, cards, latencies)
+
+    results = {
+        stage: {
+            "p50_us": percentile(values, 0.50) * 1e6,
+            "p95_us": percentile(values, 0.95) * 1e6,
+            "muestras": len(values)
+        }
+        for stage, values in latencies.items()
+    }
+
+    regressions = []
+    if args.base:
+        with open(args.base, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["configuracion"] != config:
+            print(f"❌ La línea base se registró con otra configuración: {baseline['configuracion']}", file=sys.stderr)
+            sys.exit(2)
+        regressions = compare(results, baseline, args.umbral, args.margen_us)
+
+    if args.guardar_base:
+        os.makedirs(os.path.dirname(args.guardar_base) or ".", exist_ok=True)
+        with open(args.guardar_base, "w", encoding="utf-8") as f:
+            json.dump({"configuracion": config, "etapas": {s: {"p50_us": round(r["p50_us"], 2)}
+                                                          for s, r in results.items()}}, f, indent=2)
+            f.write("\n")
+
+    if args.json:
+        print(json.dumps({"configuracion": config, "etapas": results, "validadas": validated,
+                          "regresiones": regressions}, indent=2))
+    else:
+        print(f"\n📊 ETAPAS OCR ({args.tarjetas} tarjetas {args.formato}, motor de prueba con "
+              f"{args.latencia_ms:g} ms, {args.repeticiones} pasadas)")
+        for stage in STAGES:
+            r = results[stage]
+            base = f" ({r['vs_base']:.2f}x la base)" if "vs_base" in r else ""
+            marca = " ❌" if stage in regressions else ""
+            print(f"  - {stage}: p50 {r['p50_us']:.1f} µs, p95 {r['p95_us']:.1f} µs{base}{marca}")
+        print(f"\n  Tarjetas validadas por ID en el camino completo: {validated} de {args.tarjetas}")
+        if args.guardar_base:
+            print(f"💾 Línea base guardada en {args.guardar_base}")
+
+    if regressions:
+        print(f"❌ Regresión de más del {args.umbral:.0%} en: {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
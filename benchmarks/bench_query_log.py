@@ -0,0 +1,149 @@
+"""Benchmark del registro de preguntas: escritura síncrona frente a write-behind.
+
+Varios hilos simulan peticiones del chatbot que registran su pregunta. Se mide
+cuánto añade el registro a cada petición: un INSERT con commit por petición
+(conexión por hilo, WAL) frente a QueryLogger, que solo agrega al búfer y
+escribe por lotes en su propio hilo. También se cuenta lo descartado por un
+búfer pequeño bajo ráfagas.
+
+Uso:
+    python benchmarks/bench_query_log.py --hilos 8 --eventos 5000
+    python benchmarks/bench_query_log.py --trabajo-ms 0   # ráfaga continua: mide los descartes
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import Database
+from models.query_log import INDEXES, INSERT_SQL, SCHEMA, QueryLogger
+
+PREGUNTAS = [
+    ("¿Cuántos empleados hay?", "conteo", 1.0),
+    ("¿Quién gana más?", "busqueda_max", 1.0),
+    ("¿Cuál es el promedio de edad?", "estadistica", 1.0),
+    ("¿qué onda con los de marketing?", "filtro", 0.41),
+]
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+def create_log_database(path):
+    conn = sqlite3.connect(path)
+    conn.execute(SCHEMA)
+    for sql in INDEXES:
+        conn.execute(sql)
+    conn.commit()
+    conn.close()
+
+class SyncLogger:
+    """Un INSERT y un COMMIT dentro de cada petición"""
+
+    def __init__(self, path):
+        self.db = Database(path)
+        self.local = threading.local()
+
+    def log(self, pregunta, categoria, confianza, latencia_ms, tenant=None):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = self.db.connect(read_only=False)
+        with conn:
+            conn.execute(INSERT_SQL, (time.time(), tenant, pregunta, categoria, confianza, latencia_ms))
+        return True
+
+    def stop(self):
+        pass
+
+def run_mode(name, logger, path, hilos, eventos, trabajo):
+    latencies = []
+    accepted = [0]
+    lock = threading.Lock()
+
+    def worker(seed):
+        local = []
+        ok = 0
+        for i in range(eventos):
+            pregunta, categoria, confianza = PREGUNTAS[(seed + i) % len(PREGUNTAS)]
+            start = time.perf_counter()
+            ok += logger.log(pregunta, categoria, confianza, 1.5, "default")
+            local.append(time.perf_counter() - start)
+            # Resto de la petición (clasificar, consultar, serializar)
+            if trabajo:
+                time.sleep(trabajo)
+        with lock:
+            latencies.extend(local)
+            accepted[0] += ok
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(hilos)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    # El write-behind termina de volcar al detenerse
+    logger.stop()
+    total_elapsed = time.perf_counter() - start
+
+    conn = sqlite3.connect(path)
+    written = conn.execute("SELECT COUNT(*) FROM preguntas").fetchone()[0]
+    conn.close()
+    return {
+        "modo": name,
+        "eventos": hilos * eventos,
+        "aceptados": accepted[0],
+        "escritos": written,
+        "segundos_peticiones": elapsed,
+        "segundos_hasta_disco": total_elapsed,
+        "registro_p50_us": percentile(latencies, 0.50) * 1e6,
+        "registro_p99_us": percentile(latencies, 0.99) * 1e6,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del registro de preguntas (síncrono vs write-behind)")
+    parser.add_argument("--hilos", type=int, default=8)
+    parser.add_argument("--eventos", type=int, default=5000, help="Eventos por hilo")
+    parser.add_argument("--trabajo-ms", type=float, default=0.5,
+                        help="Duración simulada del resto de cada petición (0: ráfaga continua)")
+    parser.add_argument("--buffer-pequeno", type=int, default=1000,
+                        help="Tamaño del búfer en el modo que mide descartes")
+    parser.add_argument("--json", action="store_true", help="Imprimir resultados como JSON")
+    args = parser.parse_args()
+
+    all_results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        modes = [
+            ("sincrono", lambda path: SyncLogger(path)),
+            ("write_behind", lambda path: QueryLogger(path)),
+            ("write_behind_buffer_pequeno", lambda path: QueryLogger(path, max_buffer=args.buffer_pequeno)),
+        ]
+        for name, factory in modes:
+            path = os.path.join(tmp, f"{name}.db")
+            create_log_database(path)
+            logger = factory(path)
+            if isinstance(logger, QueryLogger):
+                logger.start()
+            all_results.append(run_mode(name, logger, path, args.hilos, args.eventos, args.trabajo_ms / 1000))
+
+    if args.json:
+        print(json.dumps(all_results, indent=2))
+        return
+
+    print(f"\n📊 REGISTRO DE PREGUNTAS ({args.hilos} hilos x {args.eventos} eventos, {args.trabajo_ms:g} ms por petición)")
+    for r in all_results:
+        print(f"\n  {r['modo']}:")
+        print(f"    - Coste por petición: p50 {r['registro_p50_us']:.1f} µs, p99 {r['registro_p99_us']:.1f} µs")
+        print(f"    - Peticiones: {r['segundos_peticiones']:.2f}s (en disco a los {r['segundos_hasta_disco']:.2f}s)")
+        print(f"    - Escritos: {r['escritos']:,} de {r['eventos']:,} (descartados {r['eventos'] - r['aceptados']:,})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Benchmark de serialización y bytes por respuesta.
+
+Compara, para respuestas típicas de /chatbot y /upload-tarjeta:
+  - CPU de serialización: encoder estándar (jsonable_encoder + json.dumps, como
+    JSONResponse) frente a orjson
+  - Bytes en la red: respuesta completa frente a verbose=false, sin comprimir,
+    con gzip y con brotli (si está instalado)
+
+Uso:
+    python benchmarks/bench_serialization.py --similares 50 --repeticiones 20000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.compression import available_encodings, compress
+from models.responses import dumps, orjson, shape_response
+
+try:
+    from fastapi.encoders import jsonable_encoder
+except ImportError:
+    jsonable_encoder = None
+
+CATEGORIAS = ["conteo", "busqueda_max", "estadistica", "filtro", "busqueda_min",
+              "prediccion", "analitica"]
+DEPARTAMENTOS = ["Ventas", "Marketing", "IT", "Recursos Humanos", "Finanzas", "Operaciones"]
+
+def chatbot_payload():
+    probs = {c: 0.02 + i * 0.013 for i, c in enumerate(CATEGORIAS)}
+    return {
+        "respuesta": "Actualmente hay 150 empleados en la empresa.",
+        "categoria": "conteo",
+        "confianza": 0.91,
+        "probabilidades": probs,
+    }
+
+def ocr_payload(similares):
+    texto = ("TARJETA DE EMPLEADO\nID: 1042\nNombre: María Fernanda López García\n"
+             "Departamento: Recursos Humanos\nPuesto: Analista Senior\nSalario: $45,000\n"
+             "Edad: 34\nCiudad: Guadalajara\nExperiencia: 9 años\nEducación: Maestría\n") * 3
+    return {
+        "datos_extraidos": {"id": 1042, "nombre": "María Fernanda López García",
+                            "departamento": "Recursos Humanos", "puesto": "Analista Senior"},
+        "success": True,
+        "texto_extraido": texto,
+        "validacion": {
+            "empleado_existe": True,
+            "coincidencia_id": True,
+            "coincidencia_nombre": True,
+            "departamento_valido": True,
+            "empleados_similares": [
+                {"id": 1000 + i, "nombre": f"María López {i}", "departamento": DEPARTAMENTOS[i % 6]}
+                for i in range(similares)
+            ],
+        },
+    }
+
+def stdlib_render(data):
+    """Lo que hace FastAPI por defecto: jsonable_encoder + JSONResponse (json.dumps)"""
+    if jsonable_encoder is not None:
+        data = jsonable_encoder(data)
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+def time_per_call(fn, data, repeticiones):
+    start = time.perf_counter()
+    for _ in range(repeticiones):
+        fn(data)
+    return (time.perf_counter() - start) / repeticiones * 1e6
+
+def measure(name, payload, repeticiones):
+    lean = shape_response(payload, verbose=False)
+    result = {"respuesta": name}
+    for variant, data in (("completa", payload), ("verbose_false", lean)):
+        body = dumps(data)
+        sizes = {"sin_comprimir": len(body)}
+        for encoding in available_encodings():
+            sizes[encoding] = len(compress(body, encoding))
+        result[variant] = {
+            "bytes": sizes,
+            "us_estandar": time_per_call(stdlib_render, data, repeticiones),
+            "us_orjson": time_per_call(dumps, data, repeticiones) if orjson is not None else None,
+        }
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialización y compresión de respuestas")
+    parser.add_argument("--similares", type=int, default=50,
+                        help="Empleados similares en la respuesta OCR")
+    parser.add_argument("--repeticiones", type=int, default=20000)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = [
+        measure("/chatbot", chatbot_payload(), args.repeticiones),
+        measure("/upload-tarjeta", ocr_payload(args.similares), args.repeticiones),
+    ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    if jsonable_encoder is None:
+        print("⚠️ FastAPI no está instalado: el encoder estándar se mide sin jsonable_encoder")
+    if orjson is None:
+        print("⚠️ orjson no está instalado: solo se mide el encoder estándar")
+
+    print(f"\n📊 SERIALIZACIÓN ({args.repeticiones} repeticiones)")
+    for r in results:
+        print(f"\n  {r['respuesta']}:")
+        for variant in ("completa", "verbose_false"):
+            v = r[variant]
+            sizes = ", ".join(f"{k} {n} B" for k, n in v["bytes"].items())
+            cpu = f"estándar {v['us_estandar']:.1f} µs"
+            if v["us_orjson"] is not None:
+                cpu += f", orjson {v['us_orjson']:.1f} µs ({v['us_estandar'] / v['us_orjson']:.1f}x)"
+            print(f"    - {variant}: {sizes}")
+            print(f"      {cpu}")
+
+if __name__ == "__main__":
+    main()
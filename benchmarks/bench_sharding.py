@@ -0,0 +1,142 @@
+"""Benchmark de la tabla empleados en un archivo frente a N shards.
+
+Crea los mismos empleados en un solo SQLite y repartidos en N archivos
+(create_database.py --shards) y mide la latencia de las consultas del chatbot:
+  - conteo, estadistica (promedios) y busqueda_max (fila del salario máximo):
+    recorrido completo, en paralelo por shard y combinado de forma exacta
+  - filtro: conteo con filtros compuestos (con índices); con partición por
+    departamento, una pregunta con departamento va a un solo shard
+  - por_id: búsqueda puntual de un empleado (un solo shard con partición hash)
+
+En cada modo se comprueba que los resultados coinciden con los del archivo único.
+
+Uso:
+    python benchmarks/bench_sharding.py --filas 1000000 --shards 2,4,8
+    python benchmarks/bench_sharding.py --particion departamento --shards 5
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_db_contention import percentile
+from create_database import create_sharded_database, generate_sample_data
+from models.database import get_database, release_database
+from models.query_compiler import QueryCompiler, ensure_indexes, parse_filter_question
+from models.sharding import PARTITION_HASH, PARTITIONS, ShardedEmployeeStore, shard_file
+
+PREGUNTAS_FILTRO = [
+    "¿cuántos empleados de IT ganan más de 60000?",
+    "¿cuántos empleados en Monterrey con maestría?",
+    "¿cuántos de Ventas tienen más de 40 años?",
+]
+
+def single_file_queries(conn, compiler, filtros, ids):
+    """Las consultas de main.py sobre el archivo único"""
+    return {
+        "conteo": lambda: conn.execute("SELECT COUNT(*) FROM empleados").fetchone()[0],
+        "estadistica": lambda: tuple(round(v, 6) for v in conn.execute(
+            "SELECT AVG(edad), AVG(salario), AVG(experiencia_anos) FROM empleados").fetchone()),
+        "busqueda_max": lambda: conn.execute(
+            "SELECT nombre, departamento, salario FROM empleados ORDER BY salario DESC, id LIMIT 1").fetchone(),
+        "filtro": lambda: [compiler.count(conn, f) for f in filtros],
+        "por_id": lambda: [conn.execute("SELECT * FROM empleados WHERE id = ?", (i,)).fetchone() for i in ids],
+    }
+
+def sharded_queries(store, compiler, filtros, ids):
+    """Las mismas consultas con ShardedEmployeeStore"""
+    def estadistica():
+        summary = store.summary()
+        return tuple(round(summary[k], 6) for k in ("edad_promedio", "salario_promedio", "exp_promedio"))
+
+    return {
+        "conteo": store.count,
+        "estadistica": estadistica,
+        "busqueda_max": lambda: store.top("salario"),
+        "filtro": lambda: [store.count_filtered(compiler, f) for f in filtros],
+        "por_id": lambda: [store.get(i) for i in ids],
+    }
+
+def load(directory, empleados, count, particion):
+    # Los mensajes de la carga no deben mezclarse con la salida --json
+    with contextlib.redirect_stdout(sys.stderr):
+        create_sharded_database(directory, empleados, count, particion)
+
+def measure(queries, repeticiones):
+    results, answers = {}, {}
+    for name, fn in queries.items():
+        answers[name] = fn()
+        latencies = []
+        for _ in range(repeticiones):
+            start = time.perf_counter()
+            fn()
+            latencies.append(time.perf_counter() - start)
+        results[name] = {"p50_ms": percentile(latencies, 0.50) * 1000, "p99_ms": percentile(latencies, 0.99) * 1000}
+    return results, answers
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de empleados en un archivo frente a N shards")
+    parser.add_argument("--filas", type=int, default=500000)
+    parser.add_argument("--shards", default="2,4,8", help="Números de shards a comparar, separados por coma")
+    parser.add_argument("--particion", choices=PARTITIONS, default=PARTITION_HASH)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="Imprimir resultados como JSON")
+    args = parser.parse_args()
+
+    random.seed(42)
+    print(f"📝 Generando {args.filas:,} empleados...", file=sys.stderr)
+    empleados = generate_sample_data(args.filas)
+    ids = random.sample(range(1, args.filas + 1), min(50, args.filas))
+    filtros = [parse_filter_question(p) for p in PREGUNTAS_FILTRO]
+
+    all_results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # Archivo único: un shard sin manifiesto que se consulta como data/empresa.db
+        single_dir = os.path.join(tmp, "unico")
+        load(single_dir, empleados, 1, PARTITION_HASH)
+        single_path = os.path.join(single_dir, shard_file(0))
+        single_db = get_database(single_path)
+        ensure_indexes(single_db)
+        results, expected = measure(single_file_queries(single_db.reader(), QueryCompiler(), filtros, ids),
+                                    args.repeticiones)
+        all_results.append({"modo": "archivo_unico", "shards": 1, "consultas": results, "coinciden": True})
+        release_database(single_path)
+
+        for count in [int(n) for n in args.shards.split(",") if n.strip()]:
+            directory = os.path.join(tmp, f"shards_{count}")
+            load(directory, empleados, count, args.particion)
+            store = ShardedEmployeeStore.open(directory)
+            for db in store.databases:
+                ensure_indexes(db)
+            results, answers = measure(sharded_queries(store, QueryCompiler(), filtros, ids), args.repeticiones)
+            all_results.append({
+                "modo": f"{count}_shards_{args.particion}",
+                "shards": count,
+                "consultas": results,
+                "coinciden": answers == expected
+            })
+            store.close()
+
+    if args.json:
+        print(json.dumps(all_results, indent=2))
+        return
+
+    print(f"\n📊 EMPLEADOS EN UN ARCHIVO VS SHARDS ({args.filas:,} filas, partición {args.particion}, "
+          f"{os.cpu_count()} CPUs)")
+    base = all_results[0]["consultas"]
+    for r in all_results:
+        estado = "✅" if r["coinciden"] else "❌ resultados distintos"
+        print(f"\n  {r['modo']} {estado}:")
+        for name, stats in r["consultas"].items():
+            speedup = base[name]["p50_ms"] / stats["p50_ms"] if stats["p50_ms"] else 0
+            print(f"    - {name}: p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms (x{speedup:.2f})")
+
+if __name__ == "__main__":
+    main()
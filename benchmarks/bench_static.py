@@ -0,0 +1,115 @@
+"""Benchmark del servicio del frontend en "/".
+
+Compara peticiones/s de:
+  - archivo_por_peticion: lo que hacía root() con FileResponse (stat + lectura de
+    disco en cada visita, sin compresión ni caché)
+  - memoria: StaticAssetCache con la variante comprimida ya en memoria
+  - revalidacion_304: visita repetida con If-None-Match (el navegador ya lo tiene)
+
+Uso:
+    python benchmarks/bench_static.py --peticiones 5000 --concurrencia 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from asgi_driver import asgi_request
+from models.static_assets import StaticAssetCache
+
+try:
+    from starlette.responses import FileResponse
+except ImportError:
+    FileResponse = None
+
+def file_per_request_app(path):
+    """El camino anterior: FileResponse real si Starlette está instalado, si no su equivalente"""
+    async def app(scope, receive, send):
+        if FileResponse is not None:
+            await FileResponse(path)(scope, receive, send)
+            return
+        loop = asyncio.get_running_loop()
+        stat = await loop.run_in_executor(None, os.stat, path)
+
+        def read():
+            with open(path, 'rb') as f:
+                return f.read()
+
+        body = await loop.run_in_executor(None, read)
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/html; charset=utf-8"),
+            (b"content-length", str(stat.st_size).encode()),
+            (b"last-modified", str(int(stat.st_mtime)).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+def memory_app(cache):
+    """Mismo flujo que root(): StaticAssetCache.serve con las cabeceras de la petición"""
+    async def app(scope, receive, send):
+        headers = {k.decode(): v.decode() for k, v in scope["headers"]}
+        status, response_headers, body = cache.serve(
+            "index.html", headers.get("accept-encoding"), headers.get("if-none-match")
+        )
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(k.encode(), v.encode()) for k, v in response_headers.items()]})
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+async def run(app, headers, total, concurrency):
+    sent_bytes = 0
+    counter = iter(range(total))
+
+    async def client():
+        nonlocal sent_bytes
+        for _ in counter:
+            _, _, body, _ = await asgi_request(app, "GET", "/", headers=headers)
+            sent_bytes += len(body)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {"peticiones_s": total / elapsed, "bytes_por_peticion": sent_bytes / total}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del servicio de archivos estáticos")
+    parser.add_argument("--archivo", default="static/index.html")
+    parser.add_argument("--peticiones", type=int, default=5000)
+    parser.add_argument("--concurrencia", type=int, default=50)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    cache = StaticAssetCache(os.path.dirname(args.archivo) or ".")
+    cache.load()
+    name = os.path.basename(args.archivo)
+    _, headers, _ = cache.serve(name, "br, gzip")
+    browser = {"Accept-Encoding": "gzip, deflate, br"}
+
+    scenarios = {
+        "archivo_por_peticion": (file_per_request_app(args.archivo), browser),
+        "memoria": (memory_app(cache), browser),
+        "revalidacion_304": (memory_app(cache), {**browser, "If-None-Match": headers["etag"]}),
+    }
+    results = {}
+    for scenario, (app, request_headers) in scenarios.items():
+        results[scenario] = asyncio.run(run(app, request_headers, args.peticiones, args.concurrencia))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    base = results["archivo_por_peticion"]["peticiones_s"]
+    print(f"\n📊 FRONTEND EN / ({args.peticiones} peticiones, concurrencia {args.concurrencia})")
+    if FileResponse is None:
+        print("   (Starlette no está instalado: FileResponse se emula con stat + lectura en hilo)")
+    for scenario, r in results.items():
+        print(f"  - {scenario}: {r['peticiones_s']:.0f} pet/s ({r['peticiones_s'] / base:.1f}x), "
+              f"{r['bytes_por_peticion']:.0f} bytes/petición")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Latencia de la primera petición tras arrancar, con y sin calentamiento.
+
+Levanta el servidor real (uvicorn main:app) en un subproceso, espera a que
+acepte tráfico y mide la primera petición de cada endpoint y la mediana de
+las siguientes (estado estable):
+  - sin_calentamiento: WARMUP=0, se envía tráfico en cuanto /health responde
+  - con_calentamiento: se envía tráfico cuando /ready pasa a 200
+
+Se repite el arranque varias veces y se informa la mediana. Con
+--vaciar-cache-so (Linux, root) se vacía la caché de páginas del sistema antes
+de cada arranque para medir también los archivos de SQLite fríos.
+
+Uso:
+    python benchmarks/bench_warmup.py --arranques 3 --estables 20
+"""
+import argparse
+import base64
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def sample_card():
+    cards_dir = os.path.join(ROOT, "data", "sample_cards")
+    cards = sorted(os.listdir(cards_dir)) if os.path.isdir(cards_dir) else []
+    if not cards:
+        return None
+    with open(os.path.join(cards_dir, cards[0]), 'rb') as f:
+        return base64.b64encode(f.read()).decode()
+
+# Preguntas distintas de las del calentamiento: no hay caché de respuestas que las favorezca
+REQUESTS = [
+    ("chatbot_reglas", "/chatbot", {"pregunta": "¿Cuántos empleados trabajan en Finanzas?"}),
+    ("chatbot_modelo", "/chatbot", {"pregunta": "dime la media de años de los trabajadores"}),
+    ("predict_salario", "/predict-salario", {"edad": 41, "experiencia_anos": 12,
+                                             "departamento": "Marketing", "nivel_educacion": "Doctorado"}),
+    ("analytics", "/analytics", {"operacion": "percentiles", "metrica": "edad", "agrupar_por": "ciudad"}),
+    ("upload_tarjeta", "/upload-tarjeta", None),
+]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def request(port, path, payload=None):
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=data,
+                                 headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=120) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, ConnectionError):
+        status = None
+    return status, time.perf_counter() - start
+
+def wait_for(port, path, timeout=180):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        status, _ = request(port, path)
+        if status == 200:
+            return time.perf_counter() - start
+        time.sleep(0.05)
+    raise TimeoutError(f"{path} no respondió 200 en {timeout}s")
+
+def drop_os_cache():
+    subprocess.run(["sync"], check=True)
+    with open("/proc/sys/vm/drop_caches", "w") as f:
+        f.write("3\n")
+
+def boot(warm, steady, drop_cache):
+    """Arrancar el servidor una vez y medir primera petición y estado estable por endpoint"""
+    if drop_cache:
+        drop_os_cache()
+    port = free_port()
+    env = {**os.environ, "WARMUP": "1" if warm else "0", "PYTHONUNBUFFERED": "1"}
+    card = sample_card()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        start = time.perf_counter()
+        wait_for(port, "/health")
+        if warm:
+            wait_for(port, "/ready")
+        ready_after = time.perf_counter() - start
+
+        result = {"listo_tras_s": ready_after}
+        for name, path, payload in REQUESTS:
+            if path == "/upload-tarjeta":
+                if card is None:
+                    continue
+                payload = {"imagen": card}
+            status, first = request(port, path, payload)
+            rest = [request(port, path, payload)[1] for _ in range(steady)]
+            result[name] = {"estado": status, "primera_ms": first * 1000,
+                            "estable_ms": statistics.median(rest) * 1000 if rest else None}
+        return result
+    finally:
+        server.terminate()
+        server.wait()
+
+def summarize(boots):
+    summary = {"listo_tras_s": statistics.median(b["listo_tras_s"] for b in boots)}
+    for name, _, _ in REQUESTS:
+        runs = [b[name] for b in boots if name in b]
+        if runs:
+            summary[name] = {
+                "estado": runs[-1]["estado"],
+                "primera_ms": statistics.median(r["primera_ms"] for r in runs),
+                "estable_ms": statistics.median(r["estable_ms"] for r in runs),
+            }
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia de la primera petición con y sin calentamiento")
+    parser.add_argument("--arranques", type=int, default=3)
+    parser.add_argument("--estables", type=int, default=20, help="Peticiones tras la primera para el estado estable")
+    parser.add_argument("--vaciar-cache-so", action="store_true", help="Vaciar la caché de páginas antes de cada arranque")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = {}
+    for variante, warm in (("sin_calentamiento", False), ("con_calentamiento", True)):
+        results[variante] = summarize([boot(warm, args.estables, args.vaciar_cache_so) for _ in range(args.arranques)])
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"\n📊 PRIMERA PETICIÓN TRAS ARRANCAR (mediana de {args.arranques} arranques)")
+    for variante, summary in results.items():
+        print(f"\n  {variante} (acepta tráfico a los {summary['listo_tras_s']:.1f}s):")
+        for name, _, _ in REQUESTS:
+            if name in summary:
+                r = summary[name]
+                print(f"    - {name} [{r['estado']}]: primera {r['primera_ms']:.1f} ms, "
+                      f"estable {r['estable_ms']:.1f} ms")
+
+if __name__ == "__main__":
+    main()
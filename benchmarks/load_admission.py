@@ -0,0 +1,134 @@
+"""Prueba de carga del control de admisión.
+
+Simula el servicio con un pool de hilos limitado (como el threadpool de
+Starlette): /upload-tarjeta ocupa un hilo durante el OCR y /chatbot hace un
+trabajo corto en el mismo pool. Se satura el OCR y se mide la latencia de
+/chatbot y /health con y sin AdmissionControlMiddleware.
+
+Uso:
+    python benchmarks/load_admission.py --clientes-ocr 200 --segundos 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from asgi_driver import asgi_request, percentile
+from models.admission import AdmissionControlMiddleware, DEFAULT_ROUTES, RouteBudget
+
+def make_service(ocr_seconds, chatbot_seconds):
+    """App ASGI mínima con el perfil de costo de los endpoints reales"""
+    async def app(scope, receive, send):
+        loop = asyncio.get_running_loop()
+        path = scope["path"]
+        if path == "/upload-tarjeta":
+            await loop.run_in_executor(None, time.sleep, ocr_seconds)
+        elif path == "/chatbot":
+            await loop.run_in_executor(None, time.sleep, chatbot_seconds)
+        body = b'{"ok": true}'
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+async def run_scenario(app, args):
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=args.hilos))
+    stop = time.perf_counter() + args.segundos
+    results = {"chatbot": [], "health": [], "ocr_status": {}}
+
+    async def ocr_client():
+        while time.perf_counter() < stop:
+            status, headers, _, _ = await asgi_request(app, "POST", "/upload-tarjeta")
+            results["ocr_status"][status] = results["ocr_status"].get(status, 0) + 1
+            if status == 503:
+                # Un cliente bien portado respeta Retry-After; aquí se reintenta pronto para saturar
+                await asyncio.sleep(0.05)
+
+    async def latency_client(path, key):
+        while time.perf_counter() < stop:
+            status, _, _, elapsed = await asgi_request(app, "POST" if key == "chatbot" else "GET", path)
+            if status == 200:
+                results[key].append(elapsed)
+            await asyncio.sleep(0.02)
+
+    tasks = [ocr_client() for _ in range(args.clientes_ocr)]
+    tasks += [latency_client("/chatbot", "chatbot") for _ in range(args.clientes_chatbot)]
+    tasks += [latency_client("/health", "health")]
+    await asyncio.gather(*tasks)
+    return results
+
+def summarize(name, results):
+    chatbot = results["chatbot"]
+    return {
+        "escenario": name,
+        "chatbot_peticiones": len(chatbot),
+        "chatbot_p50_ms": percentile(chatbot, 0.50) * 1000,
+        "chatbot_p99_ms": percentile(chatbot, 0.99) * 1000,
+        "health_p99_ms": percentile(results["health"], 0.99) * 1000,
+        "ocr_respuestas": results["ocr_status"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del control de admisión")
+    parser.add_argument("--segundos", type=float, default=5.0)
+    parser.add_argument("--hilos", type=int, default=16, help="Tamaño del pool de hilos del servidor")
+    parser.add_argument("--clientes-ocr", type=int, default=200)
+    parser.add_argument("--clientes-chatbot", type=int, default=10)
+    parser.add_argument("--ocr-segundos", type=float, default=0.2)
+    parser.add_argument("--chatbot-segundos", type=float, default=0.002)
+    parser.add_argument("--ocr-concurrencia", type=int, default=4)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    service = make_service(args.ocr_segundos, args.chatbot_segundos)
+    scenarios = []
+
+    # Referencia: sin saturación de OCR
+    quiet = argparse.Namespace(**{**vars(args), "clientes_ocr": 0})
+    scenarios.append(summarize("sin_carga_ocr", asyncio.run(run_scenario(service, quiet))))
+
+    scenarios.append(summarize("ocr_saturado_sin_admision", asyncio.run(run_scenario(service, args))))
+
+    def with_admission():
+        budgets = {
+            "ligera": RouteBudget("ligera", max_concurrent=32, max_queue=128, queue_timeout=1.0),
+            "ocr": RouteBudget("ocr", max_concurrent=args.ocr_concurrencia, max_queue=8, queue_timeout=5.0, retry_after=5),
+            "pesada": RouteBudget("pesada", max_concurrent=2, max_queue=4, queue_timeout=10.0),
+        }
+        return AdmissionControlMiddleware(service, budgets=budgets, routes=DEFAULT_ROUTES), budgets
+
+    async def run_with_admission():
+        app, budgets = with_admission()
+        results = await run_scenario(app, args)
+        return results, {name: b.get_stats() for name, b in budgets.items()}
+
+    results, stats = asyncio.run(run_with_admission())
+    summary = summarize("ocr_saturado_con_admision", results)
+    summary["admision"] = stats
+    scenarios.append(summary)
+
+    if args.json:
+        print(json.dumps(scenarios, indent=2))
+        return
+
+    print(f"\n📊 CONTROL DE ADMISIÓN ({args.clientes_ocr} clientes OCR, {args.hilos} hilos, {args.segundos:.0f}s)")
+    for s in scenarios:
+        print(f"\n  {s['escenario']}:")
+        print(f"    - /chatbot: {s['chatbot_peticiones']} peticiones, p50 {s['chatbot_p50_ms']:.1f} ms, "
+              f"p99 {s['chatbot_p99_ms']:.1f} ms")
+        print(f"    - /health p99: {s['health_p99_ms']:.2f} ms")
+        print(f"    - /upload-tarjeta respuestas: {s['ocr_respuestas']}")
+        if "admision" in s:
+            ocr = s["admision"]["ocr"]
+            print(f"    - OCR: {ocr['admitidas']} admitidas, {ocr['encoladas']} encoladas, "
+                  f"{ocr['rechazadas_cola_llena'] + ocr['rechazadas_timeout']} rechazadas")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import sys
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp', '.gif', '.webp'}
+
+# Procesador OCR (y modo) propio de cada proceso del pool
+_processor = None
+_adaptive = False
+
+def init_worker(adaptive=False):
+    """Crear un OCRProcessor por proceso (se importa aquí para no cargar OpenCV en el padre)"""
+    global _processor, _adaptive
+    from models.ocr_processor import OCRProcessor
+    _processor = OCRProcessor()
+    _adaptive = adaptive
+
+def process_item(key, path, data):
+    """Procesar una imagen en el worker: desde ruta en disco o desde bytes ya leídos"""
+    start = time.perf_counter()
+    try:
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        result = _processor.process_image_bytes(data, adaptive=_adaptive)
+    except Exception as e:
+        # Un archivo ilegible no detiene el lote: queda como error en su línea
+        result = {'success': False, 'error': str(e)}
+    result['archivo'] = key
+    result['segundos'] = round(time.perf_counter() - start, 4)
+    return result
+
+def is_image(name):
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+def iter_sources(source):
+    """Generar (clave, ruta, bytes) para cada imagen de un directorio o de un zip.
+
+    Los zip se leen entrada por entrada en memoria, sin extraer a disco.
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if is_image(name):
+                    path = os.path.join(root, name)
+                    yield os.path.relpath(path, source), path, None
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and is_image(info.filename):
+                    yield info.filename, None, archive.read(info)
+    else:
+        raise ValueError(f"{source} no es un directorio ni un archivo zip")
+
+def load_checkpoint(path):
+    """Cargar las claves ya procesadas de una ejecución anterior"""
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+def collect(key, future):
+    """Resultado de una imagen; si su worker falló o murió, un error solo para esa imagen"""
+    try:
+        return future.result()
+    except Exception as e:
+        # La imagen puede no tener la culpa (otra tumbó el worker): se vuelve a intentar al reanudar
+        return {'archivo': key, 'success': False, 'error': f"{type(e).__name__}: {e}", 'reintentable': True}
+
+def run_pool(sources, workers, ordered, max_in_flight, adaptive=False):
+    """Repartir las imágenes en el pool y devolver resultados a medida que terminan.
+
+    Solo hay max_in_flight imágenes pendientes a la vez, así un zip enorme no se
+    carga completo en memoria. Si un worker muere (BrokenProcessPool), las imágenes
+    pendientes salen con error y el resto sigue en un pool nuevo.
+    """
+    def new_pool():
+        return ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(adaptive,))
+
+    executor = new_pool()
+    try:
+        pending = deque()
+        keys = {}
+        sources = iter(sources)
+        exhausted = False
+
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_in_flight:
+                try:
+                    key, path, data = next(sources)
+                except StopIteration:
+                    exhausted = True
+                    break
+                try:
+                    future = executor.submit(process_item, key, path, data)
+                except BrokenProcessPool:
+                    executor.shutdown()
+                    executor = new_pool()
+                    future = executor.submit(process_item, key, path, data)
+                pending.append(future)
+                keys[future] = key
+
+            if not pending:
+                break
+
+            if ordered:
+                # Respetar el orden de entrada: esperar siempre al más antiguo
+                future = pending.popleft()
+                yield collect(keys.pop(future), future)
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    yield collect(keys.pop(future), future)
+    finally:
+        executor.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="OCR masivo de tarjetas de empleado (directorio o zip) con salida NDJSON"
+    )
+    parser.add_argument("origen", help="Directorio o archivo .zip con imágenes de tarjetas")
+    parser.add_argument("-o", "--salida", help="Archivo NDJSON de salida (por defecto stdout)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="Número de procesos OCR (por defecto, uno por núcleo)")
+    parser.add_argument("--desordenado", action="store_true",
+                        help="Emitir cada resultado en cuanto termine, sin respetar el orden de entrada")
+    parser.add_argument("--checkpoint",
+                        help="Archivo de control: se omiten las imágenes ya registradas y se agregan las nuevas")
+    parser.add_argument("--adaptativo", action="store_true",
+                        help="OCR adaptativo: escalar preprocesado/PSM solo en tarjetas difíciles")
+    parser.add_argument("--en-vuelo", type=int, default=0,
+                        help="Máximo de imágenes pendientes en el pool (por defecto 4 por worker)")
+    args = parser.parse_args()
+
+    done_keys = load_checkpoint(args.checkpoint)
+    sources = (item for item in iter_sources(args.origen) if item[0] not in done_keys)
+    max_in_flight = args.en_vuelo or args.workers * 4
+
+    # Al reanudar se agrega a la salida existente
+    mode = 'a' if done_keys else 'w'
+    output = open(args.salida, mode, encoding='utf-8') if args.salida else sys.stdout
+    checkpoint = open(args.checkpoint, 'a', encoding='utf-8') if args.checkpoint else None
+
+    if done_keys:
+        print(f"⏩ Reanudando: {len(done_keys)} imágenes ya procesadas", file=sys.stderr)
+
+    processed = failed = escalated = 0
+    start = time.perf_counter()
+    try:
+        for result in run_pool(sources, args.workers, not args.desordenado, max_in_flight, args.adaptativo):
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+            # Registrar en el checkpoint solo después de escribir el resultado
+            if checkpoint and not result.get('reintentable'):
+                checkpoint.write(result['archivo'] + "\n")
+                checkpoint.flush()
+            processed += 1
+            failed += not result['success']
+            escalated += result.get('ocr_adaptativo', {}).get('intentos', 1) > 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if checkpoint:
+            checkpoint.close()
+
+    elapsed = time.perf_counter() - start
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"\n✅ {processed} imágenes procesadas ({failed} con error) en {elapsed:.1f}s", file=sys.stderr)
+    print(f"   - {rate:.2f} imágenes/s en total, {rate / args.workers:.2f} imágenes/s por núcleo "
+          f"({args.workers} workers)", file=sys.stderr)
+    if args.adaptativo and processed:
+        print(f"   - Tasa de escalado del OCR adaptativo: {escalated / processed:.1%}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
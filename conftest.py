@@ -0,0 +1,31 @@
+"""Fixtures compartidas de las pruebas (python -m pytest -q)"""
+import random
+import sqlite3
+
+import pytest
+
+from create_database import SCHEMA, generate_sample_data
+from models.database import release_database
+
+@pytest.fixture
+def empleados():
+    """Empleados de prueba reproducibles (mismo generador que create_database.py)"""
+    random.seed(42)
+    return generate_sample_data(200)
+
+@pytest.fixture
+def empresa_db(tmp_path, empleados):
+    """Ruta de una empresa.db temporal con los empleados de prueba (ids 1..200)"""
+    path = str(tmp_path / "empresa.db")
+    conn = sqlite3.connect(path)
+    conn.execute(SCHEMA)
+    conn.executemany(
+        "INSERT INTO empleados (nombre, departamento, salario, edad, ciudad, experiencia_anos, "
+        "nivel_educacion, fecha_ingreso) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        empleados
+    )
+    conn.commit()
+    conn.close()
+    yield path
+    # Detener el escritor único que hayan abierto las pruebas
+    release_database(path)
@@ -1,8 +1,31 @@
+import argparse
 import sqlite3
 import random
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import os
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models.sharding import (PARTITION_DEPARTMENT, PARTITION_HASH, PARTITIONS, ShardedEmployeeStore,
+                             assign_departments, route, shard_file, write_manifest)
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS empleados (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre TEXT NOT NULL,
+        departamento TEXT NOT NULL,
+        salario INTEGER NOT NULL,
+        edad INTEGER NOT NULL,
+        ciudad TEXT NOT NULL,
+        experiencia_anos INTEGER NOT NULL,
+        nivel_educacion TEXT NOT NULL,
+        fecha_ingreso DATE NOT NULL
+    )
+'''
+
 def create_database():
     """Crear la base de datos y la tabla de empleados"""
     
@@ -14,26 +37,14 @@ def create_database():
     cursor = conn.cursor()
     
     # Crear tabla empleados
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS empleados (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nombre TEXT NOT NULL,
-            departamento TEXT NOT NULL,
-            salario INTEGER NOT NULL,
-            edad INTEGER NOT NULL,
-            ciudad TEXT NOT NULL,
-            experiencia_anos INTEGER NOT NULL,
-            nivel_educacion TEXT NOT NULL,
-            fecha_ingreso DATE NOT NULL
-        )
-    ''')
+    cursor.execute(SCHEMA)
     
     conn.commit()
     print("✅ Tabla 'empleados' creada exitosamente")
     return conn, cursor
 
-def generate_sample_data():
-    """Generar datos de empleados realistas"""
+def generate_sample_data(cantidad=None):
+    """Generar datos de empleados realistas (por defecto uno por nombre de prueba)"""
     
     # Datos de prueba
     nombres = [
@@ -51,7 +62,9 @@ def generate_sample_data():
     
     empleados = []
     
-    for i, nombre in enumerate(nombres):
+    for i in range(cantidad or len(nombres)):
+        # Con más empleados que nombres, los nombres se repiten
+        nombre = nombres[i % len(nombres)]
         # Generar datos aleatorios pero realistas
         departamento = random.choice(departamentos)
         ciudad = random.choice(ciudades)
@@ -123,6 +136,62 @@ def populate_database(conn, cursor, empleados):
     conn.commit()
     print(f"✅ {len(empleados)} empleados insertados exitosamente")
 
+def create_sharded_database(directorio, empleados, shards, particion):
+    """Repartir los empleados en varios archivos SQLite (uno por shard) y escribir el manifiesto.
+
+    Los ids se asignan aquí, globales y consecutivos, para que no se repitan entre
+    shards; cada shard se escribe en paralelo con su propia conexión.
+    """
+    # Empezar de cero: el manifiesto solo se escribe al terminar la carga
+    if os.path.exists(directorio):
+        shutil.rmtree(directorio)
+    os.makedirs(directorio)
+
+    departments = None
+    if particion == PARTITION_DEPARTMENT:
+        departments = assign_departments({row[1] for row in empleados}, shards)
+
+    partes = [[] for _ in range(shards)]
+    for employee_id, row in enumerate(empleados, start=1):
+        partes[route(particion, shards, employee_id, row[1], departments)].append((employee_id,) + row)
+
+    def load_shard(index):
+        conn = sqlite3.connect(os.path.join(directorio, shard_file(index)))
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(SCHEMA)
+        conn.executemany('''
+            INSERT INTO empleados (id, nombre, departamento, salario, edad, ciudad,
+                                  experiencia_anos, nivel_educacion, fecha_ingreso)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', partes[index])
+        conn.commit()
+        conn.close()
+        return len(partes[index])
+
+    with ThreadPoolExecutor(max_workers=shards) as pool:
+        counts = list(pool.map(load_shard, range(shards)))
+
+    write_manifest(directorio, particion, shards, departments)
+    print(f"✅ {len(empleados)} empleados repartidos en {shards} shards por {particion}: {counts}")
+
+def show_sharded_stats(store):
+    """Mostrar las mismas estadísticas calculadas en paralelo sobre los shards"""
+    summary = store.summary()
+    print_stats(summary["total"], (summary["salario_promedio"], summary["salario_min"], summary["salario_max"],
+                                   summary["edad_promedio"], summary["exp_promedio"]), store.by_department())
+
+def print_stats(total, general_stats, dept_stats):
+    print("\n📊 ESTADÍSTICAS DE LA BASE DE DATOS:")
+    print(f"Total de empleados: {total}")
+    print(f"\nSalario promedio: ${general_stats[0]:,.0f}")
+    print(f"Rango de salarios: ${general_stats[1]:,} - ${general_stats[2]:,}")
+    print(f"Edad promedio: {general_stats[3]:.1f} años")
+    print(f"Experiencia promedio: {general_stats[4]:.1f} años")
+    
+    print(f"\n📋 POR DEPARTAMENTO:")
+    for dept, count, avg_salary, avg_age in dept_stats:
+        print(f"  {dept}: {count} empleados, ${avg_salary:,.0f} promedio, {avg_age:.1f} años promedio")
+
 def show_database_stats(conn, cursor):
     """Mostrar estadísticas de la base de datos"""
     
@@ -150,28 +219,38 @@ def show_database_stats(conn, cursor):
     ''')
     general_stats = cursor.fetchone()
     
-    print("\n📊 ESTADÍSTICAS DE LA BASE DE DATOS:")
-    print(f"Total de empleados: {total}")
-    print(f"\nSalario promedio: ${general_stats[0]:,.0f}")
-    print(f"Rango de salarios: ${general_stats[1]:,} - ${general_stats[2]:,}")
-    print(f"Edad promedio: {general_stats[3]:.1f} años")
-    print(f"Experiencia promedio: {general_stats[4]:.1f} años")
-    
-    print(f"\n📋 POR DEPARTAMENTO:")
-    for dept, count, avg_salary, avg_age in dept_stats:
-        print(f"  {dept}: {count} empleados, ${avg_salary:,.0f} promedio, {avg_age:.1f} años promedio")
+    print_stats(total, general_stats, dept_stats)
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Crear la base de datos de empleados de prueba")
+    parser.add_argument("--empleados", type=int, default=None,
+                        help="Número de empleados (por defecto uno por nombre de prueba)")
+    parser.add_argument("--shards", type=int, default=0,
+                        help="Repartir la tabla en N archivos SQLite en data/shards/ (0: un solo archivo)")
+    parser.add_argument("--particion", choices=PARTITIONS, default=PARTITION_HASH,
+                        help="Criterio de reparto entre shards: hash del id o departamento")
+    parser.add_argument("--directorio", default="data/shards", help="Carpeta de los shards")
+    args = parser.parse_args()
+
+    # Generar datos de prueba
+    print("📝 Generando datos de empleados...")
+    empleados = generate_sample_data(args.empleados)
+
+    if args.shards:
+        print(f"🚀 Creando {args.shards} shards de empleados...")
+        create_sharded_database(args.directorio, empleados, args.shards, args.particion)
+        store = ShardedEmployeeStore.open(args.directorio)
+        show_sharded_stats(store)
+        store.close()
+        print(f"\n✅ Shards creados en '{args.directorio}' (la API los usa en lugar de 'data/empresa.db')")
+        return
+
     print("🚀 Creando base de datos de empleados...")
     
     # Crear base de datos
     conn, cursor = create_database()
     
-    # Generar datos de prueba
-    print("📝 Generando datos de empleados...")
-    empleados = generate_sample_data()
-    
     # Poblar base de datos
     print("💾 Insertando empleados en la base de datos...")
     populate_database(conn, cursor, empleados)
@@ -186,4 +265,4 @@ def main():
     print("📁 Estructura del proyecto lista para continuar con el desarrollo")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
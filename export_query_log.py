@@ -0,0 +1,126 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models.query_log import QUERY_LOG_PATH
+from models.singleflight import normalize_question
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").timestamp()
+
+def build_query(args):
+    """SQL del registro con los filtros de la línea de comandos"""
+    where = []
+    params = []
+    if args.desde:
+        where.append("fecha >= ?")
+        params.append(parse_date(args.desde))
+    if args.hasta:
+        # Hasta el final del día indicado
+        where.append("fecha < ?")
+        params.append(parse_date(args.hasta) + 86400)
+    if args.tenant:
+        where.append("tenant = ?")
+        params.append(args.tenant)
+    if args.categoria:
+        where.append("categoria = ?")
+        params.append(args.categoria)
+    if args.confianza_maxima is not None:
+        where.append("confianza <= ?")
+        params.append(args.confianza_maxima)
+
+    sql = "SELECT fecha, tenant, pregunta, categoria, confianza, latencia_ms FROM preguntas"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql + " ORDER BY id", params
+
+def iter_rows(conn, sql, params):
+    for fecha, tenant, pregunta, categoria, confianza, latencia_ms in conn.execute(sql, params):
+        yield {
+            "fecha": datetime.fromtimestamp(fecha).isoformat(timespec="seconds"),
+            "tenant": tenant,
+            "pregunta": pregunta,
+            "categoria": categoria,
+            "confianza": round(confianza, 4) if confianza is not None else None,
+            "latencia_ms": round(latencia_ms, 2) if latencia_ms is not None else None,
+        }
+
+def group_rows(rows):
+    """Una fila por pregunta normalizada: veces, categoría más frecuente y confianza media"""
+    groups = {}
+    for row in rows:
+        key = normalize_question(row["pregunta"])
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {"pregunta": row["pregunta"], "categorias": {}, "confianzas": [], "veces": 0}
+        group["veces"] += 1
+        group["categorias"][row["categoria"]] = group["categorias"].get(row["categoria"], 0) + 1
+        if row["confianza"] is not None:
+            group["confianzas"].append(row["confianza"])
+
+    # Las más frecuentes primero: son las que más vale la pena revisar
+    for group in sorted(groups.values(), key=lambda g: -g["veces"]):
+        confianzas = group["confianzas"]
+        yield {
+            "pregunta": group["pregunta"],
+            "categoria": max(group["categorias"], key=group["categorias"].get),
+            "confianza": round(sum(confianzas) / len(confianzas), 4) if confianzas else None,
+            "veces": group["veces"],
+            # Más de una categoría para la misma pregunta: el clasificador no es estable en ella
+            "categorias_distintas": len(group["categorias"]),
+        }
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Exportar el registro de preguntas del chatbot como datos de entrenamiento"
+    )
+    parser.add_argument("--db", default=QUERY_LOG_PATH, help="Base de datos del registro")
+    parser.add_argument("-o", "--salida", help="Archivo de salida (por defecto stdout)")
+    parser.add_argument("--formato", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--desde", help="Fecha inicial (AAAA-MM-DD)")
+    parser.add_argument("--hasta", help="Fecha final, incluida (AAAA-MM-DD)")
+    parser.add_argument("--tenant", help="Solo las preguntas de un tenant")
+    parser.add_argument("--categoria", help="Solo una categoría predicha")
+    parser.add_argument("--confianza-maxima", type=float,
+                        help="Solo predicciones con confianza menor o igual (candidatas a mal clasificadas)")
+    parser.add_argument("--agrupar", action="store_true",
+                        help="Una fila por pregunta normalizada con su frecuencia")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        parser.error(f"No existe el registro {args.db}")
+
+    sql, params = build_query(args)
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    rows = iter_rows(conn, sql, params)
+    if args.agrupar:
+        rows = group_rows(rows)
+
+    output = open(args.salida, 'w', encoding='utf-8', newline='') if args.salida else sys.stdout
+    exported = 0
+    try:
+        writer = None
+        for row in rows:
+            if args.formato == "jsonl":
+                output.write(json.dumps(row, ensure_ascii=False) + "\n")
+            else:
+                if writer is None:
+                    writer = csv.DictWriter(output, fieldnames=list(row))
+                    writer.writeheader()
+                writer.writerow(row)
+            exported += 1
+    finally:
+        conn.close()
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"✅ {exported} filas exportadas", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,65 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
 import uvicorn
+import asyncio
+import base64
+import binascii
+import functools
+import hashlib
 import os
 import sys
+import time
 
 # Agregar el directorio actual al path para importar módulos
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from models.classifier import IntentClassifier
-from models.regression import SalaryPredictor
-from models.ocr_processor import OCRProcessor
-import sqlite3
+from models.admission import AdmissionControlMiddleware, DEFAULT_ROUTES, default_budgets
+from models.singleflight import SingleFlight, normalize_question
+from models.compression import CompressionMiddleware
+from models.responses import shape_response
+from models.static_assets import StaticAssetCache
+from models.analytics import run_analytics_query, answer_analytics_question
+from models.tenancy import TenantError, TenantMiddleware, TenantRegistry, tenant_key
+from models.query_compiler import QueryCompiler, answer_filter_question
+from models.warmup import WarmUp, model_set_steps
+from models.hot_reload import MODEL_KINDS, ReloadWatcher
+from models.deadline import DeadlineMiddleware, deadline_stats, default_timeouts
+from models.ocr_jobs import OCRJobQueue
+from models.query_log import QueryLogger
+from models.export import (FORMATS, available_formats, build_export_query, export_stream, iter_row_chunks,
+                           iter_shard_row_chunks)
 import json
 
+# Respuestas JSON con orjson si está instalado (bastante más rápido que el encoder estándar)
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:
+    from fastapi.responses import JSONResponse as FastJSONResponse
+
 # Crear aplicación FastAPI
 app = FastAPI(
     title="Chatbot IA - Sistema de Consultas de RRHH",
     description="API inteligente para consultas de empleados con clasificación, regresión y OCR",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
+# Control de admisión: límites de concurrencia por ruta y descarte con 503 bajo sobrecarga.
+# Se registra antes que CORS para que las respuestas 503 también lleven cabeceras CORS.
+admission_budgets = default_budgets()
+app.add_middleware(AdmissionControlMiddleware, budgets=admission_budgets, routes=DEFAULT_ROUTES)
+
+# Plazo por petición (por ruta o X-Request-Timeout); va fuera de la admisión para contar la espera en cola
+app.add_middleware(DeadlineMiddleware, timeouts=default_timeouts(), routes=DEFAULT_ROUTES)
+
+# Resolver el tenant (X-Tenant o /t/<tenant>/) antes de la admisión, que ve la ruta ya sin prefijo
+app.add_middleware(TenantMiddleware)
+
 # Configurar CORS para permitir peticiones desde el frontend
 app.add_middleware(
     CORSMiddleware,
@@ -32,8 +69,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Montar archivos estáticos
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Compresión gzip/brotli negociada para respuestas grandes (y en streaming)
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.environ.get("COMPRESION_MINIMO", 1024)))
+
+# Archivos estáticos en memoria (precomprimidos, con ETag y caché); se cargan al arrancar
+static_assets = StaticAssetCache("static")
 
 # Modelos Pydantic para las peticiones
 class ChatbotRequest(BaseModel):
@@ -47,39 +87,179 @@ class SalaryPredictionRequest(BaseModel):
 
 class OCRRequest(BaseModel):
     imagen: str  # base64 string
+    adaptativo: bool = False  # escalar preprocesado/PSM solo si faltan campos o hay baja confianza
+
+class OCRJobRequest(BaseModel):
+    imagen: str  # base64 string
+    adaptativo: bool = False
+    callback_url: Optional[str] = None  # POST con el resultado al terminar
+
+class IngestRequest(BaseModel):
+    tarjetas: List[Dict[str, Any]]  # datos_extraidos de /upload-tarjeta
+
+class AnalyticsRequest(BaseModel):
+    operacion: str = "agrupar"  # agrupar | percentiles | top
+    metrica: str = "salario"  # salario | edad | experiencia_anos
+    agrupar_por: Optional[str] = None  # departamento | ciudad | nivel_educacion
+    agregacion: str = "promedio"  # promedio | mediana | suma | conteo | minimo | maximo
+    percentiles: List[float] = [25, 50, 75]
+    k: int = 5
+    ascendente: bool = False
+    filtros: Dict[str, str] = {}
+
+# Base de datos y modelos por tenant. Sin TENANTS_DIR hay un único tenant (data/empresa.db
+# y models/); con TENANTS_DIR cada empresa tiene su carpeta y sus modelos se cargan a demanda
+tenants = TenantRegistry(
+    base_dir=os.environ.get("TENANTS_DIR"),
+    memory_budget_mb=float(os.environ.get("TENANTS_MEMORIA_MB", 512)),
+    max_tenants=int(os.environ["TENANTS_MAXIMO"]) if os.environ.get("TENANTS_MAXIMO") else None
+)
+
+# Coalescencia de peticiones idénticas en curso (no es caché: solo comparte el trabajo simultáneo)
+chatbot_flight = SingleFlight("chatbot", timeout=float(os.environ.get("COALESCENCIA_CHATBOT_ESPERA", 30)))
+prediction_flight = SingleFlight("prediccion", timeout=float(os.environ.get("COALESCENCIA_PREDICCION_ESPERA", 30)))
+ocr_flight = SingleFlight("ocr", timeout=float(os.environ.get("COALESCENCIA_OCR_ESPERA", 120)))
+
+# Plantillas SQL de los filtros compuestos del chatbot (las sentencias preparadas viven en cada conexión)
+query_compiler = QueryCompiler()
 
-# Inicializar modelos
-classifier = IntentClassifier()
-salary_predictor = SalaryPredictor()
-ocr_processor = OCRProcessor()
+# Trabajos OCR asíncronos: cola persistente en SQLite y trabajadores que la vacían por lotes
+ocr_jobs = OCRJobQueue(
+    tenants.hold,
+    db_path=os.environ.get("OCR_JOBS_DB", "data/ocr_jobs.db"),
+    workers=int(os.environ.get("OCR_JOBS_TRABAJADORES", 2)),
+    batch_size=int(os.environ.get("OCR_JOBS_LOTE", 8)),
+    ttl=float(os.environ.get("OCR_JOBS_TTL", 3600)),
+    max_pending=int(os.environ.get("OCR_JOBS_MAX_PENDIENTES", 1000)),
+    callback_senders=int(os.environ.get("OCR_CALLBACK_HILOS", 2)),
+    # Hosts internos a los que sí se permite enviar callbacks (por defecto solo direcciones públicas)
+    callback_hosts=os.environ.get("OCR_CALLBACK_HOSTS", "").split(",")
+)
+
+# Registro write-behind de las preguntas del chatbot (REGISTRO_PREGUNTAS=0 lo desactiva);
+# se exporta como datos de entrenamiento con export_query_log.py
+query_logger = QueryLogger(
+    db_path=os.environ.get("REGISTRO_PREGUNTAS_DB", "data/query_log.db"),
+    max_buffer=int(os.environ.get("REGISTRO_PREGUNTAS_BUFFER", 10000)),
+    flush_size=int(os.environ.get("REGISTRO_PREGUNTAS_LOTE", 500)),
+    flush_interval=float(os.environ.get("REGISTRO_PREGUNTAS_INTERVALO", 2.0))
+)
+REGISTRO_PREGUNTAS = os.environ.get("REGISTRO_PREGUNTAS", "1") != "0"
+
+# Recarga en caliente de modelos: vigilancia de archivos cada RECARGA_INTERVALO segundos
+# (0 la desactiva) y endpoints de administración, protegidos con ADMIN_TOKEN si está definido
+reload_watcher = ReloadWatcher(tenants, interval=float(os.environ.get("RECARGA_INTERVALO", 5)))
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+# Calentamiento: /ready responde 503 hasta que termina (WARMUP=0 lo desactiva; con
+# WARMUP_BLOQUEANTE=1 se hace dentro del arranque y el puerto no abre hasta terminar)
+warmup = WarmUp()
+WARMUP_ACTIVO = os.environ.get("WARMUP", "1") != "0"
+WARMUP_BLOQUEANTE = os.environ.get("WARMUP_BLOQUEANTE", "0") == "1"
+WARMUP_PREGUNTAS = [
+    "¿Cuántos empleados hay?",
+    "¿Quién es el empleado con mayor salario?",
+    "¿Cuál es el promedio de edad?",
+    "¿Cuántos empleados de IT en Monterrey con maestría ganan más de 50000?",
+    "¿Quién es el empleado más joven?",
+    "¿Cuánto ganaría alguien de 30 años con 5 años de experiencia en IT?",
+    "¿Cuál es el salario promedio por departamento?",
+]
 
 @app.on_event("startup")
 async def startup_event():
     """Inicializar modelos al arrancar la aplicación"""
     print("🚀 Inicializando modelos de IA...")
     
-    # Entrenar/cargar clasificador
+    # Cargar y precomprimir el frontend
     try:
-        classifier.load_model()
-        print("✅ Clasificador de intenciones listo")
+        archivos = static_assets.load()
+        print(f"✅ {archivos} archivos estáticos en memoria")
     except Exception as e:
-        print(f"⚠️ Error cargando clasificador: {e}")
-        classifier.train()
+        print(f"⚠️ Error cargando archivos estáticos: {e}")
+    
+    # En modo de un solo tenant se carga todo al arrancar; con varios, en la primera petición
+    if not tenants.enabled:
+        tenants.get()
+    else:
+        print(f"🏢 Modo multi-tenant: {tenants.base_dir} (carga a demanda)")
+    
+    print("🎯 Todos los modelos están listos!")
     
-    # Entrenar/cargar predictor de salarios
     try:
-        salary_predictor.load_model()
-        print("✅ Predictor de salarios listo")
+        ocr_jobs.start()
+        print(f"✅ Cola de trabajos OCR lista ({ocr_jobs.workers} trabajadores)")
     except Exception as e:
-        print(f"⚠️ Error cargando predictor: {e}")
-        salary_predictor.train()
+        print(f"⚠️ Error abriendo la cola de trabajos OCR: {e}")
     
-    print("🎯 Todos los modelos están listos!")
+    if REGISTRO_PREGUNTAS:
+        try:
+            query_logger.start()
+        except Exception as e:
+            print(f"⚠️ Error abriendo el registro de preguntas: {e}")
+    
+    if reload_watcher.interval > 0:
+        reload_watcher.start()
+        print(f"👀 Vigilando archivos de modelos cada {reload_watcher.interval:g}s")
+    
+    # Sin modelos que calentar (multi-tenant) o desactivado: listo al terminar el arranque
+    if not WARMUP_ACTIVO or tenants.enabled:
+        warmup.mark_ready()
+    elif WARMUP_BLOQUEANTE:
+        await run_warmup()
+    else:
+        # /health ya responde mientras tanto; el balanceador espera a /ready
+        app.state.warmup_task = asyncio.create_task(run_warmup())
+
+async def run_warmup():
+    """Calentar base de datos, modelos, OCR y el camino completo del chatbot"""
+    models = tenants.get()
+    await warmup.run(model_set_steps(models) + [("chatbot", functools.partial(warm_chatbot, models))])
+
+async def warm_chatbot(models):
+    """Responder preguntas representativas de cada categoría (reglas, modelo, SQL y analítica)"""
+    for pregunta in WARMUP_PREGUNTAS:
+        await answer_question(pregunta, models)
+    # Las métricas empiezan con el primer usuario real
+    models.router.reset_stats()
+    models.shadow.reset_stats()
+    query_compiler.reset_stats()
+    return {"preguntas": len(WARMUP_PREGUNTAS)}
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Confirmar las escrituras pendientes antes de salir"""
+    reload_watcher.stop()
+    ocr_jobs.stop()
+    query_logger.stop()
+    tenants.close_all()
+
+async def tenant_models():
+    """Base de datos y modelos del tenant de la petición (400/404 si falta o no existe)"""
+    try:
+        return await tenants.acquire()
+    except TenantError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+def static_response(request: Request, ruta: str):
+    """Responder un archivo estático desde memoria (variante comprimida, 304 o 404)"""
+    status, headers, body = static_assets.serve(
+        ruta,
+        accept_encoding=request.headers.get("accept-encoding"),
+        if_none_match=request.headers.get("if-none-match"),
+        version=request.query_params.get("v")
+    )
+    return Response(content=body, status_code=status, headers=headers)
 
 @app.get("/")
-async def root():
+async def root(request: Request):
     """Endpoint raíz - Servir el frontend"""
-    return FileResponse("static/index.html")
+    return static_response(request, "index.html")
+
+@app.api_route("/static/{ruta:path}", methods=["GET", "HEAD"])
+async def static_files(request: Request, ruta: str):
+    """Archivos estáticos; con ?v=<hash> se cachean como inmutables"""
+    return static_response(request, ruta)
 
 @app.get("/api")
 async def api_info():
@@ -91,142 +271,164 @@ async def api_info():
             "chatbot": "/chatbot",
             "predict_salary": "/predict-salario",
             "upload_card": "/upload-tarjeta",
+            "upload_document": "/upload-tarjetas",
+            "ocr_jobs": "/ocr/jobs",
+            "ingest_cards": "/empleados/ingest",
+            "analytics": "/analytics",
+            "metrics": "/metrics",
+            "ready": "/ready",
             "docs": "/docs",
             "frontend": "/"
         }
     }
 
 @app.post("/chatbot")
-async def chatbot_endpoint(request: ChatbotRequest):
+async def chatbot_endpoint(request: ChatbotRequest, verbose: bool = True, fields: Optional[str] = None):
     """Endpoint principal del chatbot"""
+    models = await tenant_models()
     try:
-        # Clasificar la pregunta
-        classification = classifier.predict(request.pregunta)
-        
-        # Generar respuesta basada en la categoría
-        respuesta = await generate_response(request.pregunta, classification)
-        
-        return {
-            "respuesta": respuesta,
-            "categoria": classification["categoria"],
-            "confianza": classification["confianza"],
-            "probabilidades": classification["probabilidades"]
-        }
+        start = time.perf_counter()
+        # Preguntas iguales (normalizadas) del mismo tenant que llegan a la vez comparten una respuesta
+        response = await chatbot_flight.do(
+            tenant_key(normalize_question(request.pregunta)), answer_question, request.pregunta, models
+        )
+        # Solo se agrega a un búfer en memoria: la escritura en SQLite va por lotes en otro hilo
+        query_logger.log(
+            request.pregunta, response["categoria"], response["confianza"],
+            (time.perf_counter() - start) * 1000, models.tenant
+        )
+        # Devolver la respuesta ya construida evita la pasada de jsonable_encoder de FastAPI
+        return FastJSONResponse(shape_response(response, verbose, fields))
     
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Tiempo de espera agotado en el chatbot")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error en el chatbot: {str(e)}")
 
-async def generate_response(pregunta: str, classification: dict):
+async def answer_question(pregunta: str, models):
+    """Clasificar la pregunta y generar la respuesta completa del chatbot con los modelos del tenant"""
+    # Clasificar la pregunta (reglas primero, modelo si es ambigua) fuera del event loop,
+    # así las preguntas repetidas que llegan mientras tanto se suman a esta ejecución
+    classification = await run_in_threadpool(models.router.predict, pregunta)
+    # Muestra para el clasificador candidato, si hay uno en sombra (no espera su resultado)
+    models.shadow.observe_question(pregunta)
+    
+    # Generar respuesta basada en la categoría
+    respuesta = await generate_response(models, pregunta, classification)
+    
+    return {
+        "respuesta": respuesta,
+        "categoria": classification["categoria"],
+        "confianza": classification["confianza"],
+        "probabilidades": classification["probabilidades"]
+    }
+
+async def generate_response(models, pregunta: str, classification: dict):
     """Generar respuesta basada en la categoría clasificada"""
     categoria = classification["categoria"]
     
     if categoria == "conteo":
-        return await get_employee_count()
+        return await get_employee_count(models)
     
     elif categoria == "busqueda_max":
-        return await get_highest_salary_employee()
+        return await get_highest_salary_employee(models)
     
     elif categoria == "estadistica":
-        return await get_statistics()
+        return await get_statistics(models)
     
     elif categoria == "filtro":
-        return await get_filtered_count(pregunta)
+        return await get_filtered_count(models, pregunta)
     
     elif categoria == "busqueda_min":
-        return await get_youngest_employee()
+        return await get_youngest_employee(models)
     
     elif categoria == "prediccion":
-        return await get_salary_prediction(pregunta)
+        return await get_salary_prediction(models, pregunta)
+    
+    elif categoria == "analitica":
+        return await get_analytics_answer(models, pregunta)
     
     else:
         return "Lo siento, no entiendo tu pregunta. ¿Podrías reformularla?"
 
-async def get_employee_count():
+async def get_employee_count(models):
     """Obtener conteo total de empleados"""
-    conn = sqlite3.connect('data/empresa.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM empleados")
-    count = cursor.fetchone()[0]
-    conn.close()
+    if models.shards is not None:
+        count = models.shards.count()
+    else:
+        cursor = models.db.reader().cursor()
+        cursor.execute("SELECT COUNT(*) FROM empleados")
+        count = cursor.fetchone()[0]
     
     return f"Actualmente hay {count} empleados en la empresa."
 
-async def get_highest_salary_employee():
+async def get_highest_salary_employee(models):
     """Obtener empleado con mayor salario"""
-    conn = sqlite3.connect('data/empresa.db')
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT nombre, departamento, salario 
-        FROM empleados 
-        ORDER BY salario DESC 
-        LIMIT 1
-    """)
-    employee = cursor.fetchone()
-    conn.close()
+    if models.shards is not None:
+        employee = models.shards.top("salario", descending=True, columns="nombre, departamento, salario")
+    else:
+        cursor = models.db.reader().cursor()
+        cursor.execute("""
+            SELECT nombre, departamento, salario 
+            FROM empleados 
+            ORDER BY salario DESC 
+            LIMIT 1
+        """)
+        employee = cursor.fetchone()
     
     if employee:
         return f"El empleado mejor pagado es {employee[0]} del departamento de {employee[1]} con un salario de ${employee[2]:,}."
     else:
         return "No se encontraron empleados."
 
-async def get_statistics():
+async def get_statistics(models):
     """Obtener estadísticas generales"""
-    conn = sqlite3.connect('data/empresa.db')
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT 
-            AVG(edad) as edad_promedio,
-            AVG(salario) as salario_promedio,
-            AVG(experiencia_anos) as exp_promedio
-        FROM empleados
-    """)
-    stats = cursor.fetchone()
-    conn.close()
+    if models.shards is not None:
+        # Promedios exactos a partir de SUM y COUNT de cada shard, calculados en paralelo
+        summary = models.shards.summary()
+        stats = (summary["edad_promedio"], summary["salario_promedio"], summary["exp_promedio"])
+    else:
+        cursor = models.db.reader().cursor()
+        cursor.execute("""
+            SELECT 
+                AVG(edad) as edad_promedio,
+                AVG(salario) as salario_promedio,
+                AVG(experiencia_anos) as exp_promedio
+            FROM empleados
+        """)
+        stats = cursor.fetchone()
     
     return f"Estadísticas de la empresa: Edad promedio {stats[0]:.1f} años, salario promedio ${stats[1]:,.0f}, experiencia promedio {stats[2]:.1f} años."
 
-async def get_filtered_count(pregunta: str):
-    """Obtener conteo filtrado por departamento"""
-    # Extraer departamento de la pregunta
-    departamentos = ["ventas", "it", "marketing", "finanzas", "recursos humanos"]
-    departamento = None
-    
-    pregunta_lower = pregunta.lower()
-    for dept in departamentos:
-        if dept in pregunta_lower:
-            departamento = dept
-            break
-    
-    if not departamento:
-        return "Por favor, especifica un departamento (Ventas, IT, Marketing, Finanzas, Recursos Humanos)."
-    
-    conn = sqlite3.connect('data/empresa.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM empleados WHERE LOWER(departamento) = ?", (departamento,))
-    count = cursor.fetchone()[0]
-    conn.close()
-    
-    return f"Hay {count} empleados en el departamento de {departamento.title()}."
+async def get_filtered_count(models, pregunta: str):
+    """Obtener conteo con filtros compuestos (departamento, ciudad, educación y rangos)"""
+    conn = models.db.reader() if models.shards is None else None
+    respuesta = answer_filter_question(query_compiler, conn, pregunta, shards=models.shards)
+    if respuesta is None:
+        return ("Por favor, especifica algún filtro: departamento (Ventas, IT, Marketing, Finanzas, "
+                "Recursos Humanos), ciudad, nivel de educación, o un rango de salario, edad o experiencia.")
+    return respuesta
 
-async def get_youngest_employee():
+async def get_youngest_employee(models):
     """Obtener empleado más joven"""
-    conn = sqlite3.connect('data/empresa.db')
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT nombre, edad, departamento 
-        FROM empleados 
-        ORDER BY edad ASC 
-        LIMIT 1
-    """)
-    employee = cursor.fetchone()
-    conn.cursor()
+    if models.shards is not None:
+        employee = models.shards.top("edad", descending=False, columns="nombre, edad, departamento")
+    else:
+        cursor = models.db.reader().cursor()
+        cursor.execute("""
+            SELECT nombre, edad, departamento 
+            FROM empleados 
+            ORDER BY edad ASC 
+            LIMIT 1
+        """)
+        employee = cursor.fetchone()
     
     if employee:
         return f"El empleado más joven es {employee[0]} con {employee[1]} años del departamento de {employee[2]}."
     else:
         return "No se encontraron empleados."
 
-async def get_salary_prediction(pregunta: str):
+async def get_salary_prediction(models, pregunta: str):
     """Obtener predicción de salario"""
     # Extraer información de la pregunta (simplificado)
     # En un caso real, usarías NLP más avanzado
@@ -276,13 +478,22 @@ async def get_salary_prediction(pregunta: str):
             break
     
     # Hacer predicción
-    prediction = salary_predictor.predict(edad, experiencia, departamento, educacion)
+    prediction = models.salary_predictor.predict(edad, experiencia, departamento, educacion)
+    models.shadow.observe_prediction(edad, experiencia, departamento, educacion)
     
     return f"Para un empleado de {edad} años con {experiencia} años de experiencia en {departamento} con {educacion}, el salario predicho sería aproximadamente ${prediction['salario_predicho']:,.0f}."
 
+async def get_analytics_answer(models, pregunta: str):
+    """Responder preguntas analíticas con el almacén columnar"""
+    employee_store = models.employee_store
+    # El refresco lee SQLite: fuera del event loop
+    await run_in_threadpool(employee_store.refresh)
+    return answer_analytics_question(employee_store, pregunta)
+
 @app.post("/predict-salario")
-async def predict_salary_endpoint(request: SalaryPredictionRequest):
+async def predict_salary_endpoint(request: SalaryPredictionRequest, verbose: bool = True, fields: Optional[str] = None):
     """Endpoint para predicción de salario"""
+    models = await tenant_models()
     try:
         # Validar datos de entrada
         if request.edad < 18 or request.edad > 70:
@@ -291,59 +502,298 @@ async def predict_salary_endpoint(request: SalaryPredictionRequest):
         if request.experiencia_anos < 0 or request.experiencia_anos > 50:
             raise HTTPException(status_code=400, detail="La experiencia debe estar entre 0 y 50 años")
         
-        # Hacer predicción
-        prediction = salary_predictor.predict(
-            request.edad,
-            request.experiencia_anos,
-            request.departamento,
-            request.nivel_educacion
+        # Hacer predicción (una sola por combinación de features en curso)
+        features = (request.edad, request.experiencia_anos, request.departamento, request.nivel_educacion)
+        prediction = await prediction_flight.do(
+            tenant_key(features), run_in_threadpool, models.salary_predictor.predict, *features
         )
+        models.shadow.observe_prediction(*features)
         
-        return {
+        return FastJSONResponse(shape_response({
             "salario_predicho": prediction["salario_predicho"],
             "confianza": prediction["confianza"],
             "features_usadas": prediction["features_usadas"]
-        }
+        }, verbose, fields))
     
+    except HTTPException:
+        raise
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Tiempo de espera agotado en la predicción")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error en predicción: {str(e)}")
 
 @app.post("/upload-tarjeta")
-async def upload_card_endpoint(request: OCRRequest):
+async def upload_card_endpoint(request: OCRRequest, verbose: bool = True, fields: Optional[str] = None):
     """Endpoint para procesar tarjetas de empleado con OCR"""
+    models = await tenant_models()
     try:
         # Procesar imagen
-        result = ocr_processor.process_image(request.imagen)
+        # El OCR corre en el threadpool para no bloquear el event loop (y al resto de rutas).
+        # La misma imagen reenviada mientras se procesa espera al primer OCR en vez de repetirlo.
+        key = tenant_key((hashlib.sha256(request.imagen.encode()).hexdigest(), request.adaptativo))
+        result = await ocr_flight.do(
+            key, run_in_threadpool, models.ocr_processor.process_image, request.imagen, adaptive=request.adaptativo
+        )
         
         if result["success"]:
-            return {
+            response = {
                 "datos_extraidos": result["datos_extraidos"],
                 "success": True,
                 "texto_extraido": result["texto_extraido"],
                 "validacion": result["validacion"]
             }
+            if "ocr_adaptativo" in result:
+                response["ocr_adaptativo"] = result["ocr_adaptativo"]
         else:
-            return {
+            response = {
                 "datos_extraidos": {},
                 "success": False,
                 "error": result["error"],
                 "texto_extraido": result["texto_extraido"],
                 "validacion": {}
             }
+        # verbose=false omite el texto OCR crudo y la lista de empleados similares
+        return FastJSONResponse(shape_response(response, verbose, fields))
+    
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Tiempo de espera agotado en OCR")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error en OCR: {str(e)}")
+
+@app.post("/upload-tarjetas")
+async def upload_document_endpoint(request: OCRRequest, verbose: bool = True, fields: Optional[str] = None):
+    """Endpoint para documentos con varias páginas (TIFF, PDF) y/o varias tarjetas por página"""
+    models = await tenant_models()
+    try:
+        image_data = base64.b64decode(request.imagen, validate=True)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="La imagen no es base64 válido")
+    
+    try:
+        # Las regiones de todas las páginas se reparten en el pool OCR compartido
+        result = await run_in_threadpool(models.ocr_processor.process_document, image_data, request.adaptativo)
+        if not result["success"]:
+            return FastJSONResponse(shape_response(result, verbose, fields), status_code=400)
+        return FastJSONResponse(shape_response(result, verbose, fields))
     
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Tiempo de espera agotado en OCR")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error en OCR: {str(e)}")
 
+@app.post("/ocr/jobs", status_code=202)
+async def create_ocr_job_endpoint(request: OCRJobRequest):
+    """Encolar una tarjeta para OCR y devolver el id del trabajo sin esperar al resultado"""
+    models = await tenant_models()
+    try:
+        image_data = base64.b64decode(request.imagen, validate=True)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="La imagen no es base64 válido")
+    
+    try:
+        job_id = await run_in_threadpool(
+            ocr_jobs.submit, image_data, models.tenant, request.adaptativo, request.callback_url
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OverflowError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    
+    return {"job_id": job_id, "estado": "pendiente", "url": f"/ocr/jobs/{job_id}"}
+
+@app.get("/ocr/jobs/{job_id}")
+async def get_ocr_job_endpoint(job_id: str, verbose: bool = True, fields: Optional[str] = None):
+    """Estado de un trabajo OCR y, si terminó, su resultado"""
+    models = await tenant_models()
+    job = await run_in_threadpool(ocr_jobs.get, job_id, models.tenant)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo OCR no encontrado o caducado")
+    if job["resultado"] is not None:
+        job["resultado"] = shape_response(job["resultado"], verbose, fields)
+    return job
+
+@app.post("/empleados/ingest")
+async def ingest_endpoint(request: IngestRequest):
+    """Endpoint para dar de alta/actualizar empleados a partir de muchas tarjetas OCR"""
+    models = await tenant_models()
+    try:
+        resumen = await run_in_threadpool(models.ingestor.ingest, request.tarjetas)
+        
+        # Mantener sincronizado el almacén analítico (las filas nuevas se detectan solas)
+        await run_in_threadpool(models.employee_store.refresh, changed_ids=resumen.pop("ids_actualizados"))
+        
+        return resumen
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error en ingesta: {str(e)}")
+
+@app.get("/empleados/export")
+async def export_endpoint(
+    formato: str = "csv",
+    departamento: Optional[str] = None,
+    ciudad: Optional[str] = None,
+    nivel_educacion: Optional[str] = None,
+    columnas: Optional[str] = None,
+    lote: int = 1000
+):
+    """Exportar empleados en streaming (CSV, NDJSON, Parquet o Arrow) con filtros y proyección"""
+    models = await tenant_models()
+    if formato not in available_formats():
+        raise HTTPException(status_code=400, detail=f"Formato no disponible: {formato}. Usa: {', '.join(available_formats())}")
+    if not 1 <= lote <= 50000:
+        raise HTTPException(status_code=400, detail="El lote debe estar entre 1 y 50000 filas")
+    
+    try:
+        sql, params, columnas = build_export_query(
+            {"departamento": departamento, "ciudad": ciudad, "nivel_educacion": nivel_educacion},
+            [c.strip() for c in columnas.split(',') if c.strip()] if columnas else None,
+            with_id=models.shards is not None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Se lee y serializa un lote a la vez: la memoria no crece con el tamaño de la exportación
+    if models.shards is not None:
+        row_chunks = iter_shard_row_chunks(sql, params, models.shards, lote)
+    else:
+        row_chunks = iter_row_chunks(sql, params, lote, models.db_path)
+    media_type, extension = FORMATS[formato]
+    return StreamingResponse(
+        export_stream(formato, columnas, row_chunks),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="empleados.{extension}"'}
+    )
+
+@app.post("/analytics")
+async def analytics_endpoint(request: AnalyticsRequest):
+    """Endpoint de consultas analíticas agrupadas (promedios, percentiles, top-k)"""
+    models = await tenant_models()
+    employee_store = models.employee_store
+    try:
+        await run_in_threadpool(employee_store.refresh)
+        resultado = run_analytics_query(employee_store, request.model_dump())
+        return {
+            "resultado": resultado,
+            "empleados_cargados": len(employee_store)
+        }
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error en analítica: {str(e)}")
+
+def check_admin(request: Request):
+    """Exigir X-Admin-Token cuando ADMIN_TOKEN está definido"""
+    if ADMIN_TOKEN and request.headers.get("x-admin-token") != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Token de administración inválido")
+
+def parse_model_kinds(modelo: str):
+    if modelo == "todos":
+        return list(MODEL_KINDS)
+    if modelo not in MODEL_KINDS:
+        raise HTTPException(status_code=400, detail=f"Modelo no válido: {modelo}. Usa: todos, {', '.join(MODEL_KINDS)}")
+    return [modelo]
+
+@app.post("/admin/modelos/recargar")
+async def reload_models_endpoint(request: Request, modelo: str = "todos"):
+    """Recargar modelos desde disco: validar y activar sin reiniciar (o mantener el actual si fallan)"""
+    check_admin(request)
+    kinds = parse_model_kinds(modelo)
+    models = await tenant_models()
+    # La carga y la validación van en un hilo; las peticiones siguen con el modelo actual
+    resultados = await run_in_threadpool(models.reloader.reload, kinds, "admin")
+    return {"resultados": resultados, "versiones": models.reloader.get_versions()}
+
+@app.post("/admin/modelos/rollback")
+async def rollback_model_endpoint(request: Request, modelo: str):
+    """Volver a la versión anterior de un modelo"""
+    check_admin(request)
+    kind = parse_model_kinds(modelo)[0] if modelo != "todos" else None
+    if kind is None:
+        raise HTTPException(status_code=400, detail="El rollback es por modelo: clasificador o predictor")
+    models = await tenant_models()
+    try:
+        version = await run_in_threadpool(models.reloader.rollback, kind)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"modelo": kind, "version": version}
+
+@app.get("/admin/sombra")
+async def shadow_report_endpoint(request: Request):
+    """Informe de la evaluación en sombra: coincidencia, diferencias y latencia actual vs candidato"""
+    check_admin(request)
+    models = await tenant_models()
+    return FastJSONResponse(models.shadow.report())
+
+@app.post("/admin/sombra/cargar")
+async def load_shadow_endpoint(request: Request, modelo: str = "todos", muestreo: Optional[float] = None):
+    """Cargar candidatos de models/candidato/ y empezar a evaluarlos en sombra (reinicia el informe)"""
+    check_admin(request)
+    kinds = parse_model_kinds(modelo)
+    if muestreo is not None and not 0 <= muestreo <= 1:
+        raise HTTPException(status_code=400, detail="El muestreo debe estar entre 0 y 1")
+    models = await tenant_models()
+    resultados = await run_in_threadpool(models.shadow.load, kinds)
+    if muestreo is not None:
+        models.shadow.sample_rate = muestreo
+    return {"resultados": resultados, "muestreo": models.shadow.sample_rate}
+
+@app.post("/admin/sombra/detener")
+async def stop_shadow_endpoint(request: Request, modelo: str = "todos"):
+    """Dejar de evaluar candidatos en sombra (el informe se conserva hasta la próxima carga)"""
+    check_admin(request)
+    kinds = parse_model_kinds(modelo)
+    models = await tenant_models()
+    models.shadow.unload(kinds)
+    return {"activa": models.shadow.active}
+
 @app.get("/health")
 async def health_check():
     """Endpoint de verificación de salud"""
+    # Modelos del tenant de la petición, solo si ya están en memoria (no fuerza la carga)
+    models = tenants.peek()
     return {
         "status": "healthy",
         "models_loaded": {
-            "classifier": classifier.pipeline is not None,
-            "salary_predictor": salary_predictor.model is not None,
-            "ocr_processor": True
-        }
+            "classifier": models is not None and (
+                models.classifier.compiled is not None or models.classifier.pipeline is not None
+            ),
+            "salary_predictor": models is not None and models.salary_predictor.model is not None,
+            "ocr_processor": models is not None
+        },
+        "model_versions": models.reloader.get_versions() if models else {}
+    }
+
+@app.get("/ready")
+async def readiness_check():
+    """Endpoint de disponibilidad: 200 solo cuando terminó el calentamiento (distinto de /health)"""
+    stats = warmup.get_stats()
+    if not warmup.ready:
+        return FastJSONResponse(stats, status_code=503, headers={"Retry-After": "5"})
+    return FastJSONResponse(stats)
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Endpoint de métricas de operación"""
+    # Las métricas por modelo son del tenant de la petición (vacías si no está cargado)
+    models = tenants.peek()
+    return {
+        "enrutador": models.router.get_stats() if models else {},
+        "escritor_db": models.db.get_stats() if models else {},
+        "ocr_adaptativo": models.ocr_processor.get_adaptive_stats() if models else {},
+        "admision": {name: budget.get_stats() for name, budget in admission_budgets.items()},
+        "coalescencia": {
+            flight.name: flight.get_stats() for flight in (chatbot_flight, prediction_flight, ocr_flight)
+        },
+        "estaticos": static_assets.get_stats(),
+        "consultas_filtro": query_compiler.get_stats(),
+        "recarga_modelos": models.reloader.get_stats() if models else {},
+        "sombra": models.shadow.get_stats() if models else {},
+        "shards": models.shards.get_stats() if models and models.shards is not None else {},
+        "plazos": deadline_stats.get_stats(),
+        "registro_preguntas": query_logger.get_stats(),
+        "trabajos_ocr": ocr_jobs.get_stats() if ocr_jobs.db is not None else {},
+        "tenants": tenants.get_stats()
     }
 
 if __name__ == "__main__":
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import os
+
+from models.deadline import remaining
+
+class RouteBudget:
+    """Presupuesto de concurrencia de un grupo de rutas: en curso, cola y espera máxima"""
+
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout, retry_after=1):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.waiting = 0
+        self.stats = {"admitidas": 0, "encoladas": 0, "rechazadas_cola_llena": 0, "rechazadas_timeout": 0}
+
+    async def acquire(self):
+        """Intentar entrar; devuelve False si hay que descartar la petición"""
+        if self.in_flight < self.max_concurrent and not self.waiting:
+            await self.semaphore.acquire()
+        else:
+            # Cola llena: descartar de inmediato en lugar de acumular trabajo
+            if self.waiting >= self.max_queue:
+                self.stats["rechazadas_cola_llena"] += 1
+                return False
+
+            self.stats["encoladas"] += 1
+            self.waiting += 1
+            # No esperar en cola más de lo que le queda a la petición
+            left = remaining()
+            timeout = self.queue_timeout if left is None else max(0.0, min(self.queue_timeout, left))
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), timeout=timeout)
+            except asyncio.TimeoutError:
+                self.stats["rechazadas_timeout"] += 1
+                return False
+            finally:
+                self.waiting -= 1
+
+        self.in_flight += 1
+        self.stats["admitidas"] += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self.semaphore.release()
+
+    def get_stats(self):
+        return {
+            **self.stats,
+            "en_curso": self.in_flight,
+            "en_cola": self.waiting,
+            "max_concurrencia": self.max_concurrent,
+            "max_cola": self.max_queue
+        }
+
+# Qué presupuesto aplica a cada ruta; las que no aparecen no se limitan
+DEFAULT_ROUTES = {
+    "/chatbot": "ligera",
+    "/predict-salario": "ligera",
+    "/analytics": "ligera",
+    "/upload-tarjeta": "ocr",
+    "/upload-tarjetas": "ocr",
+    # Encolar o consultar un trabajo OCR es barato: el OCR lo hacen los trabajadores
+    "/ocr/jobs": "ligera",
+    "/empleados/ingest": "pesada",
+    "/empleados/export": "exportacion",
+}
+
+def default_budgets():
+    """Presupuestos por defecto (sobrescribibles con variables de entorno)"""
+    return {
+        "ligera": RouteBudget(
+            "ligera",
+            max_concurrent=int(os.environ.get("ADMISION_LIGERA_CONCURRENCIA", 32)),
+            max_queue=int(os.environ.get("ADMISION_LIGERA_COLA", 128)),
+            queue_timeout=float(os.environ.get("ADMISION_LIGERA_ESPERA", 1.0)),
+            retry_after=1
+        ),
+        "ocr": RouteBudget(
+            "ocr",
+            # Tesseract usa un núcleo por imagen: más concurrencia solo alarga las colas
+            max_concurrent=int(os.environ.get("ADMISION_OCR_CONCURRENCIA", os.cpu_count() or 2)),
+            max_queue=int(os.environ.get("ADMISION_OCR_COLA", 8)),
+            queue_timeout=float(os.environ.get("ADMISION_OCR_ESPERA", 5.0)),
+            retry_after=5
+        ),
+        "pesada": RouteBudget(
+            "pesada",
+            max_concurrent=int(os.environ.get("ADMISION_PESADA_CONCURRENCIA", 2)),
+            max_queue=int(os.environ.get("ADMISION_PESADA_COLA", 4)),
+            queue_timeout=float(os.environ.get("ADMISION_PESADA_ESPERA", 10.0)),
+            retry_after=10
+        ),
+        "exportacion": RouteBudget(
+            "exportacion",
+            # Las exportaciones duran mucho pero usan poca CPU: presupuesto propio para no frenar la ingesta
+            max_concurrent=int(os.environ.get("ADMISION_EXPORT_CONCURRENCIA", 4)),
+            max_queue=int(os.environ.get("ADMISION_EXPORT_COLA", 8)),
+            queue_timeout=float(os.environ.get("ADMISION_EXPORT_ESPERA", 5.0)),
+            retry_after=10
+        ),
+    }
+
+class AdmissionControlMiddleware:
+    """Middleware ASGI de control de admisión: límite de concurrencia por ruta y
+    descarte rápido con 503 + Retry-After cuando se agota el presupuesto.
+
+    Las rutas que no aparecen en `routes` (p. ej. /health) nunca se limitan.
+    """
+
+    def __init__(self, app, budgets, routes):
+        self.app = app
+        self.budgets = budgets
+        # Prefijos más largos primero para que la coincidencia sea la más específica
+        self.routes = sorted(routes.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def resolve(self, path):
+        for prefix, budget_name in self.routes:
+            if path == prefix or path.startswith(prefix.rstrip('/') + '/'):
+                return self.budgets[budget_name]
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget = self.resolve(scope["path"])
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await budget.acquire():
+            await self.reject(budget, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            budget.release()
+
+    async def reject(self, budget, send):
+        body = json.dumps({
+            "detail": "Servicio saturado, intenta de nuevo en unos segundos"
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(budget.retry_after).encode()),
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
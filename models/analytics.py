@@ -0,0 +1,436 @@
+import os
+import re
+import sys
+import threading
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import DB_PATH, get_database
+from models.vocabulary import DEPARTAMENTOS, CIUDADES, NIVELES_EDUCACION, find_keyword
+
+METRICAS = {
+    "salario": "salario",
+    "sueldo": "salario",
+    "edad": "edad",
+    "experiencia": "experiencia_anos"
+}
+
+AGRUPACIONES = {
+    "departamento": "departamento",
+    "área": "departamento",
+    "area": "departamento",
+    "ciudad": "ciudad",
+    "educación": "nivel_educacion",
+    "educacion": "nivel_educacion",
+    "nivel educativo": "nivel_educacion",
+    "estudios": "nivel_educacion"
+}
+
+AGREGACIONES = ["promedio", "mediana", "suma", "conteo", "minimo", "maximo"]
+
+class EmployeeColumnStore:
+    """Copia columnar en memoria de la tabla empleados para consultas analíticas.
+
+    Con la tabla repartida en shards, la copia junta las filas de todos ellos
+    (ordenadas por id), así que las consultas dan lo mismo que con un solo archivo.
+    """
+
+    NUMERIC_COLUMNS = ['id', 'salario', 'edad', 'experiencia_anos']
+    CATEGORICAL_COLUMNS = ['departamento', 'ciudad', 'nivel_educacion']
+    SELECT_COLUMNS = "id, nombre, departamento, salario, edad, ciudad, experiencia_anos, nivel_educacion"
+
+    def __init__(self, db_path=DB_PATH, shards=None):
+        self.db_path = db_path
+        self.paths = list(shards.paths) if shards is not None else [db_path]
+        self.lock = threading.RLock()
+        self.conns = None
+        self.data_version = None
+        self.clear()
+
+    def clear(self):
+        """Vaciar todas las columnas"""
+        self.columns = {col: np.empty(0, dtype=np.int64) for col in self.NUMERIC_COLUMNS}
+        self.nombres = np.empty(0, dtype=object)
+        # Codificación por diccionario: códigos int32 + lista de valores
+        self.dictionaries = {col: [] for col in self.CATEGORICAL_COLUMNS}
+        self.dictionary_index = {col: {} for col in self.CATEGORICAL_COLUMNS}
+        for col in self.CATEGORICAL_COLUMNS:
+            self.columns[col] = np.empty(0, dtype=np.int32)
+        self.last_id = 0
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def memory_bytes(self):
+        """Tamaño aproximado en memoria (los nombres se estiman, no se recorren)"""
+        with self.lock:
+            columns = sum(values.nbytes for values in self.columns.values())
+            return columns + self.nombres.nbytes + len(self.nombres) * 64
+
+    def close(self):
+        """Cerrar las conexiones propias (refresh las vuelve a abrir si hace falta)"""
+        with self.lock:
+            for conn in self.conns or []:
+                conn.close()
+            self.conns = None
+            self.data_version = None
+
+    def get_connections(self):
+        """Conexiones persistentes, una por archivo: PRAGMA data_version solo cambia entre
+        commits de otras conexiones"""
+        if self.conns is None:
+            self.conns = [get_database(path).connect(read_only=True, check_same_thread=False)
+                          for path in self.paths]
+        return self.conns
+
+    def fetch(self, sql, params=()):
+        """Filas de una consulta en cada archivo (uno o todos los shards), ordenadas por id"""
+        parts = [conn.execute(sql, params).fetchall() for conn in self.get_connections()]
+        if len(parts) == 1:
+            return parts[0]
+        return sorted((row for part in parts for row in part), key=lambda row: row[0])
+
+    def encode(self, col, values):
+        """Codificar valores categóricos, ampliando el diccionario si aparecen nuevos"""
+        index = self.dictionary_index[col]
+        dictionary = self.dictionaries[col]
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            code = index.get(value)
+            if code is None:
+                code = len(dictionary)
+                index[value] = code
+                dictionary.append(value)
+            codes[i] = code
+        return codes
+
+    def rows_to_columns(self, rows):
+        """Transponer filas de SQLite a columnas NumPy"""
+        ids, nombres, deptos, salarios, edades, ciudades, experiencias, niveles = zip(*rows)
+        return {
+            'id': np.array(ids, dtype=np.int64),
+            'salario': np.array(salarios, dtype=np.int64),
+            'edad': np.array(edades, dtype=np.int64),
+            'experiencia_anos': np.array(experiencias, dtype=np.int64),
+            'departamento': self.encode('departamento', deptos),
+            'ciudad': self.encode('ciudad', ciudades),
+            'nivel_educacion': self.encode('nivel_educacion', niveles)
+        }, np.array(nombres, dtype=object)
+
+    def append_rows(self, rows):
+        """Agregar filas nuevas al final de las columnas"""
+        if not rows:
+            return
+        new_columns, new_nombres = self.rows_to_columns(rows)
+        for col, values in new_columns.items():
+            self.columns[col] = np.concatenate([self.columns[col], values])
+        self.nombres = np.concatenate([self.nombres, new_nombres])
+        self.last_id = int(self.columns['id'][-1])
+
+    def patch_rows(self, rows):
+        """Sobrescribir en sitio filas ya cargadas; devuelve las que no existían"""
+        if not rows:
+            return []
+        ids = self.columns['id']
+        new_columns, new_nombres = self.rows_to_columns(rows)
+        positions = np.searchsorted(ids, new_columns['id'])
+        in_range = positions < len(ids)
+        found = np.zeros(len(rows), dtype=bool)
+        found[in_range] = ids[positions[in_range]] == new_columns['id'][in_range]
+
+        targets = positions[found]
+        for col, values in new_columns.items():
+            self.columns[col][targets] = values[found]
+        self.nombres[targets] = new_nombres[found]
+
+        return [row for row, was_found in zip(rows, found) if not was_found]
+
+    def full_reload(self):
+        """Recargar toda la tabla desde cero"""
+        self.clear()
+        self.append_rows(self.fetch(f"SELECT {self.SELECT_COLUMNS} FROM empleados ORDER BY id"))
+
+    def refresh(self, changed_ids=None, full=False):
+        """Sincronizar con la base de datos de forma incremental.
+
+        Las filas nuevas se detectan por id creciente. Las actualizaciones de filas
+        existentes no son visibles por sí solas: quien las escribe debe pasar sus
+        ids en changed_ids para que se parcheen en sitio.
+        """
+        with self.lock:
+            data_version = tuple(
+                conn.execute("PRAGMA data_version").fetchone()[0] for conn in self.get_connections()
+            )
+
+            if full or self.data_version is None:
+                self.full_reload()
+                self.data_version = data_version
+                return len(self)
+
+            if data_version == self.data_version and not changed_ids:
+                return len(self)
+
+            if changed_ids:
+                changed_ids = sorted({int(i) for i in changed_ids if int(i) <= self.last_id})
+                for start in range(0, len(changed_ids), 500):
+                    chunk = changed_ids[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    self.patch_rows(self.fetch(
+                        f"SELECT {self.SELECT_COLUMNS} FROM empleados WHERE id IN ({placeholders}) ORDER BY id",
+                        chunk
+                    ))
+
+            self.append_rows(self.fetch(
+                f"SELECT {self.SELECT_COLUMNS} FROM empleados WHERE id > ? ORDER BY id",
+                (self.last_id,)
+            ))
+
+            # Si hubo borrados el conteo ya no cuadra: recargar todo
+            total = sum(conn.execute("SELECT COUNT(*) FROM empleados").fetchone()[0]
+                        for conn in self.get_connections())
+            if total != len(self):
+                self.full_reload()
+
+            self.data_version = data_version
+            return len(self)
+
+    def validate_metric(self, metrica):
+        if metrica not in ('salario', 'edad', 'experiencia_anos'):
+            raise ValueError(f"Métrica no soportada: {metrica}")
+
+    def validate_group(self, agrupar_por):
+        if agrupar_por is not None and agrupar_por not in self.CATEGORICAL_COLUMNS:
+            raise ValueError(f"No se puede agrupar por: {agrupar_por}")
+
+    def build_mask(self, filtros):
+        """Construir la máscara booleana de los filtros de igualdad"""
+        mask = np.ones(len(self), dtype=bool)
+        for col, value in (filtros or {}).items():
+            if col not in self.CATEGORICAL_COLUMNS:
+                raise ValueError(f"No se puede filtrar por: {col}")
+            # Comparación sin distinguir mayúsculas contra el diccionario
+            codes = [
+                code for code, known in enumerate(self.dictionaries[col])
+                if known.lower() == str(value).lower()
+            ]
+            mask &= np.isin(self.columns[col], codes)
+        return mask
+
+    def grouped_values(self, metrica, agrupar_por, filtros):
+        """Devolver (códigos de grupo, valores, nombres de grupo) ya filtrados"""
+        mask = self.build_mask(filtros)
+        values = self.columns[metrica][mask].astype(np.float64)
+        if agrupar_por is None:
+            return np.zeros(len(values), dtype=np.int32), values, ["total"], mask
+        return self.columns[agrupar_por][mask], values, self.dictionaries[agrupar_por], mask
+
+    def sorted_segments(self, codes, values):
+        """Ordenar por (grupo, valor) y devolver los límites de cada grupo"""
+        order = np.lexsort((values, codes))
+        sorted_codes = codes[order]
+        sorted_values = values[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        ends = np.r_[starts[1:], len(sorted_codes)]
+        return sorted_codes[starts], sorted_values, starts, ends
+
+    def segment_quantiles(self, sorted_values, starts, ends, q):
+        """Percentil q (0-100) con interpolación lineal para todos los grupos a la vez"""
+        positions = starts + (ends - starts - 1) * (q / 100.0)
+        lower = np.floor(positions).astype(np.int64)
+        upper = np.ceil(positions).astype(np.int64)
+        fraction = positions - lower
+        return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+
+    def group_by(self, metrica, agrupar_por=None, agregacion="promedio", filtros=None):
+        """Agregar una métrica por grupo de forma vectorizada"""
+        self.validate_metric(metrica)
+        self.validate_group(agrupar_por)
+        if agregacion not in AGREGACIONES:
+            raise ValueError(f"Agregación no soportada: {agregacion}")
+
+        with self.lock:
+            codes, values, names, _ = self.grouped_values(metrica, agrupar_por, filtros)
+            if len(values) == 0:
+                return {}
+
+            n_groups = len(names)
+            counts = np.bincount(codes, minlength=n_groups)
+            present = np.flatnonzero(counts)
+
+            if agregacion == "conteo":
+                result = counts[present]
+            elif agregacion in ("suma", "promedio"):
+                sums = np.bincount(codes, weights=values, minlength=n_groups)
+                result = sums[present] if agregacion == "suma" else sums[present] / counts[present]
+            else:
+                group_codes, sorted_values, starts, ends = self.sorted_segments(codes, values)
+                present = group_codes
+                if agregacion == "minimo":
+                    result = sorted_values[starts]
+                elif agregacion == "maximo":
+                    result = sorted_values[ends - 1]
+                else:
+                    result = self.segment_quantiles(sorted_values, starts, ends, 50)
+
+            return {names[code]: float(value) for code, value in zip(present, result)}
+
+    def percentiles(self, metrica, percentiles=(25, 50, 75), agrupar_por=None, filtros=None):
+        """Calcular varios percentiles de una métrica por grupo"""
+        self.validate_metric(metrica)
+        self.validate_group(agrupar_por)
+        for q in percentiles:
+            if not 0 <= q <= 100:
+                raise ValueError(f"Percentil fuera de rango: {q}")
+
+        with self.lock:
+            codes, values, names, _ = self.grouped_values(metrica, agrupar_por, filtros)
+            if len(values) == 0:
+                return {}
+
+            group_codes, sorted_values, starts, ends = self.sorted_segments(codes, values)
+            by_q = {q: self.segment_quantiles(sorted_values, starts, ends, q) for q in percentiles}
+
+            return {
+                names[code]: {f"p{q:g}": float(by_q[q][i]) for q in percentiles}
+                for i, code in enumerate(group_codes)
+            }
+
+    def top_k(self, metrica, k=5, agrupar_por=None, ascendente=False, filtros=None):
+        """Obtener los k empleados con mayor (o menor) valor de una métrica por grupo"""
+        self.validate_metric(metrica)
+        self.validate_group(agrupar_por)
+        if k < 1:
+            raise ValueError("k debe ser al menos 1")
+
+        with self.lock:
+            codes, values, names, mask = self.grouped_values(metrica, agrupar_por, filtros)
+            if len(values) == 0:
+                return {}
+
+            rows = np.flatnonzero(mask)
+            ranking = values if ascendente else -values
+            # Orden por grupo, luego por valor, y desempate estable por id
+            order = np.lexsort((self.columns['id'][rows], ranking, codes))
+            sorted_codes = codes[order]
+            starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+            group_start = np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+            keep = order[np.arange(len(order)) - group_start < k]
+
+            result = {}
+            for i in keep:
+                row = rows[i]
+                result.setdefault(names[codes[i]], []).append({
+                    'id': int(self.columns['id'][row]),
+                    'nombre': self.nombres[row],
+                    'departamento': self.dictionaries['departamento'][self.columns['departamento'][row]],
+                    'ciudad': self.dictionaries['ciudad'][self.columns['ciudad'][row]],
+                    'nivel_educacion': self.dictionaries['nivel_educacion'][self.columns['nivel_educacion'][row]],
+                    metrica: int(self.columns[metrica][row])
+                })
+            return result
+
+def parse_analytics_question(pregunta):
+    """Extraer la consulta analítica (métrica, agrupación, filtros, operación) de una pregunta"""
+    text = pregunta.lower()
+
+    metrica = find_keyword(text, METRICAS) or "salario"
+
+    agrupar_por = None
+    group_match = re.search(r'\bpor (nivel educativo|\w+)', text)
+    if group_match:
+        agrupar_por = AGRUPACIONES.get(group_match.group(1))
+
+    filtros = {}
+    for col, keywords in (('departamento', DEPARTAMENTOS), ('ciudad', CIUDADES),
+                          ('nivel_educacion', NIVELES_EDUCACION)):
+        value = find_keyword(text, keywords)
+        if value and col != agrupar_por:
+            filtros[col] = value
+
+    consulta = {'metrica': metrica, 'agrupar_por': agrupar_por, 'filtros': filtros}
+
+    top_match = re.search(r'\btop (\d+)\b', text)
+    percentil_match = re.search(r'\bpercentil (\d+)\b', text)
+    if top_match:
+        consulta.update(operacion="top", k=int(top_match.group(1)),
+                        ascendente=bool(re.search(r'\b(menor|menos|m[ií]nim)', text)))
+    elif percentil_match:
+        consulta.update(operacion="percentiles", percentiles=[float(percentil_match.group(1))])
+    elif re.search(r'\bpercentiles\b', text):
+        consulta.update(operacion="percentiles", percentiles=[25.0, 50.0, 75.0])
+    else:
+        agregacion = "promedio"
+        if re.search(r'\bmediana\b', text):
+            agregacion = "mediana"
+        elif re.search(r'\b(m[aá]xim[oa]|mayor)\b', text):
+            agregacion = "maximo"
+        elif re.search(r'\b(m[ií]nim[oa]|menor)\b', text):
+            agregacion = "minimo"
+        elif re.search(r'\b(suma|total)\b', text):
+            agregacion = "suma"
+        elif re.search(r'\bcu[aá]nt[oa]s\b', text):
+            agregacion = "conteo"
+        consulta.update(operacion="agrupar", agregacion=agregacion)
+
+    return consulta
+
+def run_analytics_query(store, consulta):
+    """Ejecutar una consulta analítica (en el formato de parse_analytics_question)"""
+    operacion = consulta.get('operacion', 'agrupar')
+    common = {
+        'agrupar_por': consulta.get('agrupar_por'),
+        'filtros': consulta.get('filtros') or {}
+    }
+
+    if operacion == "agrupar":
+        return store.group_by(consulta['metrica'], agregacion=consulta.get('agregacion', 'promedio'), **common)
+    if operacion == "percentiles":
+        return store.percentiles(consulta['metrica'], percentiles=consulta.get('percentiles', [25, 50, 75]), **common)
+    if operacion == "top":
+        return store.top_k(consulta['metrica'], k=consulta.get('k', 5),
+                           ascendente=consulta.get('ascendente', False), **common)
+    raise ValueError(f"Operación no soportada: {operacion}")
+
+def format_value(metrica, value):
+    if metrica == "salario":
+        return f"${value:,.0f}"
+    return f"{value:.1f} años"
+
+def answer_analytics_question(store, pregunta):
+    """Responder en lenguaje natural una pregunta analítica"""
+    consulta = parse_analytics_question(pregunta)
+    result = run_analytics_query(store, consulta)
+
+    if not result:
+        return "No hay empleados que cumplan esos criterios."
+
+    metrica = consulta['metrica']
+    nombre_metrica = metrica.replace('_anos', '')
+    filtros = consulta['filtros']
+    contexto = f" ({', '.join(filtros.values())})" if filtros else ""
+
+    if consulta['operacion'] == "top":
+        partes = []
+        for grupo, empleados in result.items():
+            lista = ", ".join(f"{e['nombre']} ({format_value(metrica, e[metrica])})" for e in empleados)
+            partes.append(lista if grupo == "total" else f"{grupo}: {lista}")
+        return f"Top {consulta['k']} por {nombre_metrica}{contexto}: " + "; ".join(partes) + "."
+
+    if consulta['operacion'] == "percentiles":
+        partes = []
+        for grupo, valores in result.items():
+            lista = ", ".join(f"{q} {format_value(metrica, v)}" for q, v in valores.items())
+            partes.append(lista if grupo == "total" else f"{grupo}: {lista}")
+        return f"Percentiles de {nombre_metrica}{contexto}: " + "; ".join(partes) + "."
+
+    agregacion = consulta['agregacion']
+    if agregacion == "conteo":
+        partes = [f"{grupo}: {value:.0f}" for grupo, value in result.items()]
+        return f"Número de empleados{contexto}: " + ", ".join(partes) + "."
+
+    partes = [
+        format_value(metrica, value) if grupo == "total" else f"{grupo}: {format_value(metrica, value)}"
+        for grupo, value in result.items()
+    ]
+    return f"{agregacion.capitalize()} de {nombre_metrica}{contexto}: " + ", ".join(partes) + "."
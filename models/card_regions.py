@@ -0,0 +1,60 @@
+import cv2
+import numpy as np
+
+# Una región por debajo de esta fracción de la página es ruido (sellos, logos, manchas)
+MIN_AREA_RATIO = 0.02
+# Margen alrededor de cada región para no cortar letras del borde
+PADDING = 10
+
+# Núcleo de cierre en alturas de letra: junta las líneas de una tarjeta, no tarjetas vecinas
+LINE_MERGE_FACTOR = 2.5
+
+def closing_size(ink):
+    """Lado del núcleo de cierre según la altura mediana de las letras de la página"""
+    height = ink.shape[0]
+    _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    # Componentes con forma de letra: ni puntos de ruido ni bordes o bloques enteros
+    letters = np.array([h for _, _, w, h, _ in stats[1:] if 4 <= h <= height // 10 and w <= 4 * h])
+    if letters.size == 0:
+        return max(3, height // 25)
+    return max(3, int(LINE_MERGE_FACTOR * np.median(letters)))
+
+def detect_card_regions(gray, min_area_ratio=MIN_AREA_RATIO, padding=PADDING):
+    """Rectángulos (x, y, w, h) de las tarjetas de una página, en orden de lectura.
+
+    Se binariza la página (tinta y bordes en blanco) y se cierra con un núcleo
+    proporcional a la altura de las letras: las líneas de una misma tarjeta se
+    funden en un bloque y el espacio entre tarjetas las mantiene separadas.
+    Si no se encuentran al menos dos bloques, la página entera es una tarjeta.
+    """
+    height, width = gray.shape[:2]
+    whole = [(0, 0, width, height)]
+
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    side = closing_size(ink)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (side, side))
+    blocks = cv2.morphologyEx(ink, cv2.MORPH_CLOSE, kernel)
+    contours, _ = cv2.findContours(blocks, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    min_area = min_area_ratio * width * height
+    regions = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        # Una línea suelta (el título de una tarjeta) no es una tarjeta: mínimo tres núcleos por lado
+        if w * h < min_area or w < 3 * side or h < 3 * side:
+            continue
+        x0, y0 = max(0, x - padding), max(0, y - padding)
+        x1, y1 = min(width, x + w + padding), min(height, y + h + padding)
+        regions.append((x0, y0, x1 - x0, y1 - y0))
+
+    if len(regions) < 2:
+        return whole
+
+    # Orden de lectura: por filas (con tolerancia de media tarjeta) y de izquierda a derecha
+    row_height = min(h for _, _, _, h in regions) / 2
+    regions.sort(key=lambda r: (int(r[1] // row_height), r[0]))
+    return regions
+
+def crop(gray, region):
+    x, y, w, h = region
+    return gray[y:y + h, x:x + w]
@@ -1,21 +1,23 @@
-import re
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.naive_bayes import MultinomialNB
-from sklearn.pipeline import Pipeline
-from sklearn.model_selection import train_test_split
 import pickle
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.compiled_intent import CompiledIntentModel, compile_classifier, file_sha256
 
 class IntentClassifier:
     """Clasificador de intenciones para el chatbot"""
     
-    def __init__(self):
+    def __init__(self, model_dir="models"):
         self.pipeline = None
         self.categories = [
-            "conteo", "busqueda_max", "estadistica", "filtro", "busqueda_min", "prediccion"
+            "conteo", "busqueda_max", "estadistica", "filtro", "busqueda_min", "prediccion", "analitica"
         ]
-        self.model_path = "models/intent_classifier.pkl"
+        self.model_path = os.path.join(model_dir, "intent_classifier.pkl")
+        # Versión compilada (solo NumPy) que se usa para inferencia
+        self.compiled_path = os.path.join(model_dir, "intent_classifier.npz")
+        self.compiled = None
         
     def create_training_data(self):
         """Crear datos de entrenamiento para el clasificador"""
@@ -80,6 +82,16 @@ class IntentClassifier:
                 "¿Cuál sería el salario de un técnico de 28 años?",
                 "¿Cuánto ganaría un empleado con licenciatura y 5 años de experiencia?",
                 "¿Cuál sería el sueldo de alguien de 35 años en recursos humanos?"
+            ],
+            "analitica": [
+                "¿Cuál es el salario promedio por departamento?",
+                "¿Cuál es la mediana de edad en Monterrey?",
+                "¿Cuáles son los percentiles de salario por educación?",
+                "¿Cuál es la edad promedio por ciudad?",
+                "¿Cuál es el salario máximo por departamento?",
+                "¿Cuál es la mediana de salario por nivel educativo?",
+                "¿Quiénes son el top 3 de salario en ventas?",
+                "¿Cuál es el percentil 90 de salario en IT?"
             ]
         }
         
@@ -95,6 +107,12 @@ class IntentClassifier:
     
     def train(self):
         """Entrenar el clasificador"""
+        # scikit-learn solo hace falta para entrenar, no para predecir
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.naive_bayes import MultinomialNB
+        from sklearn.pipeline import Pipeline
+        from sklearn.model_selection import train_test_split
+        
         print("🤖 Entrenando clasificador de intenciones...")
         
         # Crear datos de entrenamiento
@@ -133,41 +151,124 @@ class IntentClassifier:
     
     def predict(self, question):
         """Predecir la intención de una pregunta"""
-        if self.pipeline is None:
+        if self.compiled is None and self.pipeline is None:
             self.load_model()
         
         # Preprocesar la pregunta
         question_clean = question.lower().strip()
         
-        # Predecir
-        prediction = self.pipeline.predict([question_clean])[0]
+        if self.compiled is not None:
+            # Camino rápido: TF-IDF + Naive Bayes como producto disperso en NumPy
+            predictions, probabilities = self.compiled.classify([question_clean])
+            classes = self.compiled.classes
+        else:
+            predictions = self.pipeline.predict([question_clean])
+            probabilities = self.pipeline.predict_proba([question_clean])
+            classes = self.pipeline.classes_
         
-        # Obtener probabilidades
-        probabilities = self.pipeline.predict_proba([question_clean])[0]
+        prediction = str(predictions[0])
+        probabilities = probabilities[0]
         confidence = max(probabilities)
         
         return {
             "categoria": prediction,
             "confianza": float(confidence),
-            "probabilidades": dict(zip(self.categories, probabilities.tolist()))
+            # classes_ sigue el orden interno del modelo, no el de self.categories
+            "probabilidades": dict(zip(classes.tolist(), probabilities.tolist()))
         }
     
+    def predict_many(self, questions):
+        """Predecir la intención de varias preguntas en una sola llamada"""
+        if self.compiled is None and self.pipeline is None:
+            self.load_model()
+        
+        questions_clean = [q.lower().strip() for q in questions]
+        
+        if self.compiled is not None:
+            predictions, probabilities = self.compiled.classify(questions_clean)
+            classes = self.compiled.classes.tolist()
+        else:
+            predictions = self.pipeline.predict(questions_clean)
+            probabilities = self.pipeline.predict_proba(questions_clean)
+            classes = self.pipeline.classes_.tolist()
+        
+        return [
+            {
+                "categoria": str(prediction),
+                "confianza": float(probs.max()),
+                "probabilidades": dict(zip(classes, probs.tolist()))
+            }
+            for prediction, probs in zip(predictions, probabilities)
+        ]
+    
     def save_model(self):
         """Guardar el modelo entrenado"""
         os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
         with open(self.model_path, 'wb') as f:
             pickle.dump(self.pipeline, f)
         print(f"💾 Modelo guardado en {self.model_path}")
+        try:
+            self.compile()
+        except ValueError as e:
+            # Sin paridad exacta no se usa el compilado: se predice con el pipeline recién entrenado
+            # (un .npz anterior no se carga porque su hash ya no corresponde al .pkl)
+            self.compiled = None
+            print(f"⚠️ No se pudo compilar el modelo, se usa scikit-learn: {e}")
+    
+    def compile(self):
+        """Exportar el pipeline a la versión compilada, verificando paridad con scikit-learn"""
+        X, _ = self.create_training_data()
+        self.compiled = compile_classifier(self.pipeline, self.compiled_path, check_texts=X,
+                                           source_hash=file_sha256(self.model_path))
+        print(f"💾 Modelo compilado guardado en {self.compiled_path}")
+    
+    def load_pipeline(self):
+        """Cargar el pipeline de scikit-learn (pickle)"""
+        with open(self.model_path, 'rb') as f:
+            self.pipeline = pickle.load(f)
+        print(f"📂 Modelo cargado desde {self.model_path}")
+    
+    def missing_categories(self):
+        """Categorías de los datos de entrenamiento que el modelo cargado no puede predecir"""
+        model = self.compiled if self.compiled is not None else self.pipeline
+        if model is None:
+            return []
+        classes = model.classes if self.compiled is not None else model.classes_
+        _, y = self.create_training_data()
+        return sorted(set(y) - set(classes.tolist()))
+    
+    def load_compiled(self):
+        """Modelo compilado si existe y se compiló del pickle actual (por hash); si no, None"""
+        if not os.path.exists(self.compiled_path):
+            return None
+        compiled = CompiledIntentModel.load(self.compiled_path)
+        if os.path.exists(self.model_path) and not compiled.matches(self.model_path):
+            return None
+        return compiled
     
     def load_model(self):
-        """Cargar el modelo entrenado"""
-        if os.path.exists(self.model_path):
-            with open(self.model_path, 'rb') as f:
-                self.pipeline = pickle.load(f)
-            print(f"📂 Modelo cargado desde {self.model_path}")
+        """Cargar el modelo entrenado (el compilado si se generó a partir del pickle actual).
+        
+        Nunca compila ni escribe archivos al cargar: el .npz se genera al entrenar
+        o con python models/compiled_intent.py.
+        """
+        self.compiled = self.load_compiled()
+        if self.compiled is not None:
+            print(f"📂 Modelo compilado cargado desde {self.compiled_path}")
+        elif os.path.exists(self.model_path):
+            if os.path.exists(self.compiled_path):
+                print(f"⚠️ {self.compiled_path} no corresponde a {self.model_path}: se usa scikit-learn. "
+                      f"Regenera el compilado con python models/compiled_intent.py")
+            self.load_pipeline()
         else:
             print("⚠️ Modelo no encontrado. Entrenando nuevo modelo...")
             self.train()
+        
+        missing = self.missing_categories()
+        if missing:
+            # El artefacto es anterior a los datos de entrenamiento actuales
+            print(f"⚠️ El modelo no conoce las categorías {', '.join(missing)}: "
+                  f"reentrena con python models/classifier.py")
 
 def test_classifier():
     """Función de prueba para el clasificador"""
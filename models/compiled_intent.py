@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import re
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COMPILED_PATH = "models/intent_classifier.npz"
+
+def file_sha256(path):
+    """Hash del contenido de un archivo (identifica el pickle del que se compiló el modelo)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class CompiledIntentModel:
+    """Clasificador de intenciones compilado a arreglos NumPy (sin scikit-learn).
+
+    Reproduce TfidfVectorizer + MultinomialNB de un Pipeline entrenado: el mismo
+    tokenizador, n-gramas y stop words, TF-IDF con norma L2 y la verosimilitud
+    conjunta como producto disperso. Las operaciones se hacen en float64 y en el
+    mismo orden que scikit-learn, así que las probabilidades coinciden bit a bit.
+    """
+
+    def __init__(self, terms, idf, feature_log_prob, class_log_prior, classes, config, source_hash=None):
+        self.terms = list(terms)
+        # Vocabulario internado: término -> columna
+        self.vocabulary = {sys.intern(term): col for col, term in enumerate(self.terms)}
+        self.idf = np.asarray(idf, dtype=np.float64)
+        # Traspuesta y contigua: la fila de cada término tiene su peso en todas las clases
+        self.weights = np.ascontiguousarray(np.asarray(feature_log_prob, dtype=np.float64).T)
+        self.class_log_prior = np.asarray(class_log_prior, dtype=np.float64)
+        self.classes = np.asarray(classes)
+        self.config = config
+        # sha256 del pickle de origen: el compilado solo vale para ese pickle exacto
+        self.source_hash = source_hash
+        self.token_pattern = re.compile(config["token_pattern"])
+        self.stop_words = frozenset(config["stop_words"] or ())
+        self.ngram_range = tuple(config["ngram_range"])
+        self.lowercase = config["lowercase"]
+
+    def matches(self, pickle_path):
+        """¿Se compiló a partir de este pickle? (por contenido, no por fecha de modificación)"""
+        return self.source_hash is not None and self.source_hash == file_sha256(pickle_path)
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """Compilar un Pipeline([('tfidf', TfidfVectorizer), ('classifier', MultinomialNB)])"""
+        tfidf = pipeline.named_steps['tfidf']
+        nb = pipeline.named_steps['classifier']
+
+        unsupported = {
+            "analyzer": tfidf.analyzer != 'word',
+            "strip_accents": tfidf.strip_accents is not None,
+            "preprocessor": tfidf.preprocessor is not None,
+            "tokenizer": tfidf.tokenizer is not None,
+            "binary": tfidf.binary,
+            "sublinear_tf": tfidf.sublinear_tf,
+            "norm": tfidf.norm != 'l2',
+            "use_idf": not tfidf.use_idf,
+        }
+        opciones = [name for name, bad in unsupported.items() if bad]
+        if opciones:
+            raise ValueError(f"Opciones de TfidfVectorizer no soportadas: {', '.join(opciones)}")
+
+        terms = [None] * len(tfidf.vocabulary_)
+        for term, col in tfidf.vocabulary_.items():
+            terms[col] = term
+
+        config = {
+            "token_pattern": tfidf.token_pattern,
+            "stop_words": sorted(tfidf.get_stop_words() or ()),
+            "ngram_range": list(tfidf.ngram_range),
+            "lowercase": tfidf.lowercase,
+        }
+        return cls(terms, tfidf.idf_, nb.feature_log_prob_, nb.class_log_prior_, nb.classes_, config)
+
+    def save(self, path=COMPILED_PATH):
+        """Guardar en un .npz sin pickle (solo arreglos numéricos y de texto)"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        np.savez(
+            path,
+            terms=np.array(self.terms, dtype=str),
+            idf=self.idf,
+            feature_log_prob=np.ascontiguousarray(self.weights.T),
+            class_log_prior=self.class_log_prior,
+            classes=np.array(self.classes, dtype=str),
+            config=np.array(json.dumps(self.config, ensure_ascii=False)),
+            source_hash=np.array(self.source_hash or "")
+        )
+
+    @classmethod
+    def load(cls, path=COMPILED_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data['terms'].tolist(),
+                data['idf'],
+                data['feature_log_prob'],
+                data['class_log_prior'],
+                data['classes'],
+                json.loads(data['config'].item()),
+                # Los .npz anteriores al hash no se pueden emparejar con su pickle
+                (data['source_hash'].item() or None) if 'source_hash' in data.files else None
+            )
+
+    def memory_bytes(self):
+        """Tamaño aproximado en memoria: arreglos más vocabulario"""
+        arrays = self.idf.nbytes + self.weights.nbytes + self.class_log_prior.nbytes
+        vocabulary = sys.getsizeof(self.vocabulary) + sum(sys.getsizeof(t) for t in self.terms)
+        return arrays + vocabulary
+
+    def analyze(self, text):
+        """Tokenizar como el analizador 'word' de scikit-learn (stop words y luego n-gramas)"""
+        if self.lowercase:
+            text = text.lower()
+        tokens = [t for t in self.token_pattern.findall(text) if t not in self.stop_words]
+
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+
+        ngrams = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n, len(tokens)) + 1):
+            for i in range(len(tokens) - n + 1):
+                ngrams.append(" ".join(tokens[i:i + n]))
+        return ngrams
+
+    def transform(self, text):
+        """Vector TF-IDF disperso de un texto: (columnas, valores normalizados)"""
+        counts = {}
+        for term in self.analyze(text):
+            col = self.vocabulary.get(term)
+            if col is not None:
+                counts[col] = counts.get(col, 0) + 1
+
+        # Columnas en orden descendente: scikit-learn 1.3 aplica el idf multiplicando por
+        # una matriz diagonal dispersa y scipy devuelve cada fila con las columnas al revés.
+        # La norma y el producto se acumulan en ese orden, así que hay que respetarlo
+        # para la paridad bit a bit (compile_classifier lo verifica al exportar).
+        cols = sorted(counts, reverse=True)
+        values = [counts[col] * self.idf[col] for col in cols]
+
+        # Norma L2 acumulada en el mismo orden que normalize() de scikit-learn
+        norm = 0.0
+        for value in values:
+            norm += value * value
+        if norm != 0.0:
+            norm = np.sqrt(norm)
+            values = [value / norm for value in values]
+        return cols, values
+
+    def joint_log_likelihood(self, texts):
+        """log P(clase) + X · log P(término | clase) para cada texto (filas) y clase (columnas)"""
+        jll = np.zeros((len(texts), len(self.classes)), dtype=np.float64)
+        for row, text in enumerate(texts):
+            for col, value in zip(*self.transform(text)):
+                jll[row] += value * self.weights[col]
+        return jll + self.class_log_prior
+
+    def classify(self, texts):
+        """Categorías y probabilidades en una sola pasada (equivale a predict + predict_proba)"""
+        jll = self.joint_log_likelihood(texts)
+        probabilities = np.exp(jll - logsumexp(jll)[:, np.newaxis])
+        return self.classes[np.argmax(jll, axis=1)], probabilities
+
+    def predict_proba(self, texts):
+        return self.classify(texts)[1]
+
+    def predict(self, texts):
+        return self.classify(texts)[0]
+
+def logsumexp(a):
+    """logsumexp por filas con los mismos pasos que scipy.special.logsumexp"""
+    a_max = np.amax(a, axis=1, keepdims=True)
+    a_max[~np.isfinite(a_max)] = 0
+    tmp = np.exp(a - a_max)
+    with np.errstate(divide='ignore'):
+        out = np.log(np.sum(tmp, axis=1, keepdims=True))
+    out += a_max
+    return out[:, 0]
+
+def compile_classifier(pipeline, path=COMPILED_PATH, check_texts=None, source_hash=None):
+    """Compilar el pipeline, verificar paridad exacta con scikit-learn y guardar (si hay path)"""
+    compiled = CompiledIntentModel.from_pipeline(pipeline)
+    compiled.source_hash = source_hash
+    if check_texts:
+        expected = pipeline.predict_proba(check_texts)
+        actual = compiled.predict_proba(check_texts)
+        if not np.array_equal(expected, actual):
+            diff = np.max(np.abs(expected - actual))
+            raise ValueError(f"El modelo compilado no coincide con scikit-learn (diferencia máxima {diff:.3e})")
+        if not np.array_equal(pipeline.predict(check_texts), compiled.predict(check_texts)):
+            raise ValueError("Las categorías del modelo compilado no coinciden con scikit-learn")
+    if path is not None:
+        compiled.save(path)
+    return compiled
+
+def main():
+    """Compilar models/intent_classifier.pkl a .npz y comprobar la paridad (paso de build)"""
+    from models.classifier import IntentClassifier
+
+    classifier = IntentClassifier()
+    classifier.load_pipeline()
+    X, _ = classifier.create_training_data()
+    check_texts = X + [q.upper() for q in X] + ["", "???", "hola", "¿cuántos cuántos empleados empleados hay?"]
+
+    compiled = compile_classifier(classifier.pipeline, classifier.compiled_path, check_texts,
+                                  source_hash=file_sha256(classifier.model_path))
+    size = os.path.getsize(classifier.compiled_path)
+    print(f"✅ Modelo compilado en {classifier.compiled_path} ({size / 1024:.1f} KB)")
+    print(f"   - {len(compiled.terms)} términos, {len(compiled.classes)} categorías")
+    print(f"   - Paridad exacta con scikit-learn en {len(check_texts)} textos")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future, InvalidStateError
+
+from models.deadline import install_progress_handler
+
+DB_PATH = "data/empresa.db"
+
+# Ajustes de SQLite (se pueden sobrescribir con variables de entorno)
+MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))  # bytes
+CACHE_SIZE_KB = int(os.environ.get("SQLITE_CACHE_SIZE_KB", 64 * 1024))  # KiB por conexión
+BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+WRITER_MAX_BATCH = int(os.environ.get("SQLITE_WRITER_MAX_BATCH", 1000))
+# Sentencias preparadas que sqlite3 guarda por conexión (clave: texto SQL exacto)
+STATEMENT_CACHE = int(os.environ.get("SQLITE_STATEMENT_CACHE", 256))
+# Espera máxima (s) por el resultado de una escritura encolada antes de rendirse
+WRITE_TIMEOUT = float(os.environ.get("SQLITE_WRITE_TIMEOUT", 30))
+
+def configure_connection(conn, read_only=False):
+    """Aplicar los PRAGMA de rendimiento a una conexión"""
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    if read_only:
+        conn.execute("PRAGMA query_only = ON")
+        # Las lecturas se cortan cuando vence el plazo de la petición que las lanzó
+        install_progress_handler(conn)
+    else:
+        # En modo WAL, NORMAL es seguro ante caídas del proceso y evita un fsync por commit
+        conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+class DatabaseWriter:
+    """Hilo escritor único que agrupa las escrituras en transacciones"""
+
+    def __init__(self, db_path, max_batch=WRITER_MAX_BATCH):
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.thread = None
+        self.stats_lock = threading.Lock()
+        self.stats = {"escrituras": 0, "transacciones": 0, "errores": 0, "lote_maximo": 0}
+
+    def start(self):
+        """Arrancar el hilo escritor"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="sqlite-writer", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Vaciar la cola pendiente y detener el hilo escritor"""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def submit(self, fn):
+        """Encolar fn(conn); devuelve un Future con su resultado tras el COMMIT"""
+        future = Future()
+        self.queue.put((fn, future))
+        return future
+
+    def run(self):
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        configure_connection(conn)
+
+        running = True
+        while running:
+            item = self.queue.get()
+            if item is None:
+                break
+
+            # Todo lo que se acumuló mientras se confirmaba el lote anterior va en este
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+
+            self.commit_batch(conn, batch)
+
+        conn.close()
+
+    def commit_batch(self, conn, batch):
+        """Ejecutar un lote en una sola transacción; cada escritura en su propio SAVEPOINT"""
+        done = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT escritura")
+                try:
+                    result = fn(conn)
+                except Exception as e:
+                    # Una escritura fallida no arrastra al resto del lote
+                    conn.execute("ROLLBACK TO escritura")
+                    conn.execute("RELEASE escritura")
+                    future.set_exception(e)
+                    with self.stats_lock:
+                        self.stats["errores"] += 1
+                    continue
+                conn.execute("RELEASE escritura")
+                done.append((future, result))
+            conn.execute("COMMIT")
+        except Exception as e:
+            try:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            # Todo el lote se deshizo: también fallan las escrituras que aún no se habían ejecutado
+            failed = 0
+            for _, future in batch:
+                try:
+                    future.set_exception(e)
+                    failed += 1
+                except InvalidStateError:
+                    # Ya resuelta (falló en su SAVEPOINT) o cancelada por el llamador
+                    pass
+            with self.stats_lock:
+                self.stats["errores"] += failed
+            return
+
+        with self.stats_lock:
+            self.stats["escrituras"] += len(done)
+            self.stats["transacciones"] += 1
+            self.stats["lote_maximo"] = max(self.stats["lote_maximo"], len(batch))
+
+        for future, result in done:
+            future.set_result(result)
+
+    def get_stats(self):
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats["en_cola"] = self.queue.qsize()
+        return stats
+
+class Database:
+    """Acceso a SQLite en modo WAL: lectores concurrentes y un único escritor"""
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self.local = threading.local()
+        self.writer = None
+        self.lock = threading.Lock()
+        self.wal_enabled = False
+
+    def enable_wal(self):
+        """Activar WAL (persistente en el archivo: basta con hacerlo una vez)"""
+        with self.lock:
+            if self.wal_enabled:
+                return
+            conn = sqlite3.connect(self.db_path)
+            conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.close()
+            self.wal_enabled = True
+
+    def connect(self, read_only=True, **kwargs):
+        """Abrir una conexión nueva ya configurada (el llamador la cierra)"""
+        self.enable_wal()
+        kwargs.setdefault("cached_statements", STATEMENT_CACHE)
+        conn = sqlite3.connect(self.db_path, **kwargs)
+        return configure_connection(conn, read_only=read_only)
+
+    def reader(self):
+        """Conexión de solo lectura reutilizada por hilo"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.connect(read_only=True)
+            self.local.conn = conn
+        return conn
+
+    def get_writer(self):
+        with self.lock:
+            if self.writer is None:
+                self.writer = DatabaseWriter(self.db_path)
+                self.writer.start()
+            return self.writer
+
+    def write(self, fn):
+        """Encolar una función fn(conn) en el escritor único"""
+        self.enable_wal()
+        return self.get_writer().submit(fn)
+
+    def execute(self, sql, params=()):
+        """Encolar una sentencia de escritura; el Future devuelve el rowcount"""
+        return self.write(lambda conn: conn.execute(sql, params).rowcount)
+
+    def executemany(self, sql, seq_of_params):
+        """Encolar una sentencia con muchos parámetros; el Future devuelve el rowcount"""
+        return self.write(lambda conn: conn.executemany(sql, seq_of_params).rowcount)
+
+    def get_stats(self):
+        return self.writer.get_stats() if self.writer is not None else {}
+
+    def close(self):
+        """Detener el escritor (confirmando lo pendiente)"""
+        with self.lock:
+            writer, self.writer = self.writer, None
+        if writer is not None:
+            writer.stop()
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+def get_database(db_path=DB_PATH):
+    """Obtener la instancia compartida de Database para un archivo"""
+    with _databases_lock:
+        db = _databases.get(db_path)
+        if db is None:
+            db = Database(db_path)
+            _databases[db_path] = db
+        return db
+
+def release_database(db_path):
+    """Sacar una base de datos del registro y detener su escritor (confirmando lo pendiente).
+
+    Las conexiones de lectura por hilo se cierran cuando la instancia deja de usarse.
+    """
+    with _databases_lock:
+        db = _databases.pop(db_path, None)
+    if db is not None:
+        db.close()
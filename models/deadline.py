@@ -0,0 +1,207 @@
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+
+DEADLINE_HEADER = b"x-request-timeout"
+# Instrucciones de la VM de SQLite entre dos comprobaciones del plazo (~1 ms de consulta)
+SQLITE_PROGRESS_STEPS = int(os.environ.get("SQLITE_PROGRESS_PASOS", 10000))
+
+# Plazo por presupuesto de admisión (None: sin plazo salvo que lo pida la cabecera)
+def default_timeouts():
+    return {
+        "ligera": float(os.environ.get("PLAZO_LIGERA", 10.0)),
+        "ocr": float(os.environ.get("PLAZO_OCR", 30.0)),
+        "pesada": float(os.environ.get("PLAZO_PESADA", 120.0)),
+        "exportacion": None,
+    }
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Plazo de la petición agotado; el trabajo en curso se canceló"""
+
+    def __init__(self, stage, timeout):
+        super().__init__(f"Plazo de la petición agotado ({timeout:g}s) durante: {stage}")
+        self.stage = stage
+        self.timeout = timeout
+
+class RequestDeadline:
+    """Plazo de una petición; los hilos del threadpool lo ven por la copia del contexto"""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.started = time.monotonic()
+        self.expires = self.started + timeout
+        self.cancelled = None
+        # Plazo de la ruta sin el recorte de X-Request-Timeout (None: la ruta no tiene).
+        # Es el que se usa para trabajo compartido entre peticiones (coalescencia).
+        self.budget = self
+
+    def remaining(self):
+        return self.expires - time.monotonic()
+
+    def expired(self):
+        return time.monotonic() >= self.expires
+
+current_deadline = contextvars.ContextVar("deadline", default=None)
+
+class DeadlineStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {"con_plazo": 0, "vencidas": 0, "por_etapa": {}, "segundos_desperdiciados": 0.0}
+
+    def cancelled(self, stage, wasted):
+        with self.lock:
+            self.stats["vencidas"] += 1
+            self.stats["por_etapa"][stage] = self.stats["por_etapa"].get(stage, 0) + 1
+            self.stats["segundos_desperdiciados"] += wasted
+
+    def applied(self):
+        with self.lock:
+            self.stats["con_plazo"] += 1
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["por_etapa"] = dict(self.stats["por_etapa"])
+        stats["segundos_desperdiciados"] = round(stats["segundos_desperdiciados"], 3)
+        return stats
+
+deadline_stats = DeadlineStats()
+
+def remaining():
+    """Segundos que le quedan a la petición en curso (None si no tiene plazo)"""
+    deadline = current_deadline.get()
+    return None if deadline is None else deadline.remaining()
+
+def cancel(stage):
+    """Marcar la petición como cancelada por plazo y devolver la excepción a lanzar"""
+    deadline = current_deadline.get()
+    if deadline.cancelled is None:
+        deadline.cancelled = stage
+        # Todo lo que se trabajó para esta petición se tira: desde que llegó hasta el corte
+        deadline_stats.cancelled(stage, time.monotonic() - deadline.started)
+    return DeadlineExceeded(stage, deadline.timeout)
+
+def shared_context():
+    """Copia del contexto para trabajo que comparten varias peticiones.
+
+    Corre con el plazo de la ruta, nunca con el que pidió un cliente en
+    X-Request-Timeout: si no, un cliente con un plazo corto cortaría el trabajo
+    de todos los que esperan el mismo resultado.
+    """
+    context = contextvars.copy_context()
+    deadline = current_deadline.get()
+    if deadline is not None and deadline.budget is not deadline:
+        context.run(current_deadline.set, deadline.budget)
+    return context
+
+def check(stage):
+    """Fallar antes de empezar una etapa si el plazo ya venció"""
+    deadline = current_deadline.get()
+    if deadline is not None and deadline.expired():
+        raise cancel(stage)
+
+def raise_if_cancelled(error):
+    """Convertir el error de una operación cortada por el plazo en DeadlineExceeded"""
+    deadline = current_deadline.get()
+    if isinstance(error, DeadlineExceeded):
+        raise error
+    if deadline is not None and (deadline.cancelled or deadline.expired()):
+        raise DeadlineExceeded(deadline.cancelled or "desconocida", deadline.timeout) from error
+
+def sqlite_progress_handler():
+    """Progress handler de SQLite: un valor distinto de cero interrumpe la consulta (OperationalError)"""
+    deadline = current_deadline.get()
+    if deadline is not None and deadline.expired():
+        cancel("sqlite")
+        return 1
+    return 0
+
+def install_progress_handler(conn):
+    """Cortar las consultas largas de esta conexión cuando vence el plazo de la petición"""
+    conn.set_progress_handler(sqlite_progress_handler, SQLITE_PROGRESS_STEPS)
+    return conn
+
+class DeadlineMiddleware:
+    """Middleware ASGI que fija el plazo de cada petición.
+
+    El plazo sale del presupuesto de la ruta (mismas rutas que el control de
+    admisión) o de la cabecera X-Request-Timeout (en segundos), que solo puede
+    acortarlo. Si el trabajo se cortó por el plazo, la respuesta de error del
+    endpoint se sustituye por un 504 con la etapa en la que venció.
+    """
+
+    def __init__(self, app, timeouts, routes):
+        self.app = app
+        self.timeouts = timeouts
+        # Prefijos más largos primero, como en AdmissionControlMiddleware
+        self.routes = sorted(routes.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def resolve(self, path):
+        for prefix, budget_name in self.routes:
+            if path == prefix or path.startswith(prefix.rstrip('/') + '/'):
+                return self.timeouts.get(budget_name)
+        return None
+
+    def requested_timeout(self, scope):
+        for name, value in scope.get("headers") or []:
+            if name == DEADLINE_HEADER:
+                try:
+                    timeout = float(value.decode("latin-1"))
+                except ValueError:
+                    return None
+                return timeout if timeout > 0 else None
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route_timeout = self.resolve(scope["path"])
+        requested = self.requested_timeout(scope)
+        candidates = [t for t in (route_timeout, requested) if t is not None]
+        if not candidates:
+            await self.app(scope, receive, send)
+            return
+
+        deadline = RequestDeadline(min(candidates))
+        if route_timeout is None or deadline.timeout < route_timeout:
+            deadline.budget = RequestDeadline(route_timeout) if route_timeout is not None else None
+        deadline_stats.applied()
+        replaced = False
+
+        async def deadline_send(message):
+            nonlocal replaced
+            if message["type"] == "http.response.start":
+                if deadline.cancelled and message["status"] >= 500:
+                    replaced = True
+                    await self.timeout_response(deadline, send)
+                    return
+            elif replaced:
+                return
+            await send(message)
+
+        token = current_deadline.set(deadline)
+        try:
+            await self.app(scope, receive, deadline_send)
+        finally:
+            current_deadline.reset(token)
+
+    async def timeout_response(self, deadline, send):
+        body = json.dumps({
+            "detail": f"Plazo de la petición agotado ({deadline.timeout:g}s) durante: {deadline.cancelled}",
+            "etapa": deadline.cancelled,
+            "plazo_segundos": deadline.timeout
+        }, ensure_ascii=False).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 504,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
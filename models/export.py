@@ -0,0 +1,191 @@
+import csv
+import heapq
+import io
+import os
+import sys
+from itertools import islice
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import DB_PATH, get_database
+from models.responses import dumps
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Columnas exportables y su tipo (para el esquema Arrow/Parquet)
+EXPORT_COLUMNS = {
+    "id": "int",
+    "nombre": "str",
+    "departamento": "str",
+    "salario": "int",
+    "edad": "int",
+    "ciudad": "str",
+    "experiencia_anos": "int",
+    "nivel_educacion": "str",
+    "fecha_ingreso": "str",
+}
+# Filtros de igualdad admitidos (sin distinguir mayúsculas)
+EXPORT_FILTERS = ["departamento", "ciudad", "nivel_educacion"]
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+def available_formats():
+    return [f for f in FORMATS if f in ("csv", "ndjson") or pa is not None]
+
+def build_export_query(filtros=None, columnas=None, with_id=False):
+    """SQL parametrizado con proyección y filtros validados; devuelve (sql, params, columnas).
+
+    Con with_id=True la primera columna es además el id (clave para intercalar shards).
+    """
+    columnas = columnas or list(EXPORT_COLUMNS)
+    desconocidas = [c for c in columnas if c not in EXPORT_COLUMNS]
+    if desconocidas:
+        raise ValueError(f"Columnas no válidas: {', '.join(desconocidas)}. Usa: {', '.join(EXPORT_COLUMNS)}")
+
+    where = []
+    params = []
+    for col, value in (filtros or {}).items():
+        if col not in EXPORT_FILTERS:
+            raise ValueError(f"Filtro no válido: {col}. Usa: {', '.join(EXPORT_FILTERS)}")
+        if value is None:
+            continue
+        where.append(f"{col} = ? COLLATE NOCASE")
+        params.append(value)
+
+    sql = f"SELECT {', '.join((['id'] if with_id else []) + columnas)} FROM empleados"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    # Orden por clave primaria: recorrido del B-tree sin ordenar en memoria
+    sql += " ORDER BY id"
+    return sql, params, columnas
+
+def iter_row_chunks(sql, params, chunk_size=1000, db_path=DB_PATH):
+    """Recorrer el resultado en bloques de chunk_size filas con el cursor de SQLite.
+
+    SQLite avanza el cursor fila a fila al pedirlas, así que solo hay un bloque en
+    memoria. La conexión es propia y se cierra al terminar (o si el cliente corta).
+    El generador puede avanzar desde hilos distintos del threadpool (nunca a la vez).
+    """
+    conn = get_database(db_path).connect(read_only=True, check_same_thread=False)
+    try:
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+def iter_shard_row_chunks(sql, params, shards, chunk_size=1000):
+    """Como iter_row_chunks, pero intercalando por id los cursores de todos los shards.
+
+    El SQL debe venir de build_export_query(..., with_id=True): cada shard ya
+    devuelve sus filas ordenadas por id, así que la salida tiene el mismo orden que
+    con un solo archivo y en memoria solo hay un bloque (más una fila por shard).
+    """
+    conns = [get_database(path).connect(read_only=True, check_same_thread=False) for path in shards.paths]
+    try:
+        rows = heapq.merge(*[conn.execute(sql, params) for conn in conns], key=lambda row: row[0])
+        while True:
+            chunk = [row[1:] for row in islice(rows, chunk_size)]
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        for conn in conns:
+            conn.close()
+
+def csv_stream(columnas, row_chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columnas)
+    for rows in row_chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    # Sin filas: al menos la cabecera
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def ndjson_stream(columnas, row_chunks):
+    for rows in row_chunks:
+        yield b"".join(dumps(dict(zip(columnas, row))) + b"\n" for row in rows)
+
+class ChunkSink:
+    """Destino de escritura que acumula bytes hasta que el generador los entrega"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def arrow_schema(columnas):
+    types = {"int": pa.int64(), "str": pa.string()}
+    return pa.schema([(col, types[EXPORT_COLUMNS[col]]) for col in columnas])
+
+def arrow_stream(columnas, row_chunks, formato):
+    """Parquet (un row group por bloque) o Arrow IPC (un record batch por bloque)"""
+    if pa is None:
+        raise ValueError("El formato columnar requiere pyarrow (pip install pyarrow)")
+
+    schema = arrow_schema(columnas)
+    sink = ChunkSink()
+    if formato == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    for rows in row_chunks:
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)],
+            schema=schema
+        )
+        if formato == "parquet":
+            writer.write_batch(batch, row_group_size=len(rows))
+        else:
+            writer.write_batch(batch)
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
+
+def export_stream(formato, columnas, row_chunks):
+    """Generador de bytes del formato pedido"""
+    if formato == "csv":
+        return csv_stream(columnas, row_chunks)
+    if formato == "ndjson":
+        return ndjson_stream(columnas, row_chunks)
+    return arrow_stream(columnas, row_chunks, formato)
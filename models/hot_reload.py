@@ -0,0 +1,329 @@
+import hashlib
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.classifier import IntentClassifier
+from models.compiled_intent import compile_classifier, file_sha256
+from models.regression import SalaryPredictor
+from models.vocabulary import DEPARTAMENTOS, NIVELES_EDUCACION
+
+CLASSIFIER = "clasificador"
+PREDICTOR = "predictor"
+MODEL_KINDS = [CLASSIFIER, PREDICTOR]
+
+def file_signature(paths):
+    """(ruta, mtime, tamaño) de los archivos que existen: barato de comparar en cada sondeo"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+def read_files(paths):
+    """Contenido y mtime de cada archivo (None si no existe)"""
+    files = {}
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            files[path] = (data, os.stat(path).st_mtime_ns)
+        except FileNotFoundError:
+            files[path] = None
+    return files
+
+def content_version(files):
+    """Versión del modelo: hash corto del contenido de sus archivos"""
+    digest = hashlib.sha256()
+    for path in sorted(files):
+        if files[path] is not None:
+            digest.update(os.path.basename(path).encode())
+            digest.update(files[path][0])
+    return digest.hexdigest()[:12]
+
+def write_atomic(path, data, mtime_ns=None):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    if mtime_ns is not None:
+        os.utime(tmp, ns=(mtime_ns, mtime_ns))
+    os.replace(tmp, path)
+
+class ModelReloader:
+    """Recarga en caliente del clasificador y el predictor de un tenant.
+
+    El candidato se carga aparte, se valida con un conjunto de humo y solo entonces
+    se cambia la referencia (una asignación: atómica). Las peticiones en curso
+    terminan con el modelo que ya tenían. Si la validación falla se sigue
+    sirviendo el modelo actual y se restauran sus archivos en disco (los
+    rechazados quedan como .rechazado), así un reinicio tampoco carga el modelo malo.
+    """
+
+    def __init__(self, model_set, min_accuracy=0.8, max_accuracy_drop=0.05, max_error=0.5,
+                 max_error_growth=1.25, settle_seconds=1.0):
+        self.model_set = model_set
+        self.min_accuracy = min_accuracy
+        self.max_accuracy_drop = max_accuracy_drop
+        self.max_error = max_error
+        self.max_error_growth = max_error_growth
+        self.settle_seconds = settle_seconds
+        self.lock = threading.Lock()
+        self.versions = {}
+        self.good_files = {}
+        self.signatures = {}
+        self.metrics = {}
+        self.previous = {}
+        self.history = deque(maxlen=20)
+
+    def artifacts(self, kind):
+        if kind == CLASSIFIER:
+            classifier = self.model_set.classifier
+            return [classifier.model_path, classifier.compiled_path]
+        predictor = self.model_set.salary_predictor
+        return [predictor.model_path, predictor.encoders_path, predictor.scaler_path]
+
+    def record(self, kind, origen, metrics=None):
+        """Guardar versión, firma y copia de los archivos del modelo activo"""
+        paths = self.artifacts(kind)
+        files = read_files(paths)
+        self.good_files[kind] = files
+        self.signatures[kind] = file_signature(paths)
+        self.versions[kind] = {
+            "version": content_version(files),
+            "cargado": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "origen": origen
+        }
+        if metrics is not None:
+            self.metrics[kind] = metrics
+
+    def record_loaded(self):
+        """Registrar los modelos cargados al arrancar, con su línea base de validación"""
+        with self.lock:
+            for kind in MODEL_KINDS:
+                try:
+                    metrics = self.validate(kind, self.current(kind))
+                except Exception as e:
+                    print(f"⚠️ El {kind} cargado no pasa la validación: {e}")
+                    metrics = None
+                self.record(kind, "arranque", metrics)
+
+    def current(self, kind):
+        if kind == CLASSIFIER:
+            return self.model_set.classifier
+        return self.model_set.salary_predictor
+
+    def changed(self):
+        """Modelos cuyos archivos cambiaron y ya no se están escribiendo"""
+        kinds = []
+        now = time.time()
+        for kind in MODEL_KINDS:
+            signature = file_signature(self.artifacts(kind))
+            if signature == self.signatures.get(kind):
+                continue
+            newest = max((mtime for _, mtime, _ in signature), default=0) / 1e9
+            if now - newest >= self.settle_seconds:
+                kinds.append(kind)
+        return kinds
+
+    def build(self, kind, model_dir=None):
+        """Cargar un candidato desde disco sin tocar el modelo activo ni escribir archivos"""
+        model_dir = model_dir or os.path.dirname(self.artifacts(kind)[0])
+        if kind == CLASSIFIER:
+            candidate = IntentClassifier(model_dir=model_dir)
+            if not os.path.exists(candidate.model_path) and not os.path.exists(candidate.compiled_path):
+                raise FileNotFoundError(f"No hay modelo en {candidate.model_path}")
+            candidate.compiled = candidate.load_compiled()
+            if candidate.compiled is None:
+                # Pickle sin su compilado: compilar en memoria con verificación de paridad; se guarda al activar
+                candidate.load_pipeline()
+                X, _ = candidate.create_training_data()
+                candidate.compiled = compile_classifier(candidate.pipeline, path=None, check_texts=X,
+                                                        source_hash=file_sha256(candidate.model_path))
+            return candidate
+
+        candidate = SalaryPredictor(db_path=self.model_set.db_path, model_dir=model_dir, shards=self.model_set.shards)
+        missing = [p for p in (candidate.model_path, candidate.encoders_path, candidate.scaler_path)
+                   if not os.path.exists(p)]
+        if missing:
+            raise FileNotFoundError(f"Faltan archivos del predictor: {', '.join(missing)}")
+        candidate.load_model()
+        return candidate
+
+    def validate(self, kind, model):
+        """Métricas en el conjunto de humo; ValueError si el modelo no es aceptable"""
+        if kind == CLASSIFIER:
+            return self.validate_classifier(model)
+        return self.validate_predictor(model)
+
+    def validate_classifier(self, classifier):
+        X, y = classifier.create_training_data()
+        predictions = classifier.predict_many(X)
+        unknown = {p["categoria"] for p in predictions} - set(classifier.categories)
+        if unknown:
+            raise ValueError(f"Categorías desconocidas: {', '.join(sorted(unknown))}")
+        missing = classifier.missing_categories()
+        if missing:
+            raise ValueError(f"El modelo no predice las categorías: {', '.join(missing)}")
+        if not all(math.isfinite(p["confianza"]) for p in predictions):
+            raise ValueError("Probabilidades no finitas")
+
+        accuracy = sum(p["categoria"] == label for p, label in zip(predictions, y)) / len(y)
+        if accuracy < self.min_accuracy:
+            raise ValueError(f"Precisión {accuracy:.3f} menor que el mínimo {self.min_accuracy:.3f}")
+        baseline = self.metrics.get(CLASSIFIER)
+        if baseline and accuracy < baseline["precision"] - self.max_accuracy_drop:
+            raise ValueError(f"Precisión {accuracy:.3f} peor que la actual {baseline['precision']:.3f}")
+        return {"precision": accuracy, "preguntas": len(y)}
+
+    def validate_predictor(self, predictor):
+        # Todas las combinaciones de categorías (ninguna puede fallar) y error contra la base de datos
+        for departamento in sorted(set(DEPARTAMENTOS.values())):
+            for nivel in sorted(set(NIVELES_EDUCACION.values())):
+                salario = predictor.predict(30, 5, departamento, nivel)["salario_predicho"]
+                if not math.isfinite(salario):
+                    raise ValueError(f"Predicción no finita para {departamento}/{nivel}")
+
+        columns = "edad, experiencia_anos, departamento, nivel_educacion, salario"
+        if self.model_set.shards is not None:
+            rows = self.model_set.shards.ordered(columns, limit=500)
+        else:
+            rows = self.model_set.db.reader().execute(
+                f"SELECT {columns} FROM empleados ORDER BY id LIMIT 500"
+            ).fetchall()
+        errors = [
+            abs(predictor.predict(edad, exp, depto, nivel)["salario_predicho"] - salario) / salario
+            for edad, exp, depto, nivel, salario in rows if salario
+        ]
+        error = sum(errors) / len(errors) if errors else 0.0
+        if error > self.max_error:
+            raise ValueError(f"Error relativo medio {error:.3f} mayor que el máximo {self.max_error:.3f}")
+        baseline = self.metrics.get(PREDICTOR)
+        if baseline and error > baseline["error_relativo"] * self.max_error_growth:
+            raise ValueError(f"Error relativo medio {error:.3f} peor que el actual {baseline['error_relativo']:.3f}")
+        return {"error_relativo": error, "empleados": len(errors)}
+
+    def activate(self, kind, model):
+        """Cambiar la referencia al modelo (las peticiones en curso conservan la anterior)"""
+        if kind == CLASSIFIER:
+            self.model_set.classifier = model
+            self.model_set.router.classifier = model
+        else:
+            self.model_set.salary_predictor = model
+
+    def restore_files(self, kind, suffix=".rechazado"):
+        """Devolver al disco los archivos del último modelo válido y apartar los actuales"""
+        for path, saved in self.good_files.get(kind, {}).items():
+            if os.path.exists(path):
+                current = read_files([path])[path]
+                if saved is not None and current[0] == saved[0]:
+                    continue
+                os.replace(path, f"{path}{suffix}")
+            if saved is not None:
+                write_atomic(path, saved[0], saved[1])
+        self.signatures[kind] = file_signature(self.artifacts(kind))
+
+    def reload(self, kinds=None, origen="admin"):
+        """Recargar, validar y activar los modelos pedidos; devuelve el resultado por modelo"""
+        results = {}
+        with self.lock:
+            for kind in kinds or MODEL_KINDS:
+                start = time.perf_counter()
+                files = read_files(self.artifacts(kind))
+                if content_version(files) == self.versions.get(kind, {}).get("version"):
+                    # Mismo contenido (p. ej. archivos restaurados por otro worker)
+                    self.signatures[kind] = file_signature(self.artifacts(kind))
+                    results[kind] = {"estado": "sin_cambios", "version": self.versions[kind]["version"]}
+                    continue
+
+                try:
+                    candidate = self.build(kind)
+                    metrics = self.validate(kind, candidate)
+                except Exception as e:
+                    print(f"⚠️ Recarga de {kind} rechazada, se mantiene la versión actual: {e}")
+                    self.restore_files(kind)
+                    result = {"estado": "revertido", "error": str(e),
+                              "version": self.versions.get(kind, {}).get("version")}
+                else:
+                    if kind == CLASSIFIER and candidate.pipeline is not None:
+                        # Pickle nuevo: guardar la versión compilada solo ahora que es válido
+                        candidate.compiled.save(candidate.compiled_path)
+                    self.previous[kind] = (self.current(kind), self.versions.get(kind), self.good_files.get(kind))
+                    self.activate(kind, candidate)
+                    self.record(kind, origen, metrics)
+                    print(f"♻️ {kind} recargado: versión {self.versions[kind]['version']}")
+                    result = {"estado": "activado", "version": self.versions[kind]["version"], "metricas": metrics}
+
+                result["ms"] = round((time.perf_counter() - start) * 1000, 1)
+                results[kind] = result
+                self.history.append({"modelo": kind, "origen": origen, "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                                     **{k: v for k, v in result.items() if k != "metricas"}})
+        return results
+
+    def rollback(self, kind):
+        """Volver al modelo anterior (ya validado en su momento) y a sus archivos"""
+        with self.lock:
+            if kind not in self.previous:
+                raise ValueError(f"No hay una versión anterior del {kind}")
+            model, version, files = self.previous.pop(kind)
+            self.activate(kind, model)
+            self.good_files[kind] = files
+            self.restore_files(kind, suffix=".revertido")
+            self.versions[kind] = {**version, "origen": "rollback"}
+            self.history.append({"modelo": kind, "origen": "rollback", "estado": "activado",
+                                 "version": version["version"], "fecha": time.strftime("%Y-%m-%dT%H:%M:%S")})
+            return self.versions[kind]
+
+    def check(self):
+        """Sondeo del vigilante: recargar lo que cambió en disco"""
+        kinds = self.changed()
+        if kinds:
+            return self.reload(kinds, origen="archivo")
+        return {}
+
+    def get_versions(self):
+        with self.lock:
+            return {kind: dict(version) for kind, version in self.versions.items()}
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "versiones": {kind: dict(version) for kind, version in self.versions.items()},
+                "metricas": dict(self.metrics),
+                "historial": list(self.history)
+            }
+
+class ReloadWatcher:
+    """Hilo que sondea los archivos de modelos de los tenants cargados cada `interval` segundos"""
+
+    def __init__(self, registry, interval):
+        self.registry = registry
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="model-reload", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            for model_set in self.registry.loaded():
+                try:
+                    model_set.reloader.check()
+                except Exception as e:
+                    print(f"⚠️ Error vigilando modelos de {model_set.tenant}: {e}")
@@ -0,0 +1,267 @@
+import io
+import math
+import os
+import struct
+import cv2
+import numpy as np
+from PIL import Image, ImageSequence
+
+# Opcional: rasterizar PDF (escaneos de varias páginas)
+try:
+    import fitz
+except ImportError:
+    fitz = None
+
+# Lado mayor a partir del cual el OCR de una tarjeta ya no gana precisión
+OCR_TARGET_SIDE = 2000
+
+# Páginas máximas de un documento y resolución a la que se rasterizan los PDF
+MAX_FRAMES = int(os.environ.get("OCR_MAX_PAGINAS", 50))
+PDF_DPI = int(os.environ.get("OCR_PDF_DPI", 200))
+# Píxeles máximos por página decodificada (40 MP: un escaneo carta a 600 ppp); se
+# comprueba con las cabeceras, antes de reservar el búfer
+MAX_FRAME_PIXELS = int(os.environ.get("OCR_MAX_PIXELES_PAGINA", 40_000_000))
+
+# Modos de decodificación reducida de libjpeg (escala DCT 1/2, 1/4, 1/8)
+JPEG_REDUCED_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8
+}
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+def sniff_format(buf):
+    """Detectar el formato de imagen por sus bytes mágicos"""
+    head = bytes(buf[:12])
+    if head.startswith(PNG_SIGNATURE):
+        return 'png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return 'gif'
+    if head.startswith((b'II*\x00', b'MM\x00*')):
+        return 'tiff'
+    if head.startswith(b'BM'):
+        return 'bmp'
+    if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        return 'webp'
+    if head.startswith(b'%PDF'):
+        return 'pdf'
+    return None
+
+def png_info(buf):
+    """Leer ancho, alto, profundidad y si hay transparencia sin decodificar la imagen"""
+    width, height = struct.unpack('>II', buf[16:24])
+    bit_depth, color_type = buf[24], buf[25]
+    # Tipos 4 (gris + alfa) y 6 (RGBA); la paleta puede traer transparencia en tRNS
+    has_alpha = color_type in (4, 6)
+    offset = 8
+    while not has_alpha and offset + 8 <= len(buf):
+        length, chunk_type = struct.unpack('>I4s', buf[offset:offset + 8])
+        if chunk_type == b'tRNS':
+            has_alpha = True
+        elif chunk_type == b'IDAT':
+            break
+        offset += 12 + length
+    return width, height, bit_depth, has_alpha
+
+def jpeg_size(buf):
+    """Leer ancho y alto del marcador SOF de un JPEG"""
+    i = 2
+    size = len(buf)
+    while i + 9 < size:
+        if buf[i] != 0xFF:
+            i += 1
+            continue
+        marker = buf[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        # Marcadores sin segmento
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        # SOF0..SOF15 excepto DHT (C4), JPG (C8) y DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack('>HH', buf[i + 5:i + 9])
+            return width, height
+        i += 2 + struct.unpack('>H', buf[i + 2:i + 4])[0]
+    return None
+
+def check_frame_size(width, height, max_pixels=MAX_FRAME_PIXELS, page=None):
+    """ValueError si una página es demasiado grande para decodificarla en memoria"""
+    if width * height > max_pixels:
+        pagina = f"La página {page}" if page is not None else "La imagen"
+        raise ValueError(f"{pagina} mide {width}x{height} píxeles (máximo {max_pixels:,} por página)")
+
+def header_size(data):
+    """(ancho, alto) de la primera página según su cabecera (Image.open no decodifica píxeles)"""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.size
+    except Image.DecompressionBombError as e:
+        raise ValueError(str(e))
+    except (OSError, SyntaxError) as e:
+        raise ValueError(f"No se pudo leer la cabecera de la imagen: {e}")
+
+def frame_sizes(data, limit=None):
+    """(ancho, alto) de cada página leyendo solo las cabeceras (sin decodificar píxeles).
+
+    Con `limit` deja de recorrer al pasar de ese número de páginas.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            sizes = []
+            for frame in ImageSequence.Iterator(image):
+                sizes.append(frame.size)
+                if limit is not None and len(sizes) > limit:
+                    break
+            return sizes
+    except Image.DecompressionBombError as e:
+        raise ValueError(str(e))
+
+def choose_reduction(width, height, target_side=OCR_TARGET_SIDE):
+    """Mayor factor de reducción que deja el lado mayor por encima del objetivo"""
+    longest = max(width, height)
+    for factor in (8, 4, 2):
+        if longest // factor >= target_side:
+            return factor
+    return 1
+
+def to_uint8(image):
+    """Bajar imágenes de 16 bits a 8 bits"""
+    if image.dtype == np.uint16:
+        return (image >> 8).astype(np.uint8)
+    return image
+
+def flatten_alpha(image):
+    """Componer una imagen con alfa sobre fondo blanco en un solo búfer gris.
+
+    gris = 255 - (255 - g) * a / 255, calculado en sitio sobre el búfer de g.
+    """
+    if image.shape[2] == 4:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY)
+    else:
+        gray = np.ascontiguousarray(image[:, :, 0])
+    alpha = image[:, :, -1]
+    cv2.bitwise_not(gray, dst=gray)
+    cv2.multiply(gray, alpha, dst=gray, scale=1.0 / 255)
+    cv2.bitwise_not(gray, dst=gray)
+    return gray
+
+def decode_with_pil(data, target_side=OCR_TARGET_SIDE):
+    """Camino alternativo para formatos que OpenCV no decodifica (GIF, etc.)"""
+    # BytesIO sobre bytes comparte el búfer hasta que se escribe en él
+    image = Image.open(io.BytesIO(data))
+
+    if image.format == 'JPEG':
+        factor = choose_reduction(*image.size, target_side=target_side)
+        if factor > 1:
+            image.draft('L', (image.width // factor, image.height // factor))
+
+    if image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info):
+        background = Image.new('RGBA', image.size, 'white')
+        background.alpha_composite(image.convert('RGBA'))
+        image = background
+
+    if image.mode in ('I;16', 'I;16B', 'I;16L', 'I'):
+        return to_uint8(np.asarray(image, dtype=np.uint16))
+
+    if image.mode != 'L':
+        image = image.convert('L')
+    return np.asarray(image)
+
+def decode_grayscale(data, target_side=OCR_TARGET_SIDE):
+    """Decodificar bytes de imagen directamente a un único búfer gris de 8 bits.
+
+    Los bytes se envuelven con np.frombuffer (sin copia) y el decodificador
+    escribe directamente la salida en escala de grises; los JPEG muy grandes
+    se decodifican a 1/2, 1/4 u 1/8 de resolución con el escalado DCT de libjpeg.
+    """
+    buf = memoryview(data)
+    fmt = sniff_format(buf)
+    encoded = np.frombuffer(buf, dtype=np.uint8)
+    image = None
+
+    if fmt == 'jpeg':
+        # Sin un SOF legible, el tamaño lo da la cabecera según PIL
+        width, height = jpeg_size(buf) or header_size(data)
+        factor = choose_reduction(width, height, target_side=target_side)
+        # El escalado DCT decodifica directamente al tamaño reducido
+        check_frame_size(width // factor, height // factor)
+        image = cv2.imdecode(encoded, JPEG_REDUCED_FLAGS[factor])
+
+    elif fmt == 'png':
+        width, height, bit_depth, has_alpha = png_info(buf)
+        check_frame_size(width, height)
+        if has_alpha:
+            image = cv2.imdecode(encoded, cv2.IMREAD_UNCHANGED)
+            if image is not None:
+                image = to_uint8(image)
+                if image.ndim == 3 and image.shape[2] in (2, 4):
+                    image = flatten_alpha(image)
+        else:
+            # Paleta, gris o RGB de 8/16 bits: libpng entrega gris de 8 bits directamente
+            image = cv2.imdecode(encoded, cv2.IMREAD_GRAYSCALE)
+
+    else:
+        # TIFF, BMP, WebP, GIF y el resto: tamaño de la cabecera antes de reservar el búfer
+        check_frame_size(*header_size(data))
+        if fmt in ('tiff', 'bmp', 'webp'):
+            image = cv2.imdecode(encoded, cv2.IMREAD_GRAYSCALE)
+
+    if image is None:
+        image = decode_with_pil(data, target_side=target_side)
+
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return to_uint8(image)
+
+def decode_pdf_pages(data, dpi=PDF_DPI, max_frames=MAX_FRAMES):
+    """Rasterizar cada página de un PDF directamente en gris (requiere PyMuPDF)"""
+    if fitz is None:
+        raise ValueError("Los PDF requieren PyMuPDF (pip install pymupdf)")
+    frames = []
+    with fitz.open(stream=data, filetype="pdf") as document:
+        if document.page_count > max_frames:
+            raise ValueError(f"El documento tiene {document.page_count} páginas (máximo {max_frames})")
+        zoom = dpi / 72
+        for number, page in enumerate(document, start=1):
+            # Tamaño del raster a partir del de la página, antes de rasterizarla
+            check_frame_size(math.ceil(page.rect.width * zoom), math.ceil(page.rect.height * zoom), page=number)
+            pixmap = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+            frame = np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.stride)
+            frames.append(frame[:, :pixmap.width])
+    return frames
+
+def decode_frames(data, max_frames=MAX_FRAMES):
+    """Decodificar todas las páginas de una imagen (TIFF multipágina, GIF, PDF) en gris.
+
+    Las imágenes de una sola página devuelven una lista de un elemento, con el
+    mismo camino que decode_grayscale.
+    """
+    fmt = sniff_format(memoryview(data))
+
+    if fmt == 'pdf':
+        return decode_pdf_pages(data, max_frames=max_frames)
+
+    if fmt in ('tiff', 'gif', 'webp'):
+        sizes = frame_sizes(data, limit=max_frames)
+        if len(sizes) > max_frames:
+            raise ValueError(f"El documento tiene más de {max_frames} páginas")
+        for page, (width, height) in enumerate(sizes, start=1):
+            check_frame_size(width, height, page=page)
+
+    if fmt == 'tiff':
+        ok, frames = cv2.imdecodemulti(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        if ok and frames:
+            return [to_uint8(frame) for frame in frames]
+
+    if fmt in ('tiff', 'gif', 'webp'):
+        image = Image.open(io.BytesIO(data))
+        if getattr(image, 'n_frames', 1) > 1:
+            return [np.asarray(frame.convert('L')) for frame in ImageSequence.Iterator(image)]
+
+    return [decode_grayscale(data)]
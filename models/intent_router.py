@@ -0,0 +1,81 @@
+import json
+import os
+import re
+import threading
+
+class IntentRouter:
+    """Enrutador en cascada: reglas compiladas primero, modelo TF-IDF + NB después"""
+
+    def __init__(self, classifier, rules_path="data/intent_rules.json"):
+        self.classifier = classifier
+        self.rules_path = rules_path
+        self.rules = []
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+        self.load_rules()
+
+    def load_rules(self):
+        """Cargar y compilar las reglas desde el archivo JSON"""
+        if not os.path.exists(self.rules_path):
+            print(f"⚠️ Reglas no encontradas en {self.rules_path}. Todo pasa al modelo.")
+            self.rules = []
+            return
+
+        with open(self.rules_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+        # Un solo regex por regla: las alternativas se evalúan en una pasada
+        rules = []
+        for rule in config.get("reglas", []):
+            pattern = "|".join(f"(?:{p})" for p in rule["patrones"])
+            rules.append((rule["categoria"], re.compile(pattern)))
+
+        self.rules = rules
+        print(f"📂 {len(rules)} reglas de intención cargadas desde {self.rules_path}")
+
+    def match_rules(self, question_clean):
+        """Devolver la categoría de la primera regla que coincide, o None"""
+        for categoria, pattern in self.rules:
+            if pattern.search(question_clean):
+                return categoria
+        return None
+
+    def predict(self, question):
+        """Clasificar una pregunta pasando por las etapas de la cascada"""
+        question_clean = question.lower().strip()
+        categoria = self.match_rules(question_clean)
+
+        if categoria is not None:
+            # Las reglas no estiman probabilidades: no se inventa una confianza
+            result = {
+                "categoria": categoria,
+                "confianza": None,
+                "probabilidades": None,
+                "etapa": "reglas"
+            }
+        else:
+            result = self.classifier.predict(question)
+            result["etapa"] = "modelo"
+
+        with self.stats_lock:
+            self.stats[result["etapa"]] += 1
+
+        return result
+
+    def reset_stats(self):
+        """Reiniciar los contadores de tráfico por etapa"""
+        with self.stats_lock:
+            self.stats = {"reglas": 0, "modelo": 0}
+
+    def get_stats(self):
+        """Obtener cuánto tráfico resolvió cada etapa"""
+        with self.stats_lock:
+            stats = dict(self.stats)
+
+        total = stats["reglas"] + stats["modelo"]
+        return {
+            "total": total,
+            "reglas": stats["reglas"],
+            "modelo": stats["modelo"],
+            "porcentaje_reglas": stats["reglas"] / total if total else 0.0
+        }
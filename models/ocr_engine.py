@@ -0,0 +1,78 @@
+import itertools
+import os
+import threading
+import time
+
+import pytesseract
+
+# Ruta del ejecutable de Tesseract; sin TESSERACT_PATH se usa la instalación de Windows
+# del proyecto si existe y, si no, el `tesseract` del PATH
+WINDOWS_TESSERACT = r'C:\Users\Microsoft\AppData\Local\Programs\Tesseract-OCR\tesseract.exe'
+TESSERACT_PATH = os.environ.get("TESSERACT_PATH") or (WINDOWS_TESSERACT if os.path.exists(WINDOWS_TESSERACT) else None)
+
+if TESSERACT_PATH:
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
+
+class TesseractEngine:
+    """Motor OCR real: Tesseract a través de pytesseract"""
+
+    name = "tesseract"
+
+    def image_to_string(self, image, config, lang, timeout=0):
+        return pytesseract.image_to_string(image, config=config, lang=lang, timeout=timeout)
+
+    def image_to_data(self, image, config, lang, timeout=0):
+        """Palabras con su bloque, párrafo, línea y confianza (formato Output.DICT)"""
+        return pytesseract.image_to_data(
+            image, config=config, lang=lang, timeout=timeout, output_type=pytesseract.Output.DICT
+        )
+
+class FakeOCREngine:
+    """Motor OCR de prueba: devuelve textos predefinidos con una latencia configurable.
+
+    Sirve para medir y probar el resto del camino OCR sin Tesseract instalado.
+    Los textos se devuelven en orden circular (una tarjeta por llamada) y la
+    latencia simula el proceso de Tesseract, respetando el plazo de la petición
+    como lo hace pytesseract (RuntimeError de timeout al vencer).
+    """
+
+    name = "fake"
+
+    def __init__(self, texts, latency=0.0, confidence=95.0):
+        self.canned = list(texts) if isinstance(texts, (list, tuple)) else [texts]
+        self.latency = latency
+        self.confidence = confidence
+        self.lock = threading.Lock()
+        self.rewind()
+
+    def rewind(self):
+        """Volver a empezar por el primer texto"""
+        with self.lock:
+            self.texts = itertools.cycle(self.canned)
+            self.calls = 0
+
+    def next_text(self, timeout):
+        with self.lock:
+            self.calls += 1
+            text = next(self.texts)
+        if self.latency:
+            if timeout and timeout < self.latency:
+                time.sleep(timeout)
+                raise RuntimeError("Tesseract process timeout")
+            time.sleep(self.latency)
+        return text
+
+    def image_to_string(self, image, config, lang, timeout=0):
+        return self.next_text(timeout)
+
+    def image_to_data(self, image, config, lang, timeout=0):
+        text = self.next_text(timeout)
+        data = {key: [] for key in ('text', 'conf', 'block_num', 'par_num', 'line_num')}
+        for line_num, line in enumerate(text.split('\n'), start=1):
+            for word in line.split():
+                data['text'].append(word)
+                data['conf'].append(self.confidence)
+                data['block_num'].append(1)
+                data['par_num'].append(1)
+                data['line_num'].append(line_num)
+        return data
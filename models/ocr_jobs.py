@@ -0,0 +1,409 @@
+import http.client
+import ipaddress
+import json
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import WRITE_TIMEOUT, get_database, release_database
+from models.responses import dumps
+
+JOBS_DB_PATH = "data/ocr_jobs.db"
+
+PENDING = "pendiente"
+RUNNING = "procesando"
+DONE = "completado"
+FAILED = "fallido"
+# callback_estado mientras el resultado espera en la cola de envío
+CALLBACK_PENDING = "pendiente"
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS ocr_jobs (
+        id TEXT PRIMARY KEY,
+        tenant TEXT,
+        estado TEXT NOT NULL,
+        imagen BLOB,
+        adaptativo INTEGER NOT NULL DEFAULT 0,
+        callback_url TEXT,
+        callback_estado TEXT,
+        resultado TEXT,
+        error TEXT,
+        intentos INTEGER NOT NULL DEFAULT 0,
+        creado REAL NOT NULL,
+        iniciado REAL,
+        terminado REAL,
+        expira REAL
+    )
+"""
+# Los trabajadores toman los pendientes más antiguos; la purga busca por caducidad
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_ocr_jobs_estado ON ocr_jobs (estado, creado)",
+    "CREATE INDEX IF NOT EXISTS idx_ocr_jobs_expira ON ocr_jobs (expira)",
+]
+
+def allowed_host(host, allowed_hosts):
+    """Host en la lista permitida: nombre exacto o, si empieza por punto, sus subdominios"""
+    host = host.lower().rstrip('.')
+    return any(host == entry or (entry.startswith('.') and host.endswith(entry)) for entry in allowed_hosts)
+
+def public_addresses(host, port):
+    """Resolver host; ValueError si alguna de sus direcciones no es pública"""
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError) as e:
+        raise ValueError(f"No se pudo resolver el host del callback: {host}") from e
+    for *_, sockaddr in infos:
+        address = ipaddress.ip_address(sockaddr[0].split('%')[0])
+        # Privadas, loopback, link-local (metadatos de la nube), reservadas y multicast
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f"El callback apunta a una dirección no pública ({address}): {host}")
+    return [sockaddr[0] for *_, sockaddr in infos]
+
+def callback_target(url):
+    """(esquema, host, puerto) de una URL de callback; ValueError si no es http(s) con host"""
+    parsed = urlparse(url)
+    try:
+        port = parsed.port
+    except ValueError:
+        raise ValueError(f"URL de callback no válida: {url}") from None
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError(f"URL de callback no válida: {url}")
+    return parsed.scheme, parsed.hostname, port or (443 if parsed.scheme == "https" else 80)
+
+def check_callback_url(url, allowed_hosts=()):
+    """Solo se admiten callbacks http(s) a hosts públicos o de la lista permitida.
+
+    El host se resuelve y se rechaza si alguna dirección es privada, loopback,
+    link-local, reservada o multicast: el callback no sirve para hacer POST a
+    servicios internos (SSRF). Los hosts de `allowed_hosts` no se comprueban.
+    """
+    _, host, port = callback_target(url)
+    if not allowed_host(host, allowed_hosts):
+        public_addresses(host, port)
+    return url
+
+class OCRJobQueue:
+    """Trabajos OCR asíncronos persistidos en SQLite.
+
+    POST encola la imagen y devuelve un id al momento; unos hilos trabajadores
+    toman los pendientes por lotes, procesan cada imagen con el OCR de su tenant
+    y guardan el resultado (en una sola transacción por lote). El estado vive en
+    la tabla ocr_jobs, así que un reinicio no pierde trabajos: los que quedaron
+    a medias vuelven a la cola. Los resultados caducan a los `ttl` segundos.
+
+    Los callbacks los envían hilos aparte desde una cola en memoria: un cliente
+    lento no frena el OCR. Su estado queda "pendiente" en la tabla hasta el envío,
+    así que los que no llegaron a salir se reenvían al arrancar.
+    """
+
+    def __init__(self, resolve_models, db_path=JOBS_DB_PATH, workers=2, batch_size=8, ttl=3600,
+                 max_pending=1000, max_attempts=3, poll_interval=1.0, purge_interval=60.0,
+                 callback_timeout=5.0, callback_senders=2, callback_queue=1000, callback_hosts=()):
+        self.resolve_models = resolve_models
+        self.db_path = db_path
+        self.workers = workers
+        self.batch_size = batch_size
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.purge_interval = purge_interval
+        self.callback_timeout = callback_timeout
+        self.callback_senders = callback_senders
+        self.callback_hosts = [host.strip().lower() for host in callback_hosts if host.strip()]
+        self.callbacks = queue.Queue(maxsize=callback_queue)
+        self.db = None
+        self.threads = []
+        self.senders = []
+        self.stop_event = threading.Event()
+        self.wake = threading.Event()
+        self.last_purge = 0.0
+        self.lock = threading.Lock()
+        self.stats = {
+            "encolados": 0, "completados": 0, "fallidos": 0, "lotes": 0, "recuperados": 0,
+            "expirados": 0, "callbacks_enviados": 0, "callbacks_fallidos": 0, "rechazados": 0
+        }
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+    def open(self):
+        """Crear la tabla si falta y devolver a la cola los trabajos interrumpidos"""
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self.db = get_database(self.db_path)
+
+        def prepare(conn):
+            conn.execute(SCHEMA)
+            for sql in INDEXES:
+                conn.execute(sql)
+            # Un trabajo "procesando" al arrancar es de un proceso que murió a medias
+            failed = conn.execute(
+                "UPDATE ocr_jobs SET estado = ?, error = ?, imagen = NULL, terminado = ?, expira = ? "
+                "WHERE estado = ? AND intentos >= ?",
+                (FAILED, "Demasiados intentos", time.time(), time.time() + self.ttl, RUNNING, self.max_attempts)
+            ).rowcount
+            recovered = conn.execute(
+                "UPDATE ocr_jobs SET estado = ?, iniciado = NULL WHERE estado = ?", (PENDING, RUNNING)
+            ).rowcount
+            return recovered, failed
+
+        recovered, failed = self.db.write(prepare).result(timeout=WRITE_TIMEOUT)
+        self.count("recuperados", recovered)
+        self.count("fallidos", failed)
+        if recovered:
+            print(f"♻️ {recovered} trabajos OCR interrumpidos vuelven a la cola")
+
+        # Callbacks que quedaron en la cola de envío cuando se detuvo el proceso
+        unsent = self.db.reader().execute(
+            "SELECT id, estado, resultado, error, callback_url FROM ocr_jobs WHERE callback_estado = ?",
+            (CALLBACK_PENDING,)
+        ).fetchall()
+        for job_id, estado, result, error, url in unsent:
+            self.enqueue_callback(job_id, url, estado, json.loads(result) if result else None, error)
+
+    def start(self):
+        """Abrir la base de datos y arrancar los hilos trabajadores"""
+        if self.threads:
+            return
+        if self.db is None:
+            self.open()
+        self.stop_event.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self.run, name=f"ocr-jobs-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        for i in range(self.callback_senders):
+            thread = threading.Thread(target=self.run_callbacks, name=f"ocr-callbacks-{i}", daemon=True)
+            thread.start()
+            self.senders.append(thread)
+
+    def stop(self):
+        """Detener los trabajadores (terminan su lote) y confirmar las escrituras pendientes"""
+        self.stop_event.set()
+        self.wake.set()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        # Los envíos en curso terminan; los que siguen en cola quedan pendientes para el próximo arranque
+        for _ in self.senders:
+            self.callbacks.put(None)
+        for thread in self.senders:
+            thread.join()
+        self.senders = []
+        if self.db is not None:
+            release_database(self.db_path)
+            self.db = None
+
+    def submit(self, image_data, tenant=None, adaptive=False, callback_url=None):
+        """Encolar una imagen; devuelve el id del trabajo (OverflowError si la cola está llena)"""
+        if callback_url:
+            check_callback_url(callback_url, self.callback_hosts)
+        job_id = uuid.uuid4().hex
+
+        def insert(conn):
+            pending = conn.execute("SELECT COUNT(*) FROM ocr_jobs WHERE estado = ?", (PENDING,)).fetchone()[0]
+            if pending >= self.max_pending:
+                raise OverflowError(f"Cola de trabajos OCR llena ({pending} pendientes)")
+            conn.execute(
+                "INSERT INTO ocr_jobs (id, tenant, estado, imagen, adaptativo, callback_url, creado) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, tenant, PENDING, image_data, int(adaptive), callback_url, time.time())
+            )
+
+        try:
+            self.db.write(insert).result(timeout=WRITE_TIMEOUT)
+        except OverflowError:
+            self.count("rechazados")
+            raise
+        self.count("encolados")
+        self.wake.set()
+        return job_id
+
+    def get(self, job_id, tenant=None):
+        """Estado y resultado de un trabajo (None si no existe, caducó o es de otro tenant)"""
+        row = self.db.reader().execute(
+            "SELECT id, tenant, estado, adaptativo, callback_url, callback_estado, resultado, error, "
+            "intentos, creado, iniciado, terminado, expira FROM ocr_jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None or row[1] != tenant or (row[12] is not None and row[12] <= time.time()):
+            return None
+
+        job = {
+            "job_id": row[0],
+            "estado": row[2],
+            "adaptativo": bool(row[3]),
+            "intentos": row[8],
+            "creado": row[9],
+            "iniciado": row[10],
+            "terminado": row[11],
+            "expira": row[12],
+            "resultado": json.loads(row[6]) if row[6] else None,
+            "error": row[7]
+        }
+        if row[4]:
+            job["callback"] = {"url": row[4], "estado": row[5]}
+        return job
+
+    def claim(self, limit):
+        """Tomar hasta `limit` pendientes (los más antiguos) y marcarlos como en proceso"""
+        def take(conn):
+            # El escritor es único: SELECT y UPDATE no compiten con otro trabajador
+            rows = conn.execute(
+                "SELECT id, tenant, imagen, adaptativo, callback_url FROM ocr_jobs "
+                "WHERE estado = ? ORDER BY creado LIMIT ?",
+                (PENDING, limit)
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE ocr_jobs SET estado = ?, iniciado = ?, intentos = intentos + 1 WHERE id = ?",
+                    [(RUNNING, time.time(), row[0]) for row in rows]
+                )
+            return rows
+
+        return self.db.write(take).result(timeout=WRITE_TIMEOUT)
+
+    def process(self, job):
+        """OCR de un trabajo con los modelos de su tenant: (id, estado, resultado, error)"""
+        job_id, tenant, image_data, adaptive, _ = job
+        try:
+            # El ModelSet queda fijado mientras dura el OCR: el LRU de tenants no lo cierra a medias
+            with self.resolve_models(tenant) as models:
+                result = models.ocr_processor.process_image_bytes(image_data, adaptive=bool(adaptive))
+            return job_id, DONE, result, None
+        except Exception as e:
+            return job_id, FAILED, None, str(e)
+
+    def complete(self, outcomes):
+        """Guardar los resultados de un lote en una sola transacción (y soltar las imágenes)"""
+        finished = time.time()
+        rows = [
+            (estado, dumps(result).decode('utf-8') if result is not None else None, error,
+             finished, finished + self.ttl, job_id)
+            for job_id, estado, result, error in outcomes
+        ]
+        self.db.executemany(
+            "UPDATE ocr_jobs SET estado = ?, resultado = ?, error = ?, imagen = NULL, "
+            "terminado = ?, expira = ?, "
+            f"callback_estado = CASE WHEN callback_url IS NULL THEN NULL ELSE '{CALLBACK_PENDING}' END "
+            "WHERE id = ?",
+            rows
+        ).result(timeout=WRITE_TIMEOUT)
+
+    def connect(self, url):
+        """Conexión HTTP(S) al callback, fijada a una dirección ya comprobada"""
+        scheme, host, port = callback_target(url)
+        connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        connection = connection_class(host, port, timeout=self.callback_timeout)
+        if not allowed_host(host, self.callback_hosts):
+            # Se vuelve a resolver al enviar (el DNS pudo cambiar desde el POST) y se conecta a
+            # esa dirección, no a otra resolución posterior; HTTPS sigue validando el nombre
+            address = public_addresses(host, port)[0]
+            connection._create_connection = (
+                lambda _, *args: socket.create_connection((address, port), *args)
+            )
+        return connection
+
+    def send_callback(self, url, payload):
+        """POST del resultado a la URL del cliente (sin seguir redirecciones); devuelve el estado a guardar"""
+        parsed = urlparse(url)
+        path = (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+        try:
+            connection = self.connect(url)
+            try:
+                connection.request("POST", path, body=dumps(payload), headers={"Content-Type": "application/json"})
+                status = connection.getresponse().status
+            finally:
+                connection.close()
+        except Exception as e:
+            self.count("callbacks_fallidos")
+            return f"error: {e}"
+        if status >= 400:
+            self.count("callbacks_fallidos")
+            return f"error: HTTP {status}"
+        self.count("callbacks_enviados")
+        return f"enviado ({status})"
+
+    def enqueue_callback(self, job_id, url, estado, result, error):
+        """Dejar un callback en la cola de envío; False si la cola está llena"""
+        payload = {"job_id": job_id, "estado": estado, "resultado": result, "error": error}
+        try:
+            self.callbacks.put_nowait((job_id, url, payload))
+            return True
+        except queue.Full:
+            self.count("callbacks_fallidos")
+            return False
+
+    def notify(self, jobs, outcomes):
+        """Encolar los callbacks de un lote; el trabajador no espera a que se envíen"""
+        callbacks = {job[0]: job[4] for job in jobs if job[4]}
+        dropped = [
+            ("error: cola de callbacks llena", job_id)
+            for job_id, estado, result, error in outcomes
+            if callbacks.get(job_id) and not self.enqueue_callback(job_id, callbacks[job_id], estado, result, error)
+        ]
+        if dropped:
+            self.db.executemany("UPDATE ocr_jobs SET callback_estado = ? WHERE id = ?", dropped)
+
+    def run_callbacks(self):
+        while True:
+            item = self.callbacks.get()
+            if item is None:
+                return
+            if self.stop_event.is_set():
+                continue
+            job_id, url, payload = item
+            estado = self.send_callback(url, payload)
+            self.db.execute("UPDATE ocr_jobs SET callback_estado = ? WHERE id = ?", (estado, job_id))
+
+    def purge(self):
+        """Borrar los trabajos terminados cuya caducidad ya pasó"""
+        deleted = self.db.execute("DELETE FROM ocr_jobs WHERE expira <= ?", (time.time(),)).result(timeout=WRITE_TIMEOUT)
+        self.count("expirados", deleted)
+        return deleted
+
+    def run_batch(self):
+        """Procesar un lote; devuelve cuántos trabajos tomó"""
+        jobs = self.claim(self.batch_size)
+        if not jobs:
+            return 0
+        outcomes = [self.process(job) for job in jobs]
+        self.complete(outcomes)
+        self.count("lotes")
+        self.count("completados", sum(1 for outcome in outcomes if outcome[1] == DONE))
+        self.count("fallidos", sum(1 for outcome in outcomes if outcome[1] == FAILED))
+        self.notify(jobs, outcomes)
+        return len(jobs)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                if time.time() - self.last_purge >= self.purge_interval:
+                    self.last_purge = time.time()
+                    self.purge()
+                if self.run_batch():
+                    continue
+            except Exception as e:
+                print(f"⚠️ Error en el trabajador OCR: {e}")
+            # Sin trabajo: esperar a un envío nuevo (o sondear por si llegó de otro proceso)
+            self.wake.wait(self.poll_interval)
+            self.wake.clear()
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        if self.db is not None:
+            stats["por_estado"] = dict(self.db.reader().execute(
+                "SELECT estado, COUNT(*) FROM ocr_jobs GROUP BY estado"
+            ).fetchall())
+        stats["trabajadores"] = len(self.threads)
+        stats["callbacks_en_cola"] = self.callbacks.qsize()
+        return stats
@@ -1,26 +1,76 @@
 import cv2
 import numpy as np
-import pytesseract
-from PIL import Image
 import re
-import sqlite3
 import base64
+import contextvars
+import functools
 import io
 import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-# Configurar la ruta de Tesseract
-pytesseract.pytesseract.tesseract_cmd = r'C:\Users\Microsoft\AppData\Local\Programs\Tesseract-OCR\tesseract.exe'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import deadline
+from models.database import DB_PATH, get_database
+from models.card_regions import crop, detect_card_regions
+from models.image_decode import decode_frames, decode_grayscale
+from models.ocr_engine import TesseractEngine
+
+# Hilos del pool OCR compartido (cada uno lanza un proceso de Tesseract)
+OCR_WORKERS = int(os.environ.get("OCR_HILOS", os.cpu_count() or 1))
+# Parámetros por sentencia en las búsquedas IN (...) (límite clásico de SQLite: 999)
+MAX_SQL_PARAMS = 900
+
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+def get_ocr_pool():
+    """Pool de hilos compartido por todas las tarjetas de todas las peticiones"""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            _ocr_pool = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+        return _ocr_pool
+
+# Campos que necesita la validación contra la base de datos
+REQUIRED_FIELDS = ['id', 'nombre', 'departamento']
+
+# Escalera del modo adaptativo: (etapa, variante de imagen, configuración de Tesseract),
+# de la más barata a la más costosa
+ESCALATION_LADDER = [
+    ('gris_psm6', 'gris', r'--oem 3 --psm 6'),
+    ('umbral_psm6', 'umbral', r'--oem 3 --psm 6'),
+    ('umbral_psm4', 'umbral', r'--oem 3 --psm 4'),
+    ('ampliada_psm6', 'ampliada', r'--oem 3 --psm 6'),
+    ('ampliada_psm11', 'ampliada', r'--oem 3 --psm 11'),
+]
 
 class OCRProcessor:
     """Procesador OCR para extraer información de tarjetas de empleado"""
     
-    def __init__(self):
-        self.db_path = "data/empresa.db"
+    def __init__(self, confidence_threshold=60, db_path=DB_PATH, shards=None, engine=None):
+        self.db_path = db_path
+        # Motor OCR intercambiable: Tesseract o FakeOCREngine en benchmarks y pruebas
+        self.engine = engine or TesseractEngine()
+        # Con la tabla repartida en shards, las búsquedas van al shard que toque
+        self.shards = shards
+        self.confidence_threshold = confidence_threshold
+        self.stats_lock = threading.Lock()
+        self.adaptive_stats = {
+            "llamadas": 0,
+            "escaladas": 0,
+            "intentos": 0,
+            "por_etapa": {stage: 0 for stage, _, _ in ESCALATION_LADDER}
+        }
         
     def preprocess_image(self, image):
         """Preprocesar imagen para mejorar OCR"""
         # Convertir a escala de grises
-        if len(image.shape) == 3:
+        if image.ndim == 3 and image.shape[2] == 4:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY)
+        elif image.ndim == 3:
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         else:
             gray = image
@@ -46,10 +96,119 @@ class OCRProcessor:
         custom_config = r'--oem 3 --psm 6'
         
         # Extraer texto
-        text = pytesseract.image_to_string(image, config=custom_config, lang='spa')
+        text = self.run_tesseract(self.engine.image_to_string, image, config=custom_config, lang='spa')
         
         return text
     
+    def run_tesseract(self, fn, image, **kwargs):
+        """Llamar al motor OCR con el tiempo que le queda a la petición: al vencer se mata el proceso"""
+        deadline.check("ocr")
+        left = deadline.remaining()
+        try:
+            # timeout=0 es sin límite en pytesseract
+            return fn(image, timeout=max(left, 0.001) if left is not None else 0, **kwargs)
+        except RuntimeError as e:
+            if left is not None and 'timeout' in str(e).lower():
+                raise deadline.cancel("ocr") from e
+            raise
+    
+    def extract_text_with_confidence(self, image, config):
+        """Extraer texto línea por línea junto con la confianza mínima de sus palabras"""
+        data = self.run_tesseract(self.engine.image_to_data, image, config=config, lang='spa')
+        
+        lines = {}
+        for i, word in enumerate(data['text']):
+            conf = float(data['conf'][i])
+            if conf < 0 or not word.strip():
+                continue
+            key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            lines.setdefault(key, []).append((word, conf))
+        
+        line_list = [
+            (" ".join(word for word, _ in words), min(conf for _, conf in words))
+            for _, words in sorted(lines.items())
+        ]
+        text = "\n".join(line for line, _ in line_list)
+        return text, line_list
+    
+    def field_confidences(self, extracted_data, lines):
+        """Confianza de cada campo requerido: la de la línea donde aparece su valor"""
+        confidences = {}
+        for field in REQUIRED_FIELDS:
+            if field not in extracted_data:
+                continue
+            value = str(extracted_data[field]).split('\n')[0].strip().lower()
+            matches = [(line.lower(), conf) for line, conf in lines if value and value in line.lower()]
+            # Preferir la línea con la etiqueta del campo ("ID: 12") a cualquier otra con el valor
+            labeled = [conf for line, conf in matches if re.search(rf'\b{field}\b', line)]
+            confidences[field] = (labeled or [conf for _, conf in matches] or [0.0])[0]
+        return confidences
+    
+    def build_variant(self, gray, variant):
+        """Construir la variante de preprocesado que pide una etapa"""
+        if variant == 'gris':
+            return gray
+        if variant == 'umbral':
+            return self.preprocess_image(gray)
+        # Ampliar 2x y binarizar con Otsu: más lento, mejor en escaneos pequeños o borrosos
+        enlarged = cv2.resize(gray, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+        enlarged = cv2.medianBlur(enlarged, 3)
+        _, binary = cv2.threshold(enlarged, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return binary
+    
+    def extract_adaptive(self, gray):
+        """OCR adaptativo: empezar por la configuración más barata y escalar solo si
+        faltan campos requeridos o su confianza queda por debajo del umbral"""
+        variants = {}
+        best = None
+        attempts = 0
+        
+        for stage, variant, config in ESCALATION_LADDER:
+            if variant not in variants:
+                variants[variant] = self.build_variant(gray, variant)
+            
+            attempts += 1
+            text, lines = self.extract_text_with_confidence(variants[variant], config)
+            extracted_data = self.parse_employee_card(text)
+            confidences = self.field_confidences(extracted_data, lines)
+            
+            candidate = {
+                'texto': text,
+                'datos': extracted_data,
+                'confianza_campos': confidences,
+                'etapa': stage,
+                # Preferir más campos requeridos y, a igualdad, más confianza
+                'puntaje': (len(confidences), sum(confidences.values()))
+            }
+            if best is None or candidate['puntaje'] > best['puntaje']:
+                best = candidate
+            
+            missing = [f for f in REQUIRED_FIELDS if f not in extracted_data]
+            low = [f for f, conf in confidences.items() if conf < self.confidence_threshold]
+            if not missing and not low:
+                break
+        
+        with self.stats_lock:
+            self.adaptive_stats["llamadas"] += 1
+            self.adaptive_stats["intentos"] += attempts
+            self.adaptive_stats["escaladas"] += attempts > 1
+            # Etapa de la que sale el resultado devuelto, no la última que se probó
+            self.adaptive_stats["por_etapa"][best["etapa"]] += 1
+        
+        best['intentos'] = attempts
+        del best['puntaje']
+        return best
+    
+    def get_adaptive_stats(self):
+        """Estadísticas del modo adaptativo (tasa de escalado, etapa en que se resolvió)"""
+        with self.stats_lock:
+            stats = dict(self.adaptive_stats)
+            stats["por_etapa"] = dict(self.adaptive_stats["por_etapa"])
+        llamadas = stats["llamadas"]
+        stats["tasa_escalado"] = stats["escaladas"] / llamadas if llamadas else 0.0
+        stats["intentos_promedio"] = stats["intentos"] / llamadas if llamadas else 0.0
+        return stats
+    
     def parse_employee_card(self, text):
         """Parsear texto extraído para obtener información del empleado"""
         # Limpiar texto
@@ -64,6 +223,11 @@ class OCRProcessor:
             'cargo': r'cargo[:\s]*([a-zA-ZáéíóúÁÉÍÓÚñÑ\s]+)',
             'email': r'email[:\s]*([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})',
             'telefono': r'tel[éf]fono[:\s]*(\d{10})',
+            'salario': r'salario[:\s]*\$?\s*([\d,\.]+)',
+            'edad': r'edad[:\s]*(\d+)',
+            'ciudad': r'ciudad[:\s]*([^\n]+)',
+            'experiencia_anos': r'experiencia[:\s]*(\d+)',
+            'nivel_educacion': r'educaci[oó]n[:\s]*([^\n]+)',
         }
         
         extracted_data = {}
@@ -98,20 +262,44 @@ class OCRProcessor:
         
         return extracted_data
     
-    def validate_employee_data(self, extracted_data):
-        """Validar datos extraídos contra la base de datos"""
+    def lookup_employees(self, ids):
+        """Empleados de muchos IDs con una sola consulta IN (...) por bloque; {str(id): fila}"""
+        ids = sorted({str(i) for i in ids if str(i).isdigit()})
+        if self.shards is not None:
+            return {str(employee_id): row for employee_id, row in self.shards.lookup(ids).items()}
+        cursor = get_database(self.db_path).reader().cursor()
+        employees = {}
+        for start in range(0, len(ids), MAX_SQL_PARAMS):
+            chunk = ids[start:start + MAX_SQL_PARAMS]
+            cursor.execute(
+                f"SELECT * FROM empleados WHERE id IN ({', '.join('?' * len(chunk))})",
+                [int(i) for i in chunk]
+            )
+            for row in cursor.fetchall():
+                employees[str(row[0])] = row
+        return employees
+    
+    def validate_employee_data(self, extracted_data, employees=None, valid_departments=None):
+        """Validar datos extraídos contra la base de datos.
+        
+        `employees` ({id: fila}, de lookup_employees) y `valid_departments` permiten
+        validar muchas tarjetas sin repetir esas consultas por cada una.
+        """
         if not extracted_data:
             return {'success': False, 'error': 'No se pudieron extraer datos'}
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         validation_results = {}
         
         # Validar por ID si existe
         if 'id' in extracted_data:
-            cursor.execute("SELECT * FROM empleados WHERE id = ?", (extracted_data['id'],))
-            employee = cursor.fetchone()
+            if employees is not None:
+                employee = employees.get(str(extracted_data['id']))
+            elif self.shards is not None:
+                employee = self.shards.get(extracted_data['id']) if str(extracted_data['id']).isdigit() else None
+            else:
+                employee = get_database(self.db_path).reader().execute(
+                    "SELECT * FROM empleados WHERE id = ?", (extracted_data['id'],)
+                ).fetchone()
             if employee:
                 validation_results['empleado_encontrado'] = {
                     'id': employee[0],
@@ -131,15 +319,14 @@ class OCRProcessor:
         # Validar por nombre si existe
         if 'nombre' in extracted_data:
             # Buscar nombres similares
-            cursor.execute("SELECT * FROM empleados WHERE nombre LIKE ?", (f"%{extracted_data['nombre']}%",))
-            employees = cursor.fetchall()
-            if employees:
+            similar = self.query("SELECT * FROM empleados WHERE nombre LIKE ?", (f"%{extracted_data['nombre']}%",))
+            if similar:
                 validation_results['empleados_similares'] = [
                     {
                         'id': emp[0],
                         'nombre': emp[1],
                         'departamento': emp[2]
-                    } for emp in employees
+                    } for emp in similar
                 ]
                 validation_results['coincidencia_nombre'] = True
             else:
@@ -147,8 +334,8 @@ class OCRProcessor:
         
         # Validar departamento
         if 'departamento' in extracted_data:
-            cursor.execute("SELECT DISTINCT departamento FROM empleados")
-            valid_departments = [row[0] for row in cursor.fetchall()]
+            if valid_departments is None:
+                valid_departments = self.valid_departments()
             
             dept_lower = extracted_data['departamento'].lower()
             validation_results['departamento_valido'] = any(
@@ -156,64 +343,150 @@ class OCRProcessor:
                 for valid in valid_departments
             )
         
-        conn.close()
-        
         return validation_results
     
-    def process_image(self, image_base64):
+    def valid_departments(self):
+        rows = self.query("SELECT DISTINCT departamento FROM empleados")
+        return sorted({row[0] for row in rows})
+    
+    def query(self, sql, params=()):
+        """Filas de una consulta de lectura, en el archivo único o en todos los shards"""
+        if self.shards is not None:
+            return self.shards.query_all(sql, params)
+        return get_database(self.db_path).reader().execute(sql, params).fetchall()
+    
+    def process_image(self, image_base64, adaptive=False):
         """Procesar imagen base64 y extraer información"""
         try:
             # Decodificar imagen base64
             image_data = base64.b64decode(image_base64)
-            image = Image.open(io.BytesIO(image_data))
-            
-            # Convertir a numpy array
-            image_np = np.array(image)
-            
-            # Preprocesar imagen
-            processed_image = self.preprocess_image(image_np)
-            
-            # Extraer texto
-            extracted_text = self.extract_text_from_image(processed_image)
+        except Exception as e:
+            return self.error_result(e)
+        
+        return self.process_image_bytes(image_data, adaptive=adaptive)
+    
+    def process_image_bytes(self, image_data, adaptive=False):
+        """Procesar los bytes de una imagen (PNG, JPG, ...) y extraer información"""
+        try:
+            # Decodificar directamente a un único búfer en escala de grises
+            gray = decode_grayscale(image_data)
             
-            # Parsear datos
-            extracted_data = self.parse_employee_card(extracted_text)
+            result = self.ocr_card(gray, adaptive=adaptive)
             
             # Validar datos
-            validation_results = self.validate_employee_data(extracted_data)
+            result['validacion'] = self.validate_employee_data(result['datos_extraidos'])
+            return result
             
+        except Exception as e:
+            # Un OCR o una consulta cortados por el plazo no son un fallo de la tarjeta: 504
+            deadline.raise_if_cancelled(e)
+            return self.error_result(e)
+    
+    def ocr_card(self, gray, adaptive=False):
+        """OCR y parseo de una tarjeta ya en gris (sin validar contra la base de datos)"""
+        if adaptive:
+            adaptive_result = self.extract_adaptive(gray)
             return {
                 'success': True,
-                'texto_extraido': extracted_text,
-                'datos_extraidos': extracted_data,
-                'validacion': validation_results
+                'texto_extraido': adaptive_result['texto'],
+                'datos_extraidos': adaptive_result['datos'],
+                'ocr_adaptativo': {
+                    'etapa': adaptive_result['etapa'],
+                    'intentos': adaptive_result['intentos'],
+                    'confianza_campos': adaptive_result['confianza_campos']
+                }
             }
-            
+        
+        # Preprocesar imagen
+        processed_image = self.preprocess_image(gray)
+        
+        # Extraer texto
+        extracted_text = self.extract_text_from_image(processed_image)
+        
+        # Parsear datos
+        return {
+            'success': True,
+            'texto_extraido': extracted_text,
+            'datos_extraidos': self.parse_employee_card(extracted_text)
+        }
+    
+    def ocr_region(self, gray, adaptive):
+        """OCR de una región en un hilo del pool; un fallo queda en su propia tarjeta"""
+        try:
+            return self.ocr_card(gray, adaptive=adaptive)
         except Exception as e:
-            return {
-                'success': False,
-                'error': str(e),
-                'texto_extraido': '',
-                'datos_extraidos': {},
-                'validacion': {}
-            }
+            deadline.raise_if_cancelled(e)
+            result = self.error_result(e)
+            del result['validacion']
+            return result
+    
+    def process_document(self, image_data, adaptive=False):
+        """Procesar un documento con varias páginas y/o varias tarjetas por página.
+        
+        Cada página se divide en regiones de tarjeta y todas las regiones se
+        procesan en paralelo en el pool OCR compartido (con el contexto de la
+        petición, así el plazo llega a cada Tesseract). Los IDs extraídos se
+        validan juntos con una sola consulta IN (...).
+        """
+        try:
+            frames = decode_frames(image_data)
+        except Exception as e:
+            return self.error_result(e)
+        
+        regions = []
+        for page, frame in enumerate(frames, start=1):
+            for region in detect_card_regions(frame):
+                regions.append((page, region, crop(frame, region)))
+        
+        pool = get_ocr_pool()
+        futures = [
+            pool.submit(contextvars.copy_context().run, self.ocr_region, card, adaptive)
+            for _, _, card in regions
+        ]
+        results = [future.result() for future in futures]
+        
+        # Validación conjunta: una consulta para todos los IDs y otra para los departamentos
+        extracted = [result['datos_extraidos'] for result in results if result['success']]
+        employees = self.lookup_employees(data['id'] for data in extracted if 'id' in data)
+        departments = self.valid_departments() if any('departamento' in data for data in extracted) else []
+        
+        cards = []
+        for (page, region, _), result in zip(regions, results):
+            card = {'pagina': page, 'region': list(region), **result}
+            if result['success']:
+                card['validacion'] = self.validate_employee_data(
+                    result['datos_extraidos'], employees=employees, valid_departments=departments
+                )
+            cards.append(card)
+        
+        return {
+            'success': True,
+            'paginas': len(frames),
+            'total_tarjetas': len(cards),
+            'tarjetas_validadas': sum(1 for card in cards if card.get('validacion', {}).get('coincidencia_id')),
+            'tarjetas': cards
+        }
     
-    def create_sample_card(self, employee_data, output_path):
-        """Crear una tarjeta de empleado de muestra"""
-        from PIL import Image, ImageDraw, ImageFont
+    def error_result(self, error):
+        """Resultado estándar cuando falla el procesamiento"""
+        return {
+            'success': False,
+            'error': str(error),
+            'texto_extraido': '',
+            'datos_extraidos': {},
+            'validacion': {}
+        }
+    
+    def create_sample_card(self, employee_data, output_path=None, formato=None):
+        """Crear una tarjeta de empleado de muestra (sin output_path devuelve los bytes de la imagen)"""
+        from PIL import Image, ImageDraw
         
         # Crear imagen
         width, height = 400, 300
         image = Image.new('RGB', (width, height), 'white')
         draw = ImageDraw.Draw(image)
         
-        # Configurar fuente (usar fuente por defecto)
-        try:
-            font = ImageFont.truetype("arial.ttf", 20)
-            font_small = ImageFont.truetype("arial.ttf", 16)
-        except:
-            font = ImageFont.load_default()
-            font_small = ImageFont.load_default()
+        font, font_small = card_fonts()
         
         # Dibujar contenido
         y_position = 30
@@ -223,35 +496,51 @@ class OCRProcessor:
         y_position += 40
         
         # Información del empleado
-        info_lines = [
-            f"Nombre: {employee_data['nombre']}",
-            f"ID: {employee_data['id']}",
-            f"Departamento: {employee_data['departamento']}",
-            f"Salario: ${employee_data['salario']:,}",
-            f"Edad: {employee_data['edad']} años",
-            f"Ciudad: {employee_data['ciudad']}",
-            f"Experiencia: {employee_data['experiencia_anos']} años",
-            f"Educación: {employee_data['nivel_educacion']}"
-        ]
-        
-        for line in info_lines:
+        for line in sample_card_lines(employee_data):
             draw.text((20, y_position), line, fill='black', font=font_small)
             y_position += 25
         
+        if output_path is None:
+            buffer = io.BytesIO()
+            image.save(buffer, format=formato or 'PNG')
+            return buffer.getvalue()
+        
         # Guardar imagen
-        image.save(output_path)
+        image.save(output_path, format=formato)
         print(f"✅ Tarjeta de empleado creada: {output_path}")
 
+@functools.lru_cache(maxsize=1)
+def card_fonts():
+    """Fuentes de las tarjetas de muestra (se cargan una sola vez)"""
+    from PIL import ImageFont
+    
+    # Configurar fuente (usar fuente por defecto)
+    try:
+        return ImageFont.truetype("arial.ttf", 20), ImageFont.truetype("arial.ttf", 16)
+    except OSError:
+        return ImageFont.load_default(), ImageFont.load_default()
+
+def sample_card_lines(employee_data):
+    """Líneas de texto de una tarjeta de muestra (lo que debería leer el OCR)"""
+    return [
+        f"Nombre: {employee_data['nombre']}",
+        f"ID: {employee_data['id']}",
+        f"Departamento: {employee_data['departamento']}",
+        f"Salario: ${employee_data['salario']:,}",
+        f"Edad: {employee_data['edad']} años",
+        f"Ciudad: {employee_data['ciudad']}",
+        f"Experiencia: {employee_data['experiencia_anos']} años",
+        f"Educación: {employee_data['nivel_educacion']}"
+    ]
+
 def create_sample_cards():
     """Crear tarjetas de empleado de muestra"""
     processor = OCRProcessor()
     
     # Cargar datos de empleados
-    conn = sqlite3.connect(processor.db_path)
-    cursor = conn.cursor()
+    cursor = get_database(processor.db_path).reader().cursor()
     cursor.execute("SELECT * FROM empleados LIMIT 3")
     employees = cursor.fetchall()
-    conn.close()
     
     # Crear directorio si no existe
     os.makedirs("data/sample_cards", exist_ok=True)
@@ -0,0 +1,301 @@
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import WRITE_TIMEOUT
+from models.vocabulary import DEPARTAMENTOS, CIUDADES, NIVELES_EDUCACION, find_keyword
+
+# Filtros de igualdad y de rango, en el orden canónico de la cláusula WHERE
+EQUALITY_SLOTS = [
+    ("departamento", DEPARTAMENTOS),
+    ("ciudad", CIUDADES),
+    ("nivel_educacion", NIVELES_EDUCACION),
+]
+RANGE_COLUMNS = ["salario", "edad", "experiencia_anos"]
+
+# Índices que sirven las plantillas: prefijo de igualdades + rango de salario, con edad y
+# experiencia al final para que cubran el COUNT(*) sin leer la tabla; y un índice simple
+# por columna de rango para las preguntas sin igualdades
+FILTER_INDEXES = {
+    "idx_empleados_filtros": "departamento, ciudad, nivel_educacion, salario, edad, experiencia_anos",
+    "idx_empleados_ciudad_filtros": "ciudad, nivel_educacion, salario, edad, experiencia_anos",
+    "idx_empleados_nivel_filtros": "nivel_educacion, salario, edad, experiencia_anos",
+    "idx_empleados_salario": "salario",
+    "idx_empleados_edad": "edad",
+    "idx_empleados_experiencia": "experiencia_anos",
+}
+
+NUMBER = r'\$?\s*(\d{1,3}(?:[.,]\d{3})+|\d+)(?:\s*(k|mil)\b)?'
+UNIT = r'(?:\s*(años de experiencia|años|pesos))?'
+# Frase de comparación -> operador
+OPERATORS = [
+    (r'm[aá]s de|mayor(?:es)? (?:de|a|que)|superior(?:es)? a|por encima de|arriba de', '>'),
+    (r'menos de|menor(?:es)? (?:de|a|que)|inferior(?:es)? a|por debajo de|abajo de', '<'),
+    (r'al menos|como m[ií]nimo|m[ií]nimo|desde', '>='),
+    (r'hasta|como m[aá]ximo|m[aá]ximo|no m[aá]s de', '<='),
+]
+COMPARISON_RE = re.compile(
+    r'\b(' + '|'.join(f'(?:{phrase})' for phrase, _ in OPERATORS) + r')\s+' + NUMBER + UNIT
+)
+BETWEEN_RE = re.compile(r'\bentre\s+' + NUMBER + r'\s+y\s+' + NUMBER + UNIT)
+EXACT_AGE_RE = re.compile(r'\b(?:tienen|de|con)\s+(\d{1,2})\s+años\b(?!\s+de experiencia)')
+
+SALARY_WORDS = re.compile(r'(ganan?|cobran?|salario|sueldo|pesos|\$)')
+EXPERIENCE_WORDS = re.compile(r'experiencia')
+AGE_WORDS = re.compile(r'(edad|mayores|menores|j[oó]venes)')
+
+def parse_number(digits, multiplier=None):
+    value = int(re.sub(r'[.,]', '', digits))
+    if multiplier:
+        value *= 1000
+    return value
+
+def operator_for(phrase):
+    for pattern, operator in OPERATORS:
+        if re.fullmatch(pattern, phrase):
+            return operator
+    return None
+
+def infer_column(text, start, value, unit):
+    """Columna de un número según su unidad, las palabras previas o su magnitud"""
+    if unit == "años de experiencia":
+        return "experiencia_anos"
+    if unit == "años":
+        return "edad"
+    if unit == "pesos":
+        return "salario"
+
+    before = text[max(0, start - 30):start]
+    if SALARY_WORDS.search(before):
+        return "salario"
+    if EXPERIENCE_WORDS.search(before):
+        return "experiencia_anos"
+    if AGE_WORDS.search(before):
+        return "edad"
+    return "salario" if value >= 1000 else "edad"
+
+def parse_filter_question(pregunta):
+    """Extraer los filtros de una pregunta: igualdades {col: valor} y rangos {col: [min, max]}
+
+    Los rangos son cerrados y enteros (más de 50000 -> [50001, None]), así dos
+    preguntas que piden lo mismo con distintas palabras dan la misma consulta.
+    """
+    text = pregunta.lower()
+
+    igualdades = {}
+    for col, keywords in EQUALITY_SLOTS:
+        value = find_keyword(text, keywords)
+        if value:
+            igualdades[col] = value
+
+    rangos = {}
+
+    def restrict(col, low, high):
+        current_low, current_high = rangos.get(col, [None, None])
+        if low is not None:
+            current_low = low if current_low is None else max(current_low, low)
+        if high is not None:
+            current_high = high if current_high is None else min(current_high, high)
+        rangos[col] = [current_low, current_high]
+
+    for match in BETWEEN_RE.finditer(text):
+        low = parse_number(match.group(1), match.group(2))
+        high = parse_number(match.group(3), match.group(4))
+        low, high = min(low, high), max(low, high)
+        restrict(infer_column(text, match.start(), high, match.group(5)), low, high)
+
+    for match in COMPARISON_RE.finditer(text):
+        operator = operator_for(match.group(1))
+        value = parse_number(match.group(2), match.group(3))
+        col = infer_column(text, match.start(), value, match.group(4))
+        if operator == '>':
+            restrict(col, value + 1, None)
+        elif operator == '>=':
+            restrict(col, value, None)
+        elif operator == '<':
+            restrict(col, None, value - 1)
+        else:
+            restrict(col, None, value)
+
+    if "edad" not in rangos:
+        match = EXACT_AGE_RE.search(text)
+        if match:
+            age = int(match.group(1))
+            restrict("edad", age, age)
+
+    return {"igualdades": igualdades, "rangos": rangos}
+
+class QueryCompiler:
+    """Compila filtros a un conjunto pequeño de plantillas SQL parametrizadas.
+
+    La plantilla depende solo de qué filtros hay (y de qué lados tiene cada rango),
+    nunca de los valores: las columnas van en orden fijo y los valores como
+    parámetros. Así el texto SQL se repite y el caché de sentencias de cada conexión
+    (cached_statements de sqlite3) reutiliza la sentencia preparada en lugar de
+    volver a compilarla. Las plantillas compiladas se guardan en un LRU propio.
+    """
+
+    def __init__(self, table="empleados", max_templates=256):
+        self.table = table
+        self.max_templates = max_templates
+        self.templates = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"consultas": 0, "plantillas_compiladas": 0, "aciertos_plantilla": 0}
+
+    def template_key(self, filtros):
+        """Forma canónica de los filtros: columnas presentes y tipo de comparación"""
+        igualdades = filtros.get("igualdades") or {}
+        rangos = filtros.get("rangos") or {}
+        key = [col for col, _ in EQUALITY_SLOTS if igualdades.get(col) is not None]
+        for col in RANGE_COLUMNS:
+            low, high = rangos.get(col) or (None, None)
+            if low is not None and high is not None:
+                key.append((col, "eq" if low == high else "entre"))
+            elif low is not None:
+                key.append((col, "ge"))
+            elif high is not None:
+                key.append((col, "le"))
+        return tuple(key)
+
+    def compile_template(self, key, select):
+        where = []
+        for item in key:
+            if isinstance(item, str):
+                where.append(f"{item} = ?")
+                continue
+            col, kind = item
+            where.append({
+                "eq": f"{col} = ?",
+                "entre": f"{col} BETWEEN ? AND ?",
+                "ge": f"{col} >= ?",
+                "le": f"{col} <= ?",
+            }[kind])
+        sql = f"SELECT {select} FROM {self.table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return sql
+
+    def params(self, key, filtros):
+        igualdades = filtros.get("igualdades") or {}
+        rangos = filtros.get("rangos") or {}
+        params = []
+        for item in key:
+            if isinstance(item, str):
+                params.append(igualdades[item])
+                continue
+            col, kind = item
+            low, high = rangos[col]
+            if kind == "eq":
+                params.append(low)
+            elif kind == "entre":
+                params.extend([low, high])
+            else:
+                params.append(low if kind == "ge" else high)
+        return params
+
+    def compile(self, filtros, select="COUNT(*)"):
+        """(sql, params) de unos filtros; el SQL sale del LRU si la plantilla ya existe"""
+        key = (select, self.template_key(filtros))
+        with self.lock:
+            sql = self.templates.get(key)
+            if sql is not None:
+                self.templates.move_to_end(key)
+                self.stats["aciertos_plantilla"] += 1
+            else:
+                sql = self.compile_template(key[1], select)
+                self.templates[key] = sql
+                self.stats["plantillas_compiladas"] += 1
+                if len(self.templates) > self.max_templates:
+                    self.templates.popitem(last=False)
+        return sql, self.params(key[1], filtros)
+
+    def count(self, conn, filtros):
+        """Número de empleados que cumplen los filtros"""
+        sql, params = self.compile(filtros)
+        with self.lock:
+            self.stats["consultas"] += 1
+        return conn.execute(sql, params).fetchone()[0]
+
+    def reset_stats(self):
+        """Reiniciar los contadores (las plantillas compiladas se conservan)"""
+        with self.lock:
+            self.stats = {"consultas": 0, "plantillas_compiladas": 0, "aciertos_plantilla": 0}
+
+    def get_stats(self):
+        with self.lock:
+            return {**self.stats, "plantillas": len(self.templates)}
+
+def analyze(conn):
+    """Estadísticas para que el planificador elija el índice más selectivo.
+
+    Recorre la tabla y los índices, así que no se ejecuta en cada arranque: solo al
+    crear los índices y después de una ingesta grande (ANALYZE_MIN_FILAS en ingest.py).
+    """
+    conn.execute("ANALYZE empleados")
+
+def ensure_indexes(db):
+    """Crear los índices de filtros que falten (por el escritor único) y actualizar estadísticas"""
+    def create(conn):
+        existing = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'empleados'"
+        )}
+        missing = [name for name in FILTER_INDEXES if name not in existing]
+        for name in missing:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON empleados ({FILTER_INDEXES[name]})")
+        if missing:
+            analyze(conn)
+        return missing
+
+    return db.write(create).result(timeout=WRITE_TIMEOUT)
+
+def describe_filters(filtros):
+    """Texto de los filtros para la respuesta del chatbot"""
+    igualdades = filtros["igualdades"]
+    partes = []
+    if "departamento" in igualdades:
+        partes.append(f"del departamento de {igualdades['departamento']}")
+    if "ciudad" in igualdades:
+        partes.append(f"en {igualdades['ciudad']}")
+    if "nivel_educacion" in igualdades:
+        partes.append(f"con {igualdades['nivel_educacion']}")
+
+    formats = {
+        "salario": ("salario", lambda v: f"${v:,}"),
+        "edad": ("edad", lambda v: f"{v} años"),
+        "experiencia_anos": ("experiencia", lambda v: f"{v} años"),
+    }
+    rangos = []
+    for col in RANGE_COLUMNS:
+        if col not in filtros["rangos"]:
+            continue
+        label, fmt = formats[col]
+        low, high = filtros["rangos"][col]
+        # Los rangos son enteros y cerrados: se describen con sus extremos incluidos
+        # ("al menos 50000" -> [50000, None] -> "al menos $50,000")
+        if low is not None and high is not None:
+            rangos.append(f"{label} de {fmt(low)}" if low == high else f"{label} entre {fmt(low)} y {fmt(high)}")
+        elif low is not None:
+            rangos.append(f"{label} de al menos {fmt(low)}")
+        else:
+            rangos.append(f"{label} de como máximo {fmt(high)}")
+    if rangos:
+        partes.append("con " + " y ".join(rangos))
+    return " ".join(partes)
+
+def answer_filter_question(compiler, conn, pregunta, shards=None):
+    """Responder una pregunta de conteo con filtros compuestos (sumando entre shards si los hay)"""
+    filtros = parse_filter_question(pregunta)
+    if not filtros["igualdades"] and not filtros["rangos"]:
+        return None
+
+    for col, (low, high) in filtros["rangos"].items():
+        if low is not None and high is not None and low > high:
+            return f"No hay empleados {describe_filters(filtros)}: el rango está vacío."
+
+    count = shards.count_filtered(compiler, filtros) if shards is not None else compiler.count(conn, filtros)
+    sujeto = "empleado" if count == 1 else "empleados"
+    return f"Hay {count} {sujeto} {describe_filters(filtros)}."
@@ -0,0 +1,142 @@
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import get_database
+
+QUERY_LOG_PATH = "data/query_log.db"
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS preguntas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fecha REAL NOT NULL,
+        tenant TEXT,
+        pregunta TEXT NOT NULL,
+        categoria TEXT,
+        confianza REAL,
+        latencia_ms REAL
+    )
+"""
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_preguntas_fecha ON preguntas (fecha)",
+    "CREATE INDEX IF NOT EXISTS idx_preguntas_categoria ON preguntas (categoria, confianza)",
+]
+INSERT_SQL = (
+    "INSERT INTO preguntas (fecha, tenant, pregunta, categoria, confianza, latencia_ms) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+class QueryLogger:
+    """Registro write-behind de las preguntas del chatbot.
+
+    log() solo agrega el evento a un búfer en memoria (sin tocar SQLite en la
+    petición); un hilo lo vacía en una transacción cuando junta `flush_size`
+    eventos o pasan `flush_interval` segundos. El búfer está acotado: si se
+    llena (el disco no da abasto), los eventos nuevos se descartan y se cuentan.
+    """
+
+    def __init__(self, db_path=QUERY_LOG_PATH, max_buffer=10000, flush_size=500, flush_interval=2.0):
+        self.db_path = db_path
+        self.max_buffer = max_buffer
+        # Nunca esperar a un lote más grande que el propio búfer
+        self.flush_size = min(flush_size, max_buffer)
+        self.flush_interval = flush_interval
+        self.buffer = deque()
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+        self.stats = {"registradas": 0, "escritas": 0, "descartadas": 0, "lotes": 0, "errores": 0,
+                      "ultimo_lote_ms": 0.0}
+
+    def start(self):
+        """Crear la tabla si falta y arrancar el hilo de volcado"""
+        if self.thread is not None:
+            return
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = get_database(self.db_path).connect(read_only=False)
+        try:
+            conn.execute(SCHEMA)
+            for sql in INDEXES:
+                conn.execute(sql)
+            conn.commit()
+        finally:
+            conn.close()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="query-log", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Volcar lo pendiente y detener el hilo"""
+        if self.thread is None:
+            return
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+        self.thread = None
+
+    def log(self, pregunta, categoria, confianza, latencia_ms, tenant=None):
+        """Registrar una pregunta (O(1), nunca bloquea en disco); False si se descartó"""
+        with self.condition:
+            if not self.running:
+                return False
+            if len(self.buffer) >= self.max_buffer:
+                self.stats["descartadas"] += 1
+                return False
+            self.buffer.append((time.time(), tenant, pregunta, categoria, confianza, latencia_ms))
+            self.stats["registradas"] += 1
+            if len(self.buffer) >= self.flush_size:
+                self.condition.notify()
+        return True
+
+    def take_batch(self):
+        """Esperar a que haya un lote (por tamaño o por tiempo) y sacarlo del búfer"""
+        with self.condition:
+            deadline = time.monotonic() + self.flush_interval
+            while self.running and len(self.buffer) < self.flush_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                self.condition.wait(timeout)
+            batch = list(self.buffer)
+            self.buffer.clear()
+            return batch
+
+    def write_batch(self, conn, batch):
+        start = time.perf_counter()
+        try:
+            with conn:
+                conn.executemany(INSERT_SQL, batch)
+        except Exception as e:
+            print(f"⚠️ Error escribiendo el registro de preguntas: {e}")
+            with self.condition:
+                self.stats["errores"] += 1
+                self.stats["descartadas"] += len(batch)
+            return
+        with self.condition:
+            self.stats["escritas"] += len(batch)
+            self.stats["lotes"] += 1
+            self.stats["ultimo_lote_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    def run(self):
+        # Conexión propia del hilo: es el único escritor de este archivo
+        conn = get_database(self.db_path).connect(read_only=False, check_same_thread=False)
+        try:
+            while True:
+                with self.condition:
+                    running = self.running
+                batch = self.take_batch()
+                if batch:
+                    self.write_batch(conn, batch)
+                if not running:
+                    break
+        finally:
+            conn.close()
+
+    def get_stats(self):
+        with self.condition:
+            return {**self.stats, "en_buffer": len(self.buffer), "activo": self.running}
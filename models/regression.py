@@ -1,4 +1,3 @@
-import sqlite3
 import pandas as pd
 import numpy as np
 from sklearn.linear_model import LinearRegression
@@ -7,28 +6,37 @@ from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import pickle
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import DB_PATH, get_database
 
 class SalaryPredictor:
     """Modelo de regresión para predecir salarios de empleados"""
     
-    def __init__(self):
+    def __init__(self, db_path=DB_PATH, model_dir="models", shards=None):
+        self.db_path = db_path
+        # Con la tabla repartida, el entrenamiento junta las filas de todos los shards
+        self.shards = shards
         self.model = None
         self.label_encoders = {}
         self.scaler = StandardScaler()
-        self.model_path = "models/salary_predictor.pkl"
-        self.encoders_path = "models/label_encoders.pkl"
-        self.scaler_path = "models/scaler.pkl"
+        self.model_path = os.path.join(model_dir, "salary_predictor.pkl")
+        self.encoders_path = os.path.join(model_dir, "label_encoders.pkl")
+        self.scaler_path = os.path.join(model_dir, "scaler.pkl")
         
     def load_data(self):
-        """Cargar datos de la base de datos"""
-        conn = sqlite3.connect('data/empresa.db')
-        query = """
-        SELECT edad, experiencia_anos, departamento, nivel_educacion, salario
+        """Cargar datos de la base de datos (en orden de id, el mismo con o sin shards)"""
+        columns = ['edad', 'experiencia_anos', 'departamento', 'nivel_educacion', 'salario']
+        if self.shards is not None:
+            return pd.DataFrame(self.shards.ordered(', '.join(columns)), columns=columns)
+        query = f"""
+        SELECT {', '.join(columns)}
         FROM empleados
+        ORDER BY id
         """
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        return df
+        return pd.read_sql_query(query, get_database(self.db_path).reader())
     
     def prepare_features(self, df):
         """Preparar features para el modelo"""
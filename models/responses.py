@@ -0,0 +1,42 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Campos de diagnóstico que pesan mucho y el frontend casi nunca usa
+HEAVY_FIELDS = {"probabilidades", "texto_extraido", "empleados_similares"}
+
+def parse_fields(fields):
+    """Convertir `fields=a,b,c` en un conjunto de claves (None si no se indicó)"""
+    if not fields:
+        return None
+    return {field.strip() for field in fields.split(',') if field.strip()}
+
+def drop_heavy(value):
+    """Copia de la respuesta sin los campos pesados, a cualquier profundidad"""
+    if isinstance(value, dict):
+        return {k: drop_heavy(v) for k, v in value.items() if k not in HEAVY_FIELDS}
+    if isinstance(value, list):
+        return [drop_heavy(v) for v in value]
+    return value
+
+def shape_response(data, verbose=True, fields=None):
+    """Recortar una respuesta según `verbose` y `fields` sin modificar el original.
+
+    `fields` selecciona claves de primer nivel; con verbose=False se quitan además
+    los campos pesados (probabilidades, texto OCR y candidatos) anidados.
+    """
+    selected = parse_fields(fields)
+    if selected is not None:
+        data = {k: v for k, v in data.items() if k in selected}
+    if not verbose:
+        data = drop_heavy(data)
+    return data
+
+def dumps(data):
+    """Serializar a bytes JSON con orjson si está instalado (con la salida de json como respaldo)"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
@@ -0,0 +1,298 @@
+import bisect
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.hot_reload import CLASSIFIER, MODEL_KINDS, PREDICTOR, content_version, read_files
+
+# Límites superiores (ms) de las cubetas del histograma de latencia
+LATENCY_BUCKETS_MS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000]
+# Diferencias recientes que se guardan para los percentiles del predictor
+RECENT_DELTAS = 2000
+
+# Fracción de peticiones que también evalúa el candidato y muestras en cola como máximo
+SAMPLE_RATE = float(os.environ.get("SOMBRA_MUESTREO", 0.1))
+MAX_PENDING = int(os.environ.get("SOMBRA_MAX_PENDIENTES", 100))
+CANDIDATE_DIRNAME = "candidato"
+
+class LatencyHistogram:
+    """Histograma de latencias con cubetas fijas (memoria constante)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+        self.total += 1
+        self.sum_ms += ms
+
+    def percentile(self, q):
+        """Límite superior de la cubeta donde cae el percentil q"""
+        if not self.total:
+            return None
+        target = q * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.buckets[i] if i < len(self.buckets) else float('inf')
+        return None
+
+    def to_dict(self):
+        labels = [f"<={b:g}ms" for b in self.buckets] + [f">{self.buckets[-1]:g}ms"]
+        return {
+            "muestras": self.total,
+            "media_ms": round(self.sum_ms / self.total, 4) if self.total else None,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "cubetas": {label: count for label, count in zip(labels, self.counts) if count}
+        }
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+def timed_pair(live_fn, shadow_fn, *args):
+    """Ejecutar ambos modelos sobre la misma entrada en orden aleatorio (sin ventaja de caché)"""
+    if random.random() < 0.5:
+        live = timed(live_fn, *args)
+        return live, timed(shadow_fn, *args)
+    shadow = timed(shadow_fn, *args)
+    return timed(live_fn, *args), shadow
+
+class ShadowEvaluator:
+    """Evaluación en sombra de modelos candidatos con el tráfico real de un tenant.
+
+    Los candidatos se cargan de `candidate_dir` (mismos archivos que models/). Una
+    muestra de las peticiones (`sample_rate`) se encola a un hilo aparte, fuera
+    del camino de la respuesta: ahí se ejecutan el modelo activo y el candidato
+    sobre la misma entrada, en el mismo hilo, y se registran coincidencias,
+    diferencias y un histograma de latencia por modelo. Si la cola se llena, la
+    muestra se descarta: la sombra nunca frena al tráfico real.
+    """
+
+    def __init__(self, model_set, candidate_dir, sample_rate=SAMPLE_RATE, max_pending=MAX_PENDING):
+        self.model_set = model_set
+        self.candidate_dir = candidate_dir
+        self.sample_rate = sample_rate
+        self.max_pending = max_pending
+        self.candidates = {}
+        self.versions = {}
+        self.pending = 0
+        self.executor = None
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {kind: self.empty_stats(kind) for kind in MODEL_KINDS}
+            self.started = time.time()
+
+    def empty_stats(self, kind):
+        stats = {
+            "muestras": 0, "descartadas": 0, "errores": 0,
+            "latencia_actual": LatencyHistogram(), "latencia_candidato": LatencyHistogram()
+        }
+        if kind == CLASSIFIER:
+            stats.update({"coincidencias": 0, "desacuerdos": Counter(), "delta_confianza": 0.0})
+        else:
+            stats.update({"delta": 0.0, "delta_abs": 0.0, "deltas_relativos": deque(maxlen=RECENT_DELTAS)})
+        return stats
+
+    @property
+    def active(self):
+        return bool(self.candidates) and self.sample_rate > 0
+
+    def load(self, kinds=None, candidate_dir=None):
+        """Cargar (o recargar) candidatos; devuelve {modelo: versión o error}"""
+        if candidate_dir:
+            self.candidate_dir = candidate_dir
+        results = {}
+        for kind in kinds or MODEL_KINDS:
+            try:
+                candidate = self.model_set.reloader.build(kind, model_dir=self.candidate_dir)
+                paths = self.candidate_paths(kind, candidate)
+            except Exception as e:
+                results[kind] = {"error": str(e)}
+                continue
+            with self.lock:
+                self.candidates[kind] = candidate
+                self.versions[kind] = content_version(read_files(paths))
+                self.stats[kind] = self.empty_stats(kind)
+            results[kind] = {"version": self.versions[kind]}
+        if self.candidates and self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sombra")
+        return results
+
+    def load_available(self):
+        """Cargar al arrancar los candidatos que haya en candidate_dir (sin error si no hay)"""
+        if not os.path.isdir(self.candidate_dir):
+            return {}
+        results = self.load()
+        loaded = [kind for kind, result in results.items() if "version" in result]
+        if loaded:
+            print(f"🌓 Candidatos en sombra ({self.sample_rate:.0%} del tráfico): {', '.join(loaded)}")
+        return results
+
+    def candidate_paths(self, kind, candidate):
+        if kind == CLASSIFIER:
+            return [candidate.model_path, candidate.compiled_path]
+        return [candidate.model_path, candidate.encoders_path, candidate.scaler_path]
+
+    def unload(self, kinds=None):
+        """Quitar candidatos (la sombra se apaga cuando no queda ninguno)"""
+        with self.lock:
+            for kind in kinds or MODEL_KINDS:
+                self.candidates.pop(kind, None)
+                self.versions.pop(kind, None)
+
+    def close(self):
+        """Soltar candidatos y detener el hilo (las muestras en cola se descartan)"""
+        self.unload()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def submit(self, kind, fn, *args):
+        """Encolar una muestra si toca por muestreo y hay sitio; nunca bloquea"""
+        if kind not in self.candidates or random.random() >= self.sample_rate:
+            return False
+        with self.lock:
+            if self.executor is None:
+                return False
+            if self.pending >= self.max_pending:
+                self.stats[kind]["descartadas"] += 1
+                return False
+            self.pending += 1
+            self.executor.submit(self.run, kind, fn, args)
+        return True
+
+    def run(self, kind, fn, args):
+        try:
+            fn(*args)
+        except Exception as e:
+            with self.lock:
+                self.stats[kind]["errores"] += 1
+            print(f"⚠️ Error en la evaluación en sombra del {kind}: {e}")
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def observe_question(self, pregunta):
+        """Muestra de una pregunta del chatbot para el clasificador candidato"""
+        return self.submit(CLASSIFIER, self.compare_classifier, pregunta)
+
+    def observe_prediction(self, edad, experiencia_anos, departamento, nivel_educacion):
+        """Muestra de una predicción de salario para el predictor candidato"""
+        return self.submit(PREDICTOR, self.compare_predictor, edad, experiencia_anos, departamento, nivel_educacion)
+
+    def compare_classifier(self, pregunta):
+        candidate = self.candidates.get(CLASSIFIER)
+        if candidate is None:
+            return
+        (live, live_ms), (shadow, shadow_ms) = timed_pair(
+            self.model_set.classifier.predict, candidate.predict, pregunta
+        )
+        with self.lock:
+            stats = self.stats[CLASSIFIER]
+            stats["muestras"] += 1
+            stats["latencia_actual"].add(live_ms)
+            stats["latencia_candidato"].add(shadow_ms)
+            stats["delta_confianza"] += shadow["confianza"] - live["confianza"]
+            if shadow["categoria"] == live["categoria"]:
+                stats["coincidencias"] += 1
+            else:
+                stats["desacuerdos"][(live["categoria"], shadow["categoria"])] += 1
+
+    def compare_predictor(self, *features):
+        candidate = self.candidates.get(PREDICTOR)
+        if candidate is None:
+            return
+        (live, live_ms), (shadow, shadow_ms) = timed_pair(
+            self.model_set.salary_predictor.predict, candidate.predict, *features
+        )
+        delta = shadow["salario_predicho"] - live["salario_predicho"]
+        with self.lock:
+            stats = self.stats[PREDICTOR]
+            stats["muestras"] += 1
+            stats["latencia_actual"].add(live_ms)
+            stats["latencia_candidato"].add(shadow_ms)
+            stats["delta"] += delta
+            stats["delta_abs"] += abs(delta)
+            if live["salario_predicho"]:
+                stats["deltas_relativos"].append(abs(delta) / abs(live["salario_predicho"]))
+
+    def report_kind(self, kind, stats):
+        n = stats["muestras"]
+        live = stats["latencia_actual"].to_dict()
+        shadow = stats["latencia_candidato"].to_dict()
+        report = {
+            "version_actual": self.model_set.reloader.versions.get(kind, {}).get("version"),
+            "version_candidato": self.versions.get(kind),
+            "muestras": n,
+            "descartadas": stats["descartadas"],
+            "errores": stats["errores"],
+            "latencia": {
+                "actual": live,
+                "candidato": shadow,
+                # > 1: el candidato es más lento
+                "razon_media": round(shadow["media_ms"] / live["media_ms"], 3) if n and live["media_ms"] else None
+            }
+        }
+        if kind == CLASSIFIER:
+            report.update({
+                "tasa_coincidencia": round(stats["coincidencias"] / n, 4) if n else None,
+                "delta_confianza_medio": round(stats["delta_confianza"] / n, 4) if n else None,
+                "desacuerdos": [
+                    {"actual": actual, "candidato": candidato, "veces": veces}
+                    for (actual, candidato), veces in stats["desacuerdos"].most_common(10)
+                ]
+            })
+        else:
+            relativos = sorted(stats["deltas_relativos"])
+            report.update({
+                "delta_medio": round(stats["delta"] / n, 2) if n else None,
+                "delta_abs_medio": round(stats["delta_abs"] / n, 2) if n else None,
+                "delta_relativo_p50": round(relativos[len(relativos) // 2], 4) if relativos else None,
+                "delta_relativo_p95": round(relativos[min(len(relativos) - 1, int(len(relativos) * 0.95))], 4)
+                if relativos else None
+            })
+        return report
+
+    def report(self):
+        """Informe de comparación actual frente a candidato, por modelo"""
+        with self.lock:
+            return {
+                "activa": self.active,
+                "muestreo": self.sample_rate,
+                "directorio_candidatos": self.candidate_dir,
+                "desde": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "en_cola": self.pending,
+                "modelos": {
+                    kind: self.report_kind(kind, self.stats[kind]) for kind in MODEL_KINDS
+                    if kind in self.candidates or self.stats[kind]["muestras"]
+                }
+            }
+
+    def get_stats(self):
+        """Resumen para /metrics (el informe completo está en /admin/sombra)"""
+        with self.lock:
+            return {
+                "activa": self.active,
+                "muestreo": self.sample_rate,
+                "en_cola": self.pending,
+                "candidatos": dict(self.versions),
+                "muestras": {kind: stats["muestras"] for kind, stats in self.stats.items()},
+                "descartadas": {kind: stats["descartadas"] for kind, stats in self.stats.items()}
+            }
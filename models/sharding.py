@@ -0,0 +1,258 @@
+import contextvars
+import heapq
+import json
+import os
+import sys
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import get_database, release_database
+
+MANIFEST = "manifest.json"
+PARTITION_HASH = "hash"
+PARTITION_DEPARTMENT = "departamento"
+PARTITIONS = [PARTITION_HASH, PARTITION_DEPARTMENT]
+
+# Parámetros por sentencia en las búsquedas IN (...) (límite clásico de SQLite: 999)
+MAX_SQL_PARAMS = 900
+
+# Columnas por las que se puede pedir el empleado de máximo o mínimo valor
+RANKABLE_COLUMNS = ['salario', 'edad', 'experiencia_anos', 'fecha_ingreso']
+
+def shards_dir_for(db_path):
+    """Carpeta de shards junto a la base de datos de un tenant (data/shards/ por defecto)"""
+    return os.path.join(os.path.dirname(db_path) or ".", "shards")
+
+def shard_file(index):
+    return f"empleados_{index}.db"
+
+def write_manifest(directory, partition, count, departments=None):
+    """Guardar la partición y los archivos de cada shard (al final de la carga: activa el modo)"""
+    manifest = {"particion": partition, "shards": [shard_file(i) for i in range(count)]}
+    if partition == PARTITION_DEPARTMENT:
+        manifest["departamentos"] = departments or {}
+    tmp = os.path.join(directory, f"{MANIFEST}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(directory, MANIFEST))
+    return manifest
+
+def read_manifest(directory):
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def assign_departments(departments, count):
+    """Repartir departamentos entre shards por turnos: {departamento: shard}"""
+    return {dept: i % count for i, dept in enumerate(sorted(departments))}
+
+def route(partition, count, employee_id=None, departamento=None, departments=None):
+    """Shard de una fila: id módulo N, o el shard asignado a su departamento"""
+    if partition == PARTITION_HASH:
+        return int(employee_id) % count
+    if departments and departamento in departments:
+        return departments[departamento]
+    # Departamento que no estaba en la carga: shard estable por su nombre
+    return zlib.crc32(str(departamento).encode("utf-8")) % count
+
+class ShardedEmployeeStore:
+    """Tabla empleados repartida en varios archivos SQLite.
+
+    La partición es por id (id módulo N) o por departamento. Los agregados se
+    calculan en paralelo en cada shard (sqlite3 suelta el GIL mientras ejecuta) y
+    se combinan de forma exacta: COUNT y SUM se suman, AVG es SUM/COUNT global y
+    MAX/MIN comparan la fila ganadora de cada shard. Las búsquedas por id van a un
+    solo shard con partición hash; las consultas con departamento, a uno solo con
+    partición por departamento.
+    """
+
+    def __init__(self, directory, manifest):
+        self.directory = directory
+        self.partition = manifest["particion"]
+        self.paths = [os.path.join(directory, name) for name in manifest["shards"]]
+        self.departments = manifest.get("departamentos", {})
+        self.databases = [get_database(path) for path in self.paths]
+        self.pool = ThreadPoolExecutor(max_workers=len(self.paths), thread_name_prefix="shard")
+        self.lock = threading.Lock()
+        self.stats = {"consultas_dispersas": 0, "consultas_un_shard": 0}
+
+    @classmethod
+    def open(cls, directory):
+        """Abrir los shards de una carpeta; None si no hay manifiesto (modo de un archivo)"""
+        manifest = read_manifest(directory)
+        if manifest is None:
+            return None
+        return cls(directory, manifest)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def shard_for(self, employee_id=None, departamento=None):
+        return route(self.partition, len(self.paths), employee_id, departamento, self.departments)
+
+    def shards_for_filters(self, filtros):
+        """Shards que pueden tener filas que cumplan los filtros (poda por departamento)"""
+        departamento = filtros.get("igualdades", {}).get("departamento")
+        if self.partition == PARTITION_DEPARTMENT and departamento is not None:
+            return [self.shard_for(departamento=departamento)]
+        return list(range(len(self.paths)))
+
+    def scatter(self, fn, shards=None):
+        """Ejecutar fn(conn) en cada shard en paralelo; resultados en orden de shard"""
+        shards = range(len(self.paths)) if shards is None else shards
+        return self.run_tasks([(shard, fn) for shard in shards])
+
+    def run_tasks(self, tasks):
+        """Ejecutar [(shard, fn(conn))] en paralelo con la conexión de lectura de cada shard"""
+        with self.lock:
+            self.stats["consultas_un_shard" if len(tasks) == 1 else "consultas_dispersas"] += 1
+        if len(tasks) == 1:
+            return [self.run_on(*tasks[0])]
+        # Cada tarea lleva el contexto de la petición: el plazo también corta las lecturas en los shards
+        futures = [
+            self.pool.submit(contextvars.copy_context().run, self.run_on, shard, fn)
+            for shard, fn in tasks
+        ]
+        return [future.result() for future in futures]
+
+    def run_on(self, shard, fn):
+        return fn(self.databases[shard].reader())
+
+    def query_all(self, sql, params=(), shards=None):
+        """Filas de una consulta en todos los shards (o en los indicados), concatenadas"""
+        rows = []
+        for part in self.scatter(lambda conn: conn.execute(sql, params).fetchall(), shards):
+            rows.extend(part)
+        return rows
+
+    def ordered(self, columns, limit=None):
+        """Filas de todos los shards en orden de id (las `limit` primeras), igual que en un solo archivo"""
+        sql = f"SELECT id, {columns} FROM empleados ORDER BY id"
+        params = ()
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = (limit,)
+        # Cada shard ya viene ordenado: basta con intercalarlos
+        rows = heapq.merge(*self.scatter(lambda conn: conn.execute(sql, params).fetchall()),
+                           key=lambda row: row[0])
+        if limit is not None:
+            rows = list(rows)[:limit]
+        return [row[1:] for row in rows]
+
+    def count(self, where="", params=()):
+        sql = f"SELECT COUNT(*) FROM empleados {where}"
+        return sum(self.scatter(lambda conn: conn.execute(sql, params).fetchone()[0]))
+
+    def count_filtered(self, compiler, filtros):
+        """Conteo con los filtros compuestos del QueryCompiler, sumado entre shards"""
+        return sum(self.scatter(lambda conn: compiler.count(conn, filtros), self.shards_for_filters(filtros)))
+
+    def summary(self):
+        """Totales exactos: COUNT, promedios de edad, salario y experiencia, salario mínimo y máximo"""
+        sql = """
+            SELECT COUNT(*), SUM(edad), SUM(salario), SUM(experiencia_anos), MIN(salario), MAX(salario)
+            FROM empleados
+        """
+        parts = [p for p in self.scatter(lambda conn: conn.execute(sql).fetchone()) if p[0]]
+        total = sum(p[0] for p in parts)
+        if not total:
+            return {"total": 0, "edad_promedio": None, "salario_promedio": None, "exp_promedio": None,
+                    "salario_min": None, "salario_max": None}
+        return {
+            "total": total,
+            # Promedio global = suma global / conteo global (no el promedio de promedios)
+            "edad_promedio": sum(p[1] for p in parts) / total,
+            "salario_promedio": sum(p[2] for p in parts) / total,
+            "exp_promedio": sum(p[3] for p in parts) / total,
+            "salario_min": min(p[4] for p in parts),
+            "salario_max": max(p[5] for p in parts)
+        }
+
+    def by_department(self):
+        """[(departamento, empleados, salario promedio, edad promedio)] combinando los shards"""
+        sql = "SELECT departamento, COUNT(*), SUM(salario), SUM(edad) FROM empleados GROUP BY departamento"
+        merged = {}
+        for part in self.scatter(lambda conn: conn.execute(sql).fetchall()):
+            for dept, count, salarios, edades in part:
+                total = merged.setdefault(dept, [0, 0, 0])
+                total[0] += count
+                total[1] += salarios
+                total[2] += edades
+        return [(dept, count, salarios / count, edades / count)
+                for dept, (count, salarios, edades) in sorted(merged.items())]
+
+    def top(self, column, descending=True, columns="nombre, departamento, salario"):
+        """Fila del empleado con el mayor (o menor) valor de una columna; en empate, el de menor id"""
+        if column not in RANKABLE_COLUMNS:
+            raise ValueError(f"Columna no válida: {column}")
+        order = "DESC" if descending else "ASC"
+        sql = f"SELECT {column}, id, {columns} FROM empleados ORDER BY {column} {order}, id LIMIT 1"
+        candidates = [row for row in self.scatter(lambda conn: conn.execute(sql).fetchone()) if row]
+        if not candidates:
+            return None
+        if descending:
+            best = max(candidates, key=lambda row: (row[0], -row[1]))
+        else:
+            best = min(candidates, key=lambda row: (row[0], row[1]))
+        return best[2:]
+
+    def get(self, employee_id):
+        """Fila completa de un empleado por id (un solo shard con partición hash)"""
+        sql = "SELECT * FROM empleados WHERE id = ?"
+        shards = [self.shard_for(employee_id=employee_id)] if self.partition == PARTITION_HASH else None
+        rows = self.query_all(sql, (int(employee_id),), shards)
+        return rows[0] if rows else None
+
+    def lookup(self, ids):
+        """Filas de muchos ids: {id: fila}, una consulta IN (...) por shard y bloque"""
+        ids = sorted({int(i) for i in ids})
+        if self.partition == PARTITION_HASH:
+            groups = {}
+            for employee_id in ids:
+                groups.setdefault(self.shard_for(employee_id=employee_id), []).append(employee_id)
+        else:
+            groups = {i: ids for i in range(len(self.paths))} if ids else {}
+
+        def fetch(conn, shard_ids):
+            rows = []
+            for start in range(0, len(shard_ids), MAX_SQL_PARAMS):
+                chunk = shard_ids[start:start + MAX_SQL_PARAMS]
+                rows.extend(conn.execute(
+                    f"SELECT * FROM empleados WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall())
+            return rows
+
+        employees = {}
+        if not groups:
+            return employees
+        tasks = [(shard, lambda conn, shard_ids=shard_ids: fetch(conn, shard_ids))
+                 for shard, shard_ids in groups.items()]
+        for part in self.run_tasks(tasks):
+            for row in part:
+                employees[row[0]] = row
+        return employees
+
+    def write(self, shard, fn):
+        """Encolar fn(conn) en el escritor único de un shard (cada shard escribe en paralelo)"""
+        return self.databases[shard].write(fn)
+
+    def enable_wal(self):
+        for db in self.databases:
+            db.enable_wal()
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats.update({"particion": self.partition, "shards": len(self.paths),
+                      "escritores": [db.get_stats() for db in self.databases]})
+        return stats
+
+    def close(self):
+        self.pool.shutdown(wait=False)
+        for path in self.paths:
+            release_database(path)
@@ -0,0 +1,87 @@
+import asyncio
+import inspect
+import os
+import re
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import deadline
+
+def normalize_question(pregunta):
+    """Clave canónica de una pregunta: minúsculas, espacios colapsados y sin signos al borde"""
+    text = re.sub(r'\s+', ' ', pregunta.lower()).strip()
+    return text.strip('¿?¡!.,; ')
+
+class SingleFlight:
+    """Colapsar llamadas concurrentes idénticas: solo la primera ejecuta el trabajo y
+    todas las que llegan mientras está en curso reciben el mismo resultado (o error).
+
+    No es una caché: en cuanto termina la ejecución, la siguiente llamada vuelve a
+    calcular. El resultado se comparte entre todos los que esperan, así que no debe
+    modificarse en sitio.
+
+    La ejecución compartida corre con el plazo de la ruta (deadline.shared_context),
+    no con el de quien llegó primero; cada solicitante aplica su propio plazo solo
+    a su espera.
+    """
+
+    def __init__(self, name, timeout=None):
+        self.name = name
+        self.timeout = timeout
+        self.inflight = {}
+        self.stats = {"llamadas": 0, "ejecuciones": 0, "coalescidas": 0, "errores": 0, "timeouts": 0}
+
+    async def do(self, key, fn, *args, **kwargs):
+        """Ejecutar fn(*args, **kwargs) (síncrona o asíncrona) una sola vez por clave en curso"""
+        self.stats["llamadas"] += 1
+        task = self.inflight.get(key)
+        if task is None:
+            # La tarea copia el contexto en el que se crea: el compartido, sin el plazo del cliente
+            task = deadline.shared_context().run(asyncio.ensure_future, self.run(key, fn, args, kwargs))
+            # Evitar el aviso "exception was never retrieved" si todos los que esperaban se fueron
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self.inflight[key] = task
+            self.stats["ejecuciones"] += 1
+        else:
+            self.stats["coalescidas"] += 1
+
+        # Cada solicitante espera como máximo lo de la coalescencia o lo que le queda de plazo
+        timeout, own_deadline = self.timeout, False
+        left = deadline.remaining()
+        if left is not None and (timeout is None or left < timeout):
+            timeout, own_deadline = max(left, 0), True
+
+        # shield: si un solicitante se cancela o agota su espera, el resto sigue esperando
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except deadline.DeadlineExceeded as e:
+            # El trabajo compartido agotó el plazo de la ruta: esta petición también se cortó
+            own = deadline.current_deadline.get()
+            if own is not None and own.cancelled is None:
+                own.cancelled = e.stage
+            raise
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            if own_deadline:
+                raise deadline.cancel("coalescencia")
+            raise
+
+    async def run(self, key, fn, args, kwargs):
+        try:
+            result = fn(*args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+        except Exception as e:
+            self.stats["errores"] += 1
+            # Una consulta interrumpida por el plazo compartido se entrega como DeadlineExceeded
+            deadline.raise_if_cancelled(e)
+            raise
+        finally:
+            self.inflight.pop(key, None)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["en_curso"] = len(self.inflight)
+        return stats
@@ -0,0 +1,118 @@
+import hashlib
+import mimetypes
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.compression import available_encodings, compress, is_compressible, negotiate_encoding
+
+# Con ?v=<hash> correcto la URL identifica una versión exacta: se puede cachear para siempre
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+# Sin versión (p. ej. "/"), el navegador revalida con el ETag y recibe 304 si no cambió
+REVALIDATE_CACHE = "no-cache"
+
+class StaticAsset:
+    """Un archivo estático en memoria con sus variantes comprimidas precalculadas"""
+
+    def __init__(self, path, body):
+        self.path = path
+        self.content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if self.content_type.startswith("text/") or self.content_type == "application/javascript":
+            self.content_type += "; charset=utf-8"
+        self.hash = hashlib.sha256(body).hexdigest()[:16]
+        self.variants = {None: body}
+
+    def etag(self, encoding):
+        # ETag fuerte distinto por representación (cada codificación es otra secuencia de bytes)
+        return f'"{self.hash}-{encoding}"' if encoding else f'"{self.hash}"'
+
+class StaticAssetCache:
+    """Archivos estáticos cargados al arrancar: bytes en memoria, variantes gzip/brotli,
+    hash de contenido, ETag, 304 y Cache-Control inmutable para URLs versionadas.
+
+    Solo se sirven archivos que existían al cargar, así que una ruta con ".." no
+    puede salir del directorio.
+    """
+
+    def __init__(self, directory="static", min_size=256, gzip_level=9, brotli_quality=11):
+        self.directory = directory
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.assets = {}
+        self.stats = {"respuestas_200": 0, "respuestas_304": 0, "no_encontrados": 0}
+
+    def load(self):
+        """Leer y precomprimir todos los archivos del directorio"""
+        assets = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                full_path = os.path.join(root, name)
+                rel_path = os.path.relpath(full_path, self.directory).replace(os.sep, '/')
+                with open(full_path, 'rb') as f:
+                    asset = StaticAsset(rel_path, f.read())
+
+                body = asset.variants[None]
+                if is_compressible(asset.content_type) and len(body) >= self.min_size:
+                    # Compresión máxima: se paga una sola vez al arrancar
+                    for encoding in available_encodings():
+                        compressed = compress(body, encoding, self.gzip_level, self.brotli_quality)
+                        if len(compressed) < len(body):
+                            asset.variants[encoding] = compressed
+                assets[rel_path] = asset
+
+        self.assets = assets
+        return len(assets)
+
+    def versioned_url(self, path, prefix="/static/"):
+        """URL con ?v=<hash> para enlazar un recurso con caché inmutable"""
+        asset = self.assets.get(path)
+        return f"{prefix}{path}?v={asset.hash}" if asset else f"{prefix}{path}"
+
+    def serve(self, path, accept_encoding=None, if_none_match=None, version=None):
+        """Resolver una petición: devuelve (status, headers, cuerpo)"""
+        if not self.assets:
+            self.load()
+
+        asset = self.assets.get(path.lstrip('/'))
+        if asset is None:
+            self.stats["no_encontrados"] += 1
+            return 404, {"content-type": "text/plain; charset=utf-8"}, b"Not Found"
+
+        available = tuple(e for e in available_encodings() if e in asset.variants)
+        encoding = negotiate_encoding(accept_encoding, available) if available else None
+        etag = asset.etag(encoding)
+
+        headers = {
+            "etag": etag,
+            "cache-control": IMMUTABLE_CACHE if version == asset.hash else REVALIDATE_CACHE,
+            "vary": "Accept-Encoding",
+        }
+
+        if if_none_match and self.etag_matches(if_none_match, etag):
+            self.stats["respuestas_304"] += 1
+            return 304, headers, b""
+
+        body = asset.variants[encoding]
+        headers["content-type"] = asset.content_type
+        headers["content-length"] = str(len(body))
+        if encoding:
+            headers["content-encoding"] = encoding
+        self.stats["respuestas_200"] += 1
+        return 200, headers, body
+
+    @staticmethod
+    def etag_matches(if_none_match, etag):
+        """Comparación débil de If-None-Match (RFC 9110), como hacen los navegadores"""
+        if if_none_match.strip() == "*":
+            return True
+        candidates = (tag.strip() for tag in if_none_match.split(','))
+        return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+    def get_stats(self):
+        return {
+            **self.stats,
+            "archivos": len(self.assets),
+            "bytes_en_memoria": sum(len(v) for a in self.assets.values() for v in a.variants.values())
+        }
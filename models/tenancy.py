@@ -0,0 +1,399 @@
+import asyncio
+import contextlib
+import contextvars
+import functools
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.analytics import EmployeeColumnStore
+from models.classifier import IntentClassifier
+from models.database import DB_PATH, get_database, release_database
+from models.hot_reload import ModelReloader
+from models.ingest import EmployeeIngestor
+from models.intent_router import IntentRouter
+from models.ocr_processor import OCRProcessor
+from models.query_compiler import ensure_indexes
+from models.regression import SalaryPredictor
+from models.shadow import CANDIDATE_DIRNAME, ShadowEvaluator
+from models.sharding import MANIFEST, ShardedEmployeeStore, shards_dir_for
+
+DEFAULT_TENANT = "default"
+TENANT_HEADER = b"x-tenant"
+TENANT_PREFIX = "/t/"
+# Solo minúsculas, dígitos, guion y guion bajo: el id se usa como nombre de carpeta
+TENANT_PATTERN = re.compile(r'^[a-z0-9][a-z0-9_-]{0,62}$')
+# Memoria fija estimada por tenant (objetos Python, modelos pequeños, caché de SQLite)
+TENANT_BASE_BYTES = 4 * 1024 * 1024
+
+# Tenant de la petición en curso (lo fija TenantMiddleware)
+current_tenant = contextvars.ContextVar("tenant", default=None)
+
+class TenantLease:
+    """ModelSet fijado para una petición: no se desaloja hasta que la respuesta termina"""
+
+    def __init__(self):
+        self.registry = None
+        self.model_set = None
+
+    def release(self):
+        if self.model_set is not None:
+            self.registry.release(self.model_set)
+            self.model_set = None
+
+# ModelSet adquirido por la petición en curso (TenantMiddleware crea el contenedor y lo suelta)
+current_lease = contextvars.ContextVar("tenant_lease", default=None)
+
+class TenantError(Exception):
+    """Tenant ausente (400) o inexistente (404)"""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+class ModelSet:
+    """Base de datos y modelos de un tenant (una empresa)"""
+
+    def __init__(self, tenant, db_path, model_dir, rules_path="data/intent_rules.json"):
+        self.tenant = tenant
+        self.db_path = db_path
+        self.model_dir = model_dir
+        # Peticiones y trabajos que lo están usando (con el lock del registro); el LRU no desaloja si > 0
+        self.refs = 0
+        self.db = get_database(db_path)
+        # Modo particionado: empleados repartidos en varios SQLite si hay shards/manifest.json.
+        # Todas las lecturas de empleados van entonces a los shards; empresa.db no se usa
+        self.shards = ShardedEmployeeStore.open(shards_dir_for(db_path))
+        self.classifier = IntentClassifier(model_dir=model_dir)
+        self.router = IntentRouter(self.classifier, rules_path=rules_path)
+        self.salary_predictor = SalaryPredictor(db_path=db_path, model_dir=model_dir, shards=self.shards)
+        self.ocr_processor = OCRProcessor(db_path=db_path, shards=self.shards)
+        self.employee_store = EmployeeColumnStore(db_path, shards=self.shards)
+        self.ingestor = EmployeeIngestor(db_path, shards=self.shards)
+        self.reloader = ModelReloader(self)
+        self.shadow = ShadowEvaluator(self, os.path.join(model_dir, CANDIDATE_DIRNAME))
+
+    def load(self):
+        """Activar WAL y cargar (o entrenar) los modelos del tenant"""
+        print(f"📦 Cargando base de datos y modelos de {self.tenant}...")
+
+        if self.shards is None:
+            # Activar WAL antes de que lleguen lectores y escritores concurrentes
+            try:
+                self.db.enable_wal()
+                print("✅ Base de datos en modo WAL")
+            except Exception as e:
+                print(f"⚠️ Error activando WAL: {e}")
+
+            # Índices de las consultas con filtros compuestos (solo se crean los que falten)
+            try:
+                creados = ensure_indexes(self.db)
+                if creados:
+                    print(f"✅ Índices de filtros creados: {', '.join(creados)}")
+            except Exception as e:
+                print(f"⚠️ Error creando índices de filtros: {e}")
+        else:
+            try:
+                self.shards.enable_wal()
+                for shard_db in self.shards.databases:
+                    ensure_indexes(shard_db)
+                print(f"✅ Empleados repartidos en {len(self.shards)} shards ({self.shards.partition})")
+            except Exception as e:
+                print(f"⚠️ Error preparando los shards: {e}")
+
+        # Entrenar/cargar clasificador
+        try:
+            self.classifier.load_model()
+            print("✅ Clasificador de intenciones listo")
+        except Exception as e:
+            print(f"⚠️ Error cargando clasificador: {e}")
+            self.classifier.train()
+
+        # Entrenar/cargar predictor de salarios
+        try:
+            self.salary_predictor.load_model()
+            print("✅ Predictor de salarios listo")
+        except Exception as e:
+            print(f"⚠️ Error cargando predictor: {e}")
+            self.salary_predictor.train()
+
+        # Cargar copia columnar para consultas analíticas
+        try:
+            self.employee_store.refresh()
+            print(f"✅ Almacén analítico listo ({len(self.employee_store)} empleados)")
+        except Exception as e:
+            print(f"⚠️ Error cargando almacén analítico: {e}")
+
+        # Versión y línea base de validación de los modelos, para la recarga en caliente
+        self.reloader.record_loaded()
+
+        # Candidatos en models/candidato/: se evalúan en sombra con una muestra del tráfico
+        try:
+            self.shadow.load_available()
+        except Exception as e:
+            print(f"⚠️ Error cargando candidatos en sombra: {e}")
+
+        print(f"🎯 Modelos de {self.tenant} listos!")
+
+    def memory_bytes(self):
+        """Memoria aproximada del tenant, para el presupuesto del LRU"""
+        size = TENANT_BASE_BYTES + self.employee_store.memory_bytes()
+        if self.classifier.compiled is not None:
+            size += self.classifier.compiled.memory_bytes()
+        return size
+
+    def close(self):
+        """Liberar conexiones y escritor (las peticiones en curso pueden seguir leyendo)"""
+        self.employee_store.close()
+        self.shadow.close()
+        if self.shards is not None:
+            self.shards.close()
+        release_database(self.db_path)
+
+class TenantRegistry:
+    """Conjuntos de modelos por tenant, cargados a demanda y desalojados por LRU.
+
+    Sin base_dir funciona en modo de un solo tenant con data/empresa.db y models/.
+    Con base_dir, cada tenant es una carpeta base_dir/<tenant>/ con empresa.db y
+    models/ (los modelos que falten se entrenan con su propia base de datos), y
+    opcionalmente su propio intent_rules.json.
+    """
+
+    def __init__(self, base_dir=None, memory_budget_mb=512, max_tenants=None):
+        self.base_dir = base_dir
+        self.enabled = base_dir is not None
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.max_tenants = max_tenants
+        self.sets = OrderedDict()
+        self.lock = threading.Lock()
+        self.load_locks = {}
+        self.stats = {"aciertos": 0, "cargas": 0, "desalojos": 0}
+
+    def resolve_paths(self, tenant):
+        """(db_path, model_dir, rules_path) de un tenant"""
+        if not self.enabled:
+            return DB_PATH, "models", "data/intent_rules.json"
+        root = os.path.join(self.base_dir, tenant)
+        rules_path = os.path.join(root, "intent_rules.json")
+        if not os.path.exists(rules_path):
+            rules_path = "data/intent_rules.json"
+        return os.path.join(root, "empresa.db"), os.path.join(root, "models"), rules_path
+
+    def check(self, tenant):
+        """Validar el tenant de la petición; devuelve el id efectivo"""
+        if not self.enabled:
+            return DEFAULT_TENANT
+        if tenant is None:
+            raise TenantError("Falta el tenant (cabecera X-Tenant o prefijo /t/<tenant>/)", 400)
+        if not TENANT_PATTERN.match(tenant):
+            raise TenantError(f"Tenant desconocido: {tenant}", 404)
+        db_path = self.resolve_paths(tenant)[0]
+        # Un tenant puede tener solo shards (create_database.py --shards no crea empresa.db)
+        if not os.path.exists(db_path) and not os.path.exists(os.path.join(shards_dir_for(db_path), MANIFEST)):
+            raise TenantError(f"Tenant desconocido: {tenant}", 404)
+        return tenant
+
+    def lookup(self, tenant, pin=False):
+        """ModelSet ya cargado (o None), marcándolo como usado recientemente (y fijándolo si pin)"""
+        with self.lock:
+            model_set = self.sets.get(tenant)
+            if model_set is not None:
+                self.sets.move_to_end(tenant)
+                self.stats["aciertos"] += 1
+                if pin:
+                    model_set.refs += 1
+            return model_set
+
+    def get(self, tenant=DEFAULT_TENANT, pin=False):
+        """ModelSet de un tenant, cargándolo si hace falta (bloqueante).
+
+        Con pin=True queda fijado (no se desaloja) hasta llamar a release().
+        """
+        model_set = self.lookup(tenant, pin=pin)
+        if model_set is not None:
+            return model_set
+
+        # Un solo hilo carga cada tenant; el resto espera y reutiliza la carga
+        with self.lock:
+            load_lock = self.load_locks.setdefault(tenant, threading.Lock())
+        with load_lock:
+            model_set = self.lookup(tenant, pin=pin)
+            if model_set is not None:
+                return model_set
+
+            db_path, model_dir, rules_path = self.resolve_paths(tenant)
+            model_set = ModelSet(tenant, db_path, model_dir, rules_path)
+            model_set.load()
+
+            with self.lock:
+                if pin:
+                    model_set.refs += 1
+                self.sets[tenant] = model_set
+                self.stats["cargas"] += 1
+                evicted = self.evict(keep=tenant)
+
+        self.close_evicted(evicted)
+        return model_set
+
+    def release(self, model_set):
+        """Soltar un ModelSet fijado; si el LRU estaba por encima del presupuesto, desalojar ahora"""
+        with self.lock:
+            model_set.refs -= 1
+            evicted = self.evict()
+        self.close_evicted(evicted)
+
+    @contextlib.contextmanager
+    def hold(self, tenant=DEFAULT_TENANT):
+        """ModelSet fijado mientras dura el bloque (para hilos fuera de una petición)"""
+        model_set = self.get(tenant, pin=True)
+        try:
+            yield model_set
+        finally:
+            self.release(model_set)
+
+    def evict(self, keep=None):
+        """Sacar los tenants menos usados hasta respetar el presupuesto (con self.lock tomado).
+
+        Los que tienen peticiones en curso (refs > 0) no se tocan: el presupuesto se
+        puede pasar un momento y se vuelve a aplicar al soltarlos.
+        """
+        evicted = []
+        total = sum(model_set.memory_bytes() for model_set in self.sets.values())
+        for tenant, model_set in list(self.sets.items()):
+            if len(self.sets) <= 1 or not (
+                total > self.memory_budget
+                or (self.max_tenants is not None and len(self.sets) > self.max_tenants)
+            ):
+                break
+            if tenant == keep or model_set.refs > 0:
+                continue
+            del self.sets[tenant]
+            total -= model_set.memory_bytes()
+            self.stats["desalojos"] += 1
+            evicted.append(model_set)
+        return evicted
+
+    def close_evicted(self, evicted):
+        for old in evicted:
+            print(f"♻️ Tenant {old.tenant} desalojado de memoria")
+            old.close()
+
+    async def acquire(self):
+        """ModelSet del tenant de la petición, fijado hasta que termine la respuesta.
+
+        La primera carga se hace fuera del event loop. Las siguientes llamadas de la
+        misma petición devuelven el mismo ModelSet sin volver a buscarlo.
+        """
+        lease = current_lease.get()
+        if lease is not None and lease.model_set is not None:
+            return lease.model_set
+        tenant = self.check(current_tenant.get())
+        model_set = self.lookup(tenant, pin=lease is not None)
+        if model_set is None:
+            model_set = await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(self.get, tenant, pin=lease is not None)
+            )
+        if lease is not None:
+            lease.registry, lease.model_set = self, model_set
+        return model_set
+
+    def current(self):
+        """ModelSet que adquirió la petición en curso (nunca carga: no bloquea el event loop).
+
+        Fuera de una petición (calentamiento) devuelve el del tenant si ya está cargado.
+        """
+        lease = current_lease.get()
+        if lease is not None and lease.model_set is not None:
+            return lease.model_set
+        model_set = self.lookup(self.check(current_tenant.get()))
+        if model_set is None:
+            raise RuntimeError("El tenant de la petición no está cargado (falta acquire())")
+        return model_set
+
+    def peek(self):
+        """ModelSet del tenant de la petición solo si ya está cargado (sin errores ni cargas)"""
+        try:
+            tenant = self.check(current_tenant.get())
+        except TenantError:
+            return None
+        with self.lock:
+            return self.sets.get(tenant)
+
+    def loaded(self):
+        """ModelSets cargados ahora mismo"""
+        with self.lock:
+            return list(self.sets.values())
+
+    def close_all(self):
+        with self.lock:
+            model_sets = list(self.sets.values())
+            self.sets.clear()
+        for model_set in model_sets:
+            model_set.close()
+
+    def get_stats(self):
+        with self.lock:
+            memoria = {tenant: model_set.memory_bytes() for tenant, model_set in self.sets.items()}
+            return {
+                **self.stats,
+                "multi_tenant": self.enabled,
+                "cargados": list(self.sets),
+                "memoria_mb": round(sum(memoria.values()) / 1024 / 1024, 2),
+                "presupuesto_mb": round(self.memory_budget / 1024 / 1024, 2),
+                "memoria_por_tenant_mb": {t: round(b / 1024 / 1024, 2) for t, b in memoria.items()}
+            }
+
+class TenantMiddleware:
+    """Middleware ASGI que resuelve el tenant de la petición.
+
+    Acepta la cabecera X-Tenant o el prefijo /t/<tenant>/ (que se quita de la
+    ruta, así /t/acme/chatbot llega a /chatbot). El tenant queda en current_tenant,
+    y el ModelSet que adquiera el endpoint queda fijado hasta terminar la respuesta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tenant = None
+        path = scope["path"]
+        if path.startswith(TENANT_PREFIX):
+            candidate, _, rest = path[len(TENANT_PREFIX):].partition('/')
+            if TENANT_PATTERN.match(candidate):
+                tenant = candidate
+                prefix = TENANT_PREFIX + candidate
+                scope = {
+                    **scope,
+                    "path": '/' + rest,
+                    "raw_path": ('/' + rest).encode(),
+                    "root_path": scope.get("root_path", "") + prefix
+                }
+
+        if tenant is None:
+            for name, value in scope.get("headers") or []:
+                if name == TENANT_HEADER:
+                    tenant = value.decode("latin-1").strip().lower() or None
+                    break
+
+        lease = TenantLease()
+        token = current_tenant.set(tenant)
+        lease_token = current_lease.set(lease)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_lease.reset(lease_token)
+            current_tenant.reset(token)
+            # El ModelSet que fijó la petición ya se puede desalojar
+            lease.release()
+
+def tenant_key(key):
+    """Clave de coalescencia/caché con el tenant incluido (nunca compartir entre empresas)"""
+    return (current_tenant.get(), key)
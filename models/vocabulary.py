@@ -0,0 +1,36 @@
+import re
+
+# Vocabulario compartido para reconocer valores categóricos en texto libre (preguntas y tarjetas OCR)
+DEPARTAMENTOS = {
+    "ventas": "Ventas",
+    "it": "IT",
+    "marketing": "Marketing",
+    "finanzas": "Finanzas",
+    "recursos humanos": "Recursos Humanos"
+}
+
+CIUDADES = {
+    "ciudad de méxico": "Ciudad de México",
+    "ciudad de mexico": "Ciudad de México",
+    "cdmx": "Ciudad de México",
+    "guadalajara": "Guadalajara",
+    "monterrey": "Monterrey",
+    "puebla": "Puebla",
+    "tijuana": "Tijuana"
+}
+
+NIVELES_EDUCACION = {
+    "técnico": "Técnico",
+    "tecnico": "Técnico",
+    "licenciatura": "Licenciatura",
+    "maestría": "Maestría",
+    "maestria": "Maestría",
+    "doctorado": "Doctorado"
+}
+
+def find_keyword(text, keywords):
+    """Buscar la primera palabra clave (como palabra completa) dentro del texto"""
+    for keyword, value in keywords.items():
+        if re.search(rf'\b{re.escape(keyword)}\b', text):
+            return value
+    return None
@@ -0,0 +1,135 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.vocabulary import DEPARTAMENTOS, NIVELES_EDUCACION
+
+SAMPLE_CARDS_DIR = "data/sample_cards"
+
+class WarmUp:
+    """Calentamiento al arrancar: pasos representativos antes de aceptar tráfico.
+
+    Cada paso es una función (en un hilo) o una corrutina; se registra su duración
+    y su error si falla. Un paso fallido no impide quedar listo: el servicio
+    funciona igual, solo que esa primera petición será lenta (queda en /ready).
+    """
+
+    def __init__(self):
+        self.state = "pendiente"
+        self.steps = {}
+        self.started = None
+        self.finished = None
+        self.lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.state == "listo"
+
+    async def run(self, steps):
+        """Ejecutar los pasos en orden y marcar el servicio como listo"""
+        with self.lock:
+            self.state = "calentando"
+            self.started = time.time()
+        print(f"🔥 Calentando {len(steps)} pasos...")
+
+        loop = asyncio.get_running_loop()
+        for name, fn in steps:
+            start = time.perf_counter()
+            try:
+                if asyncio.iscoroutinefunction(fn):
+                    detail = await fn()
+                else:
+                    detail = await loop.run_in_executor(None, fn)
+                result = {"ok": True, "detalle": detail}
+            except Exception as e:
+                print(f"⚠️ Error calentando {name}: {e}")
+                result = {"ok": False, "error": str(e)}
+            result["ms"] = round((time.perf_counter() - start) * 1000, 1)
+            with self.lock:
+                self.steps[name] = result
+
+        self.mark_ready()
+        print(f"✅ Calentamiento terminado en {self.finished - self.started:.1f}s")
+
+    def mark_ready(self):
+        with self.lock:
+            self.state = "listo"
+            self.finished = time.time()
+            if self.started is None:
+                self.started = self.finished
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "estado": self.state,
+                "listo": self.state == "listo",
+                "segundos": round(self.finished - self.started, 3) if self.finished else None,
+                "pasos": {name: dict(step) for name, step in self.steps.items()}
+            }
+
+def warm_tables(conn):
+    """Recorrer la tabla y sus índices en una conexión; (filas, índices)"""
+    rows = conn.execute("SELECT COUNT(*), SUM(LENGTH(nombre) + salario) FROM empleados").fetchone()[0]
+    indexes = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'empleados' AND sql IS NOT NULL"
+    )]
+    for name in indexes:
+        conn.execute(f"SELECT COUNT(*) FROM empleados INDEXED BY {name}").fetchone()
+    return rows, len(indexes)
+
+def warm_database(model_set):
+    """Recorrer la tabla y sus índices para traer sus páginas a memoria (caché del SO y mmap)"""
+    if model_set.shards is not None:
+        # Con shards, los archivos que se leen son los de los shards (en paralelo)
+        parts = model_set.shards.scatter(warm_tables)
+        return {"filas": sum(p[0] for p in parts), "indices": sum(p[1] for p in parts), "shards": len(parts)}
+    rows, indexes = warm_tables(model_set.db.reader())
+    return {"filas": rows, "indices": indexes}
+
+def warm_classifier(model_set):
+    """Clasificar las frases de entrenamiento por el enrutador y por el modelo"""
+    questions, _ = model_set.classifier.create_training_data()
+    for question in questions:
+        model_set.router.predict(question)
+    model_set.classifier.predict_many(questions)
+    # El tráfico de calentamiento no cuenta en las métricas del enrutador
+    model_set.router.reset_stats()
+    return {"preguntas": len(questions)}
+
+def warm_predictor(model_set):
+    """Una predicción por combinación de departamento y nivel de educación"""
+    departamentos = sorted(set(DEPARTAMENTOS.values()))
+    niveles = sorted(set(NIVELES_EDUCACION.values()))
+    for departamento in departamentos:
+        for nivel in niveles:
+            model_set.salary_predictor.predict(30, 5, departamento, nivel)
+    return {"predicciones": len(departamentos) * len(niveles)}
+
+def warm_ocr(model_set, sample_dir=SAMPLE_CARDS_DIR, limit=1):
+    """Primera invocación de Tesseract (y su modelo de idioma) con una tarjeta de ejemplo"""
+    cards = sorted(
+        name for name in os.listdir(sample_dir)
+        if name.lower().endswith(('.png', '.jpg', '.jpeg'))
+    )[:limit] if os.path.isdir(sample_dir) else []
+    if not cards:
+        raise FileNotFoundError(f"No hay tarjetas de ejemplo en {sample_dir}")
+
+    for name in cards:
+        with open(os.path.join(sample_dir, name), 'rb') as f:
+            result = model_set.ocr_processor.process_image_bytes(f.read())
+        if not result.get('success'):
+            raise RuntimeError(result.get('error', 'OCR fallido'))
+    return {"tarjetas": len(cards)}
+
+def model_set_steps(model_set, sample_dir=SAMPLE_CARDS_DIR):
+    """Pasos de calentamiento de la base de datos y los modelos de un tenant"""
+    return [
+        ("base_de_datos", lambda: warm_database(model_set)),
+        ("clasificador", lambda: warm_classifier(model_set)),
+        ("predictor", lambda: warm_predictor(model_set)),
+        ("ocr", lambda: warm_ocr(model_set, sample_dir)),
+    ]
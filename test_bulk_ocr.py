@@ -0,0 +1,30 @@
+"""Pruebas del OCR masivo (bulk_ocr.py): un archivo o un worker con error no detiene el lote.
+
+Uso:
+    python -m pytest -q test_bulk_ocr.py
+"""
+import os
+
+from bulk_ocr import run_pool
+
+class KillsWorker:
+    """Bytes que al llegar al worker lo terminan, como un proceso que muere sin memoria"""
+    def __reduce__(self):
+        return os._exit, (1,)
+
+def test_archivo_ilegible_no_detiene_el_lote(tmp_path):
+    sources = [("falta.png", str(tmp_path / "falta.png"), None), ("vacia.png", None, b"")]
+    results = list(run_pool(sources, workers=1, ordered=True, max_in_flight=2))
+
+    assert [r["archivo"] for r in results] == ["falta.png", "vacia.png"]
+    assert all(not r["success"] and r["error"] for r in results)
+    assert "falta.png" in results[0]["error"] and not results[0].get("reintentable")
+
+def test_worker_caido_da_error_solo_en_sus_imagenes(tmp_path):
+    sources = [("mata.png", None, KillsWorker()), ("despues.png", str(tmp_path / "despues.png"), None)]
+    # De a una en vuelo: la segunda imagen va a un pool nuevo
+    results = list(run_pool(sources, workers=1, ordered=True, max_in_flight=1))
+
+    assert [r["archivo"] for r in results] == ["mata.png", "despues.png"]
+    assert results[0]["error"].startswith("BrokenProcessPool") and results[0]["reintentable"]
+    assert "despues.png" in results[1]["error"] and not results[1].get("reintentable")
@@ -0,0 +1,118 @@
+"""Pruebas del clasificador de intenciones y de sus artefactos en models/.
+
+Uso:
+    python -m pytest -q test_classifier.py
+"""
+import os
+
+import pytest
+
+from benchmarks.bench_intent import generate_corpus
+from models.classifier import IntentClassifier
+from models.compiled_intent import CompiledIntentModel
+from models.hot_reload import ModelReloader
+from models.intent_router import IntentRouter
+
+@pytest.fixture(scope="module")
+def classifier():
+    classifier = IntentClassifier()
+    classifier.load_model()
+    return classifier
+
+def test_el_modelo_guardado_conoce_todas_las_categorias(classifier):
+    # Si cambian los datos de entrenamiento hay que regenerar intent_classifier.pkl/.npz en el mismo cambio
+    assert classifier.missing_categories() == []
+    _, y = classifier.create_training_data()
+    assert set(classifier.compiled.classes.tolist()) == set(y) == set(classifier.categories)
+
+def test_preguntas_analiticas_se_clasifican_como_analitica(classifier):
+    for pregunta in ["¿Cuál es el salario promedio por departamento?",
+                     "¿Cuál es la mediana de edad en Monterrey?",
+                     "¿Cuál es el percentil 90 de salario en IT?"]:
+        assert classifier.predict(pregunta)["categoria"] == "analitica"
+
+def test_la_recarga_rechaza_un_modelo_sin_categorias(tmp_path, monkeypatch):
+    stale = IntentClassifier(model_dir=str(tmp_path))
+    training_data = stale.create_training_data
+
+    def without_analytics():
+        X, y = training_data()
+        return [x for x, label in zip(X, y) if label != "analitica"], [l for l in y if l != "analitica"]
+
+    monkeypatch.setattr(stale, "create_training_data", without_analytics)
+    stale.train()
+    monkeypatch.undo()
+
+    assert stale.missing_categories() == ["analitica"]
+    with pytest.raises(ValueError, match="analitica"):
+        ModelReloader(model_set=None).validate_classifier(stale)
+
+def test_el_compilado_guardado_corresponde_al_pickle_guardado(classifier):
+    # Si se reentrena el .pkl hay que regenerar el .npz (python models/compiled_intent.py) en el mismo cambio
+    assert classifier.compiled.matches(classifier.model_path)
+
+def test_compilado_de_otro_pickle_no_se_usa_ni_se_reescribe(tmp_path):
+    trained = IntentClassifier(model_dir=str(tmp_path))
+    trained.train()
+    compiled_bytes = open(trained.compiled_path, 'rb').read()
+
+    # Otro pickle con el mismo modelo pero distinto contenido (p. ej. reentrenado sin recompilar)
+    with open(trained.model_path, 'ab') as f:
+        f.write(b'\0')
+
+    loaded = IntentClassifier(model_dir=str(tmp_path))
+    loaded.load_model()
+    assert loaded.compiled is None and loaded.pipeline is not None
+    assert loaded.predict("¿Cuántos empleados hay?")["categoria"] == "conteo"
+    assert open(trained.compiled_path, 'rb').read() == compiled_bytes
+
+def test_la_fecha_de_los_archivos_no_decide(tmp_path):
+    trained = IntentClassifier(model_dir=str(tmp_path))
+    trained.train()
+    # Un checkout puede dejar el .pkl más nuevo que el .npz
+    os.utime(trained.compiled_path, (0, 0))
+
+    loaded = IntentClassifier(model_dir=str(tmp_path))
+    loaded.load_model()
+    assert loaded.compiled is not None and loaded.pipeline is None
+
+def test_sin_paridad_se_entrena_y_arranca_con_scikit_learn(tmp_path, monkeypatch):
+    predict_proba = CompiledIntentModel.predict_proba
+    monkeypatch.setattr(CompiledIntentModel, "predict_proba", lambda self, texts: predict_proba(self, texts) + 1e-9)
+
+    # Sin .pkl, load_model entrena al arrancar: la exportación falla pero no el arranque
+    trained = IntentClassifier(model_dir=str(tmp_path))
+    trained.load_model()
+    assert trained.compiled is None and trained.pipeline is not None
+    assert not os.path.exists(trained.compiled_path)
+    assert trained.predict("¿Cuántos empleados hay?")["categoria"] == "conteo"
+
+    loaded = IntentClassifier(model_dir=str(tmp_path))
+    loaded.load_model()
+    assert loaded.compiled is None and loaded.pipeline is not None
+
+@pytest.fixture(scope="module")
+def routed(classifier):
+    """Preguntas generadas (huecos, plantillas, sin acentos, errores de tecleo) con la respuesta
+    del enrutador y la del modelo; no son las frases de entrenamiento que las reglas ya cubren"""
+    router = IntentRouter(classifier)
+    return [(pregunta, categoria, router.predict(pregunta), classifier.predict(pregunta))
+            for pregunta, categoria in generate_corpus(2000, seed=7)]
+
+def test_las_preguntas_sin_regla_reciben_la_respuesta_del_modelo(routed):
+    fallthrough = [(router, model) for _, _, router, model in routed if router["etapa"] == "modelo"]
+    # Los errores de tecleo y las variantes ambiguas tienen que llegar al modelo
+    assert len(fallthrough) >= 50
+    for router, model in fallthrough:
+        assert router == {**model, "etapa": "modelo"}
+
+def test_las_reglas_coinciden_con_el_modelo_salvo_cuando_el_modelo_falla(routed):
+    decided = [(categoria, router, model) for _, categoria, router, model in routed if router["etapa"] == "reglas"]
+    assert decided
+    for categoria, router, model in decided:
+        assert router["confianza"] is None and router["probabilidades"] is None
+        assert router["categoria"] in (model["categoria"], categoria)
+
+    router_hits = sum(router["categoria"] == categoria for _, categoria, router, _ in routed)
+    model_hits = sum(model["categoria"] == categoria for _, categoria, _, model in routed)
+    assert router_hits >= model_hits
@@ -0,0 +1,111 @@
+"""Pruebas del escritor único de SQLite (models/database.py).
+
+Uso:
+    python -m pytest -q test_database.py
+"""
+import sqlite3
+from concurrent.futures import Future
+
+import pytest
+
+from models import database
+from models.database import Database, DatabaseWriter
+
+def make_table(path):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (x INTEGER PRIMARY KEY)")
+    conn.commit()
+    conn.close()
+
+def insert(value):
+    return lambda conn: conn.execute("INSERT INTO t (x) VALUES (?)", (value,)).rowcount
+
+def rows(path):
+    conn = sqlite3.connect(path)
+    values = [row[0] for row in conn.execute("SELECT x FROM t ORDER BY x")]
+    conn.close()
+    return values
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "prueba.db")
+    make_table(path)
+    return path
+
+def writer_conn(path):
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    return database.configure_connection(conn)
+
+def test_una_escritura_fallida_no_arrastra_al_lote(db_path):
+    writer = DatabaseWriter(db_path)
+    conn = writer_conn(db_path)
+    batch = [(insert(1), Future()), (insert(1), Future()), (insert(2), Future())]
+    writer.commit_batch(conn, batch)
+
+    assert batch[0][1].result(timeout=1) == 1
+    with pytest.raises(sqlite3.IntegrityError):
+        batch[1][1].result(timeout=1)
+    assert batch[2][1].result(timeout=1) == 1
+    assert rows(db_path) == [1, 2]
+
+def test_fallo_al_abrir_la_transaccion_resuelve_todo_el_lote(db_path):
+    writer = DatabaseWriter(db_path)
+    conn = writer_conn(db_path)
+    # BEGIN IMMEDIATE falla dentro de una transacción ya abierta
+    conn.execute("BEGIN")
+    batch = [(insert(i), Future()) for i in range(3)]
+    writer.commit_batch(conn, batch)
+
+    for _, future in batch:
+        with pytest.raises(sqlite3.OperationalError):
+            future.result(timeout=1)
+    assert writer.get_stats()["errores"] == 3
+
+def test_fallo_a_mitad_de_lote_resuelve_las_anteriores_y_las_siguientes(db_path):
+    writer = DatabaseWriter(db_path)
+    conn = writer_conn(db_path)
+
+    def breaks_transaction(conn):
+        # Cierra la transacción del lote: el RELEASE del SAVEPOINT falla fuera del try interno
+        conn.execute("ROLLBACK")
+
+    batch = [(insert(1), Future()), (breaks_transaction, Future()), (insert(2), Future())]
+    writer.commit_batch(conn, batch)
+
+    for _, future in batch:
+        with pytest.raises(sqlite3.Error):
+            future.result(timeout=1)
+    assert rows(db_path) == []
+
+def test_las_canceladas_no_rompen_el_lote(db_path):
+    writer = DatabaseWriter(db_path)
+    conn = writer_conn(db_path)
+    cancelled = Future()
+    cancelled.cancel()
+    conn.execute("BEGIN")
+    batch = [(insert(1), cancelled), (insert(2), Future())]
+    writer.commit_batch(conn, batch)
+
+    assert cancelled.cancelled()
+    with pytest.raises(sqlite3.OperationalError):
+        batch[1][1].result(timeout=1)
+
+def test_base_bloqueada_devuelve_error_sin_colgar(db_path, monkeypatch):
+    monkeypatch.setattr(database, "BUSY_TIMEOUT_MS", 50)
+    db = Database(db_path)
+    db.enable_wal()
+    blocker = sqlite3.connect(db_path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        futures = [db.execute("INSERT INTO t (x) VALUES (?)", (i,)) for i in range(5)]
+        for future in futures:
+            with pytest.raises(sqlite3.OperationalError):
+                future.result(timeout=5)
+    finally:
+        blocker.execute("ROLLBACK")
+        blocker.close()
+
+    # El escritor sigue vivo después del fallo
+    assert db.execute("INSERT INTO t (x) VALUES (7)").result(timeout=5) == 1
+    db.close()
+    assert rows(db_path) == [7]
@@ -0,0 +1,75 @@
+"""Pruebas de la recarga en caliente (models/hot_reload.py): rechazo, activación y rollback.
+
+Uso:
+    python -m pytest -q test_hot_reload.py
+"""
+import shutil
+
+import pytest
+
+from models.hot_reload import PREDICTOR
+from models.regression import SalaryPredictor
+from models.tenancy import ModelSet
+
+MODEL_FILES = ["intent_classifier.pkl", "intent_classifier.npz", "salary_predictor.pkl",
+               "label_encoders.pkl", "scaler.pkl"]
+
+@pytest.fixture
+def model_set(tmp_path, empresa_db):
+    model_dir = tmp_path / "models"
+    model_dir.mkdir()
+    for name in MODEL_FILES:
+        shutil.copy(f"models/{name}", model_dir / name)
+    model_set = ModelSet("acme", empresa_db, str(model_dir))
+    model_set.load()
+    yield model_set
+    model_set.close()
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def test_un_modelo_roto_se_rechaza_y_se_restauran_sus_archivos(model_set):
+    reloader = model_set.reloader
+    active = model_set.salary_predictor
+    good = read(active.model_path)
+    version = reloader.get_versions()[PREDICTOR]["version"]
+
+    with open(active.model_path, 'wb') as f:
+        f.write(b"no es un pickle")
+    result = reloader.reload([PREDICTOR])[PREDICTOR]
+
+    assert result["estado"] == "revertido"
+    assert result["version"] == version
+    # Se sigue sirviendo el mismo objeto y el disco vuelve al modelo válido
+    assert model_set.salary_predictor is active
+    assert read(active.model_path) == good
+    assert read(f"{active.model_path}.rechazado") == b"no es un pickle"
+
+def test_rollback_vuelve_al_modelo_y_archivos_anteriores(model_set):
+    reloader = model_set.reloader
+    original = model_set.salary_predictor
+    original_files = {path: read(path) for path in reloader.artifacts(PREDICTOR)}
+    original_version = reloader.get_versions()[PREDICTOR]["version"]
+
+    # Un predictor nuevo (entrenado con los datos del tenant) escrito sobre los archivos activos
+    SalaryPredictor(db_path=model_set.db_path, model_dir=model_set.model_dir).train()
+    result = reloader.reload([PREDICTOR])[PREDICTOR]
+    assert result["estado"] == "activado" and result["version"] != original_version
+    assert model_set.salary_predictor is not original
+
+    version = reloader.rollback(PREDICTOR)
+    assert version["version"] == original_version and version["origen"] == "rollback"
+    assert model_set.salary_predictor is original
+    for path, data in original_files.items():
+        assert read(path) == data
+
+    # Solo se guarda una versión anterior
+    with pytest.raises(ValueError, match="anterior"):
+        reloader.rollback(PREDICTOR)
+
+def test_mismo_contenido_no_recarga(model_set):
+    active = model_set.salary_predictor
+    result = model_set.reloader.reload([PREDICTOR])[PREDICTOR]
+    assert result["estado"] == "sin_cambios"
+    assert model_set.salary_predictor is active
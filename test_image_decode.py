@@ -0,0 +1,70 @@
+"""Pruebas de la decodificación de imágenes y documentos (models/image_decode.py).
+
+Uso:
+    python -m pytest -q test_image_decode.py
+"""
+import io
+import struct
+
+import pytest
+from PIL import Image
+
+from models import image_decode
+from models.image_decode import decode_frames, decode_grayscale
+
+def gif_header(width, height):
+    """GIF mínimo que declara width x height: pocos bytes, la página entera solo al decodificar"""
+    return (b'GIF89a' + struct.pack('<HHBBB', width, height, 0, 0, 0)
+            + b',' + struct.pack('<HHHHB', 0, 0, width, height, 0) + b'\x02\x02\x44\x01\x00;')
+
+def encode(frames, fmt, **kwargs):
+    buffer = io.BytesIO()
+    frames[0].save(buffer, fmt, save_all=len(frames) > 1, append_images=frames[1:], **kwargs)
+    return buffer.getvalue()
+
+def test_tiff_multipagina_una_matriz_gris_por_pagina():
+    data = encode([Image.new('RGB', (400, 300), 'white') for _ in range(3)], 'TIFF')
+    frames = decode_frames(data)
+    assert [frame.shape for frame in frames] == [(300, 400)] * 3
+    assert all(frame.dtype.name == 'uint8' for frame in frames)
+
+def test_pagina_demasiado_grande_se_rechaza_antes_de_decodificar():
+    # La segunda página ocupa 81 MP; comprimida pesa poco
+    data = encode([Image.new('L', (400, 300), 255), Image.new('L', (9000, 9000), 255)], 'TIFF',
+                  compression='tiff_lzw')
+    with pytest.raises(ValueError, match="página 2"):
+        decode_frames(data)
+
+def test_demasiadas_paginas_se_rechazan():
+    data = encode([Image.new('L', (50, 50), 255) for _ in range(4)], 'TIFF')
+    with pytest.raises(ValueError, match="más de 3 páginas"):
+        decode_frames(data, max_frames=3)
+
+def test_png_demasiado_grande_se_rechaza():
+    data = encode([Image.new('L', (9000, 9000), 255)], 'PNG')
+    with pytest.raises(ValueError, match="9000x9000"):
+        decode_grayscale(data)
+
+def test_png_con_transparencia_se_compone_sobre_blanco():
+    image = Image.new('RGBA', (10, 10), (0, 0, 0, 0))
+    gray = decode_grayscale(encode([image], 'PNG'))
+    assert gray.shape == (10, 10) and gray.min() == 255
+
+@pytest.fixture
+def no_decode(monkeypatch):
+    """Fallar si se llega a decodificar: el límite se aplica antes, con la cabecera"""
+    def decode(*args, **kwargs):
+        raise AssertionError("se decodificó una imagen demasiado grande")
+    monkeypatch.setattr(image_decode.cv2, "imdecode", decode)
+    monkeypatch.setattr(image_decode, "decode_with_pil", decode)
+
+def test_tiff_de_una_pagina_demasiado_grande_se_rechaza(no_decode):
+    data = encode([Image.new('L', (9000, 9000), 255)], 'TIFF', compression='tiff_lzw')
+    with pytest.raises(ValueError, match="9000x9000"):
+        decode_grayscale(data)
+
+def test_gif_demasiado_grande_se_rechaza(no_decode):
+    data = gif_header(9000, 9000)
+    assert len(data) < 100
+    with pytest.raises(ValueError, match="9000x9000"):
+        decode_grayscale(data)
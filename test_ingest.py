@@ -0,0 +1,112 @@
+"""Pruebas de la ingesta masiva de tarjetas (models/ingest.py).
+
+Uso:
+    python -m pytest -q test_ingest.py
+"""
+import sqlite3
+
+import pytest
+
+from models.ingest import EmployeeIngestor, parse_amount, parse_id
+
+def employee(path, employee_id):
+    conn = sqlite3.connect(path)
+    row = conn.execute(
+        "SELECT nombre, departamento, salario, edad, ciudad, experiencia_anos, nivel_educacion, fecha_ingreso "
+        "FROM empleados WHERE id = ?", (employee_id,)
+    ).fetchone()
+    conn.close()
+    return row
+
+NEW_CARD = {'id': '1000', 'nombre': 'ana prueba', 'departamento': 'IT', 'salario': '$45,000', 'edad': '30',
+            'ciudad': 'Monterrey', 'experiencia_anos': '5 años', 'nivel_educacion': 'Maestría'}
+
+@pytest.mark.parametrize("texto, valor", [
+    ("45.000", 45000),
+    ("$45,000", 45000),
+    ("1.250.000", 1250000),
+    ("1,250,000.50", 1250000),
+    ("45.000,75", 45001),
+    ("45000", 45000),
+    ("45,000.", 45000),
+    ("30 años", 30),
+])
+def test_parse_amount_separadores_de_miles_y_decimales(texto, valor):
+    assert parse_amount(texto) == valor
+
+@pytest.mark.parametrize("texto", ["", "abc", "4.50.00", "12.3456", "1.250,000"])
+def test_parse_amount_rechaza_cifras_mal_formadas(texto):
+    assert parse_amount(texto) is None
+
+@pytest.mark.parametrize("texto, valor", [("12", 12), (" 7 ", 7), (1000, 1000), ("12.5", None), ("A-7", None),
+                                          ("1,000", None), ("-3", None), ("", None), ("7\nJuan", None)])
+def test_parse_id_solo_admite_digitos(texto, valor):
+    assert parse_id(texto) == valor
+
+def test_salario_con_punto_de_miles_no_se_trunca():
+    row = EmployeeIngestor().normalize_card({**NEW_CARD, 'salario': '45.000'})
+    assert row['salario'] == 45000
+
+@pytest.mark.parametrize("col, texto", [("salario", "45"), ("edad", "300"), ("experiencia_anos", "120")])
+def test_valores_fuera_de_rango_se_rechazan(col, texto):
+    with pytest.raises(ValueError, match="fuera de rango"):
+        EmployeeIngestor().normalize_card({**NEW_CARD, col: texto})
+
+def test_insercion_y_actualizacion_parcial_conservan_columnas(empresa_db):
+    before = employee(empresa_db, 1)
+    ingestor = EmployeeIngestor(db_path=empresa_db)
+    summary = ingestor.ingest([
+        NEW_CARD,
+        # Actualización parcial: solo cambia el salario, el resto se conserva (COALESCE)
+        {'id': '1', 'salario': '99.000'},
+    ])
+
+    assert summary['insertados'] == 1
+    assert summary['actualizados'] == 1
+    assert summary['ids_actualizados'] == [1]
+    assert summary['rechazados'] == 0
+
+    after = employee(empresa_db, 1)
+    assert after[2] == 99000
+    assert after[:2] == before[:2] and after[3:] == before[3:]
+
+    nuevo = employee(empresa_db, 1000)
+    assert nuevo[:7] == ('Ana Prueba', 'IT', 45000, 30, 'Monterrey', 5, 'Maestría')
+    assert nuevo[7]  # fecha_ingreso por defecto: hoy
+
+def test_empleado_nuevo_incompleto_se_rechaza_sin_afectar_al_lote(empresa_db):
+    summary = EmployeeIngestor(db_path=empresa_db).ingest([
+        {'id': '2000', 'nombre': 'Sin Datos'},
+        {'id': 'sin número'},
+        {**NEW_CARD, 'id': '2001'},
+    ])
+
+    assert summary['insertados'] == 1
+    assert summary['rechazados'] == 2
+    assert [e['indice'] for e in summary['errores']] == [0, 1]
+    assert employee(empresa_db, 2000) is None
+    assert employee(empresa_db, 2001) is not None
+
+def test_ids_con_otros_caracteres_se_rechazan_por_fila(empresa_db):
+    before = [employee(empresa_db, 125), employee(empresa_db, 7)]
+    summary = EmployeeIngestor(db_path=empresa_db).ingest([
+        {**NEW_CARD, 'id': '12.5'},
+        {**NEW_CARD, 'id': 'A-7'},
+        {**NEW_CARD, 'id': '4000'},
+    ])
+
+    assert summary['insertados'] == 1 and summary['actualizados'] == 0
+    assert [(e['indice'], e['motivo']) for e in summary['errores']] == [
+        (0, "ID no numérico: 12.5"), (1, "ID no numérico: A-7")]
+    # Ni el 125 ni el 7 (que ya existe) se tocan
+    assert [employee(empresa_db, 125), employee(empresa_db, 7)] == before
+    assert employee(empresa_db, 4000) is not None
+
+def test_misma_tarjeta_dos_veces_en_un_lote(empresa_db):
+    summary = EmployeeIngestor(db_path=empresa_db).ingest([
+        {**NEW_CARD, 'id': '3000'},
+        {'id': '3000', 'edad': '31'},
+    ])
+
+    assert (summary['insertados'], summary['actualizados']) == (1, 1)
+    assert employee(empresa_db, 3000)[3] == 31
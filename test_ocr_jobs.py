@@ -0,0 +1,144 @@
+"""Pruebas de los callbacks de los trabajos OCR asíncronos (models/ocr_jobs.py).
+
+Uso:
+    python -m pytest -q test_ocr_jobs.py
+"""
+import contextlib
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from models import ocr_jobs
+from models.ocr_jobs import OCRJobQueue, check_callback_url
+
+def resolves_to(monkeypatch, *addresses):
+    """Hacer que cualquier host resuelva a estas direcciones"""
+    def getaddrinfo(host, port, *args, **kwargs):
+        return [(socket.AF_INET6 if ':' in a else socket.AF_INET, socket.SOCK_STREAM, 6, '', (a, port))
+                for a in addresses]
+    monkeypatch.setattr(ocr_jobs.socket, "getaddrinfo", getaddrinfo)
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1/hook",
+    "http://localhost:8000/hook",
+    "http://10.0.0.5/hook",
+    "http://192.168.1.10/hook",
+    "http://169.254.169.254/latest/meta-data",
+    "http://[::1]/hook",
+    "http://0.0.0.0/hook",
+    "ftp://cliente.example.com/hook",
+    "http:///hook",
+    "http://cliente.example.com:99999/hook",
+])
+def test_callbacks_a_direcciones_internas_se_rechazan(url):
+    with pytest.raises(ValueError):
+        check_callback_url(url)
+
+def test_host_que_resuelve_a_una_red_privada_se_rechaza(monkeypatch):
+    resolves_to(monkeypatch, "93.184.216.34", "10.1.2.3")
+    with pytest.raises(ValueError, match="no pública"):
+        check_callback_url("https://cliente.example.com/hook")
+
+def test_host_publico_se_admite(monkeypatch):
+    resolves_to(monkeypatch, "93.184.216.34")
+    assert check_callback_url("https://cliente.example.com/hook")
+
+def test_lista_de_hosts_permitidos():
+    assert check_callback_url("http://127.0.0.1:9000/hook", ["127.0.0.1"])
+    assert check_callback_url("http://hooks.interno.example.com/x", [".interno.example.com"])
+    with pytest.raises(ValueError):
+        check_callback_url("http://169.254.169.254/", [".interno.example.com"])
+
+class Receiver(BaseHTTPRequestHandler):
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        # Un cliente lento: el trabajador OCR no debe esperarlo
+        time.sleep(0.3)
+        Receiver.received.append(json.loads(body))
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def receiver():
+    Receiver.received = []
+    server = HTTPServer(("127.0.0.1", 0), Receiver)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/ocr-listo"
+    server.shutdown()
+    server.server_close()
+
+class BrokenOCR:
+    def process_image_bytes(self, image_data, adaptive=False):
+        raise ValueError("imagen ilegible")
+
+@contextlib.contextmanager
+def fake_models(tenant):
+    yield type("Models", (), {"ocr_processor": BrokenOCR()})()
+
+@pytest.fixture
+def jobs(tmp_path):
+    jobs = OCRJobQueue(fake_models, db_path=str(tmp_path / "ocr_jobs.db"), poll_interval=0.05,
+                       callback_hosts=["127.0.0.1"])
+    yield jobs
+    jobs.stop()
+
+def wait_for(condition, timeout=5):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+def test_el_callback_se_envia_desde_otro_hilo(jobs, receiver):
+    jobs.start()
+    job_id = jobs.submit(b"no es una imagen", callback_url=receiver)
+
+    # El trabajo termina sin esperar al cliente lento
+    assert wait_for(lambda: jobs.get(job_id)["estado"] == ocr_jobs.FAILED)
+    assert jobs.get(job_id)["callback"]["estado"] == ocr_jobs.CALLBACK_PENDING
+
+    assert wait_for(lambda: jobs.get(job_id)["callback"]["estado"] == "enviado (204)")
+    assert Receiver.received == [{"job_id": job_id, "estado": "fallido", "resultado": None,
+                                  "error": "imagen ilegible"}]
+
+def test_se_vuelve_a_comprobar_la_direccion_al_enviar(jobs, monkeypatch):
+    jobs.open()
+    resolves_to(monkeypatch, "93.184.216.34")
+    url = "http://cliente.example.com/hook"
+    check_callback_url(url)
+
+    # El DNS cambia entre el POST y el envío (DNS rebinding)
+    resolves_to(monkeypatch, "127.0.0.1")
+    estado = jobs.send_callback(url, {"job_id": "x"})
+    assert estado.startswith("error:") and "no pública" in estado
+    assert jobs.get_stats()["callbacks_fallidos"] == 1
+
+def test_callbacks_sin_enviar_se_reenvian_al_arrancar(tmp_path, receiver):
+    db_path = str(tmp_path / "ocr_jobs.db")
+    first = OCRJobQueue(fake_models, db_path=db_path, callback_hosts=["127.0.0.1"])
+    first.open()
+    job_id = first.submit(b"x", callback_url=receiver)
+    jobs = first.claim(1)
+    outcomes = [first.process(job) for job in jobs]
+    first.complete(outcomes)
+    # El proceso se detiene antes de que salga el callback
+    first.stop()
+
+    second = OCRJobQueue(fake_models, db_path=db_path, callback_hosts=["127.0.0.1"])
+    try:
+        second.start()
+        assert wait_for(lambda: second.get(job_id)["callback"]["estado"] == "enviado (204)")
+        assert [payload["job_id"] for payload in Receiver.received] == [job_id]
+    finally:
+        second.stop()
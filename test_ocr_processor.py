@@ -0,0 +1,22 @@
+"""Pruebas del OCR adaptativo (models/ocr_processor.py) con el motor de prueba, sin Tesseract.
+
+Uso:
+    python -m pytest -q test_ocr_processor.py
+"""
+import numpy as np
+
+from models.ocr_engine import FakeOCREngine
+from models.ocr_processor import ESCALATION_LADDER, OCRProcessor
+
+def test_por_etapa_cuenta_la_etapa_del_resultado_devuelto():
+    # La primera etapa lee id y nombre; las demás no leen nada, así que se prueban todas
+    engine = FakeOCREngine(["ID: 123\nNombre: Ana Prueba"] + [""] * (len(ESCALATION_LADDER) - 1))
+    processor = OCRProcessor(engine=engine)
+
+    result = processor.extract_adaptive(np.full((60, 200), 255, dtype=np.uint8))
+
+    first, last = ESCALATION_LADDER[0][0], ESCALATION_LADDER[-1][0]
+    assert result["etapa"] == first and result["intentos"] == len(ESCALATION_LADDER)
+    stats = processor.get_adaptive_stats()
+    assert stats["por_etapa"][first] == 1 and stats["por_etapa"][last] == 0
+    assert stats["escaladas"] == 1
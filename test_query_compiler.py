@@ -0,0 +1,53 @@
+"""Pruebas de las consultas con filtros compuestos (models/query_compiler.py).
+
+Uso:
+    python -m pytest -q test_query_compiler.py
+"""
+import sqlite3
+
+import pytest
+
+from models import ingest
+from models.database import get_database
+from models.ingest import EmployeeIngestor
+from models.query_compiler import describe_filters, ensure_indexes, parse_filter_question
+
+@pytest.mark.parametrize("pregunta, texto", [
+    ("¿Cuántos ganan al menos 50000?", "con salario de al menos $50,000"),
+    ("¿Cuántos ganan más de 50000?", "con salario de al menos $50,001"),
+    ("¿Cuántos tienen como máximo 30 años?", "con edad de como máximo 30 años"),
+    ("¿Cuántos tienen menos de 30 años?", "con edad de como máximo 29 años"),
+    ("¿Cuántos ganan entre 30,000 y 45 mil pesos?", "con salario entre $30,000 y $45,000"),
+])
+def test_los_rangos_se_describen_con_sus_extremos(pregunta, texto):
+    assert describe_filters(parse_filter_question(pregunta)) == texto
+
+def stats_rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+    finally:
+        conn.close()
+
+def test_analyze_solo_al_crear_los_indices(empresa_db):
+    db = get_database(empresa_db)
+    assert len(ensure_indexes(db)) == 6
+    assert stats_rows(empresa_db) > 0
+
+    # En el siguiente arranque los índices ya existen y no se rehacen estadísticas
+    db.execute("DELETE FROM sqlite_stat1").result(timeout=5)
+    assert ensure_indexes(db) == []
+    assert stats_rows(empresa_db) == 0
+
+def test_ingesta_grande_rehace_las_estadisticas(empresa_db, monkeypatch):
+    card = {'nombre': 'Ana Prueba', 'departamento': 'IT', 'salario': '45000', 'edad': '30',
+            'ciudad': 'Monterrey', 'experiencia_anos': '5', 'nivel_educacion': 'Maestría'}
+    monkeypatch.setattr(ingest, "ANALYZE_MIN_FILAS", 3)
+
+    EmployeeIngestor(db_path=empresa_db).ingest([{**card, 'id': '1000'}, {**card, 'id': '1001'}])
+    assert stats_rows(empresa_db) == 0
+
+    EmployeeIngestor(db_path=empresa_db).ingest([{**card, 'id': str(i)} for i in range(2000, 2003)])
+    assert stats_rows(empresa_db) > 0
@@ -0,0 +1,125 @@
+"""Pruebas de la tabla repartida en shards (models/sharding.py): mismos resultados que con un solo archivo.
+
+Uso:
+    python -m pytest -q test_sharding.py
+"""
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+from create_database import create_sharded_database
+from models.analytics import EmployeeColumnStore
+from models.export import build_export_query, iter_row_chunks, iter_shard_row_chunks
+from models.query_compiler import QueryCompiler, parse_filter_question
+from models.regression import SalaryPredictor
+from models.sharding import PARTITION_DEPARTMENT, PARTITION_HASH, ShardedEmployeeStore
+from models.tenancy import ModelSet
+from models.warmup import warm_database
+
+MODEL_FILES = ["intent_classifier.pkl", "intent_classifier.npz", "salary_predictor.pkl",
+               "label_encoders.pkl", "scaler.pkl"]
+
+@pytest.fixture(params=[PARTITION_HASH, PARTITION_DEPARTMENT])
+def shards(request, tmp_path, empleados):
+    """Los mismos empleados que empresa_db (ids 1..200) repartidos en 3 shards"""
+    directory = str(tmp_path / "shards")
+    create_sharded_database(directory, empleados, 3, request.param)
+    store = ShardedEmployeeStore.open(directory)
+    yield store
+    store.close()
+
+def single(path, sql, params=()):
+    conn = sqlite3.connect(path)
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+    return rows
+
+def test_agregados_exactos(shards, empresa_db):
+    summary = shards.summary()
+    expected = single(empresa_db, "SELECT COUNT(*), AVG(edad), AVG(salario), AVG(experiencia_anos), "
+                                  "MIN(salario), MAX(salario) FROM empleados")[0]
+    assert (summary["total"], summary["salario_min"], summary["salario_max"]) == (expected[0], expected[4], expected[5])
+    assert summary["edad_promedio"] == pytest.approx(expected[1])
+    assert summary["salario_promedio"] == pytest.approx(expected[2])
+    assert summary["exp_promedio"] == pytest.approx(expected[3])
+
+    by_department = single(empresa_db, "SELECT departamento, COUNT(*), AVG(salario), AVG(edad) FROM empleados "
+                                       "GROUP BY departamento ORDER BY departamento")
+    assert [row[:2] for row in shards.by_department()] == [row[:2] for row in by_department]
+    for merged, expected in zip(shards.by_department(), by_department):
+        assert merged[2:] == pytest.approx(expected[2:])
+
+def test_maximo_y_minimo_con_desempate_por_id(shards, empresa_db):
+    assert shards.top("salario") == single(
+        empresa_db, "SELECT nombre, departamento, salario FROM empleados ORDER BY salario DESC, id LIMIT 1")[0]
+    assert shards.top("edad", descending=False, columns="nombre, edad, departamento") == single(
+        empresa_db, "SELECT nombre, edad, departamento FROM empleados ORDER BY edad, id LIMIT 1")[0]
+
+def test_conteos_con_filtros(shards, empresa_db):
+    compiler = QueryCompiler()
+    conn = sqlite3.connect(empresa_db)
+    for pregunta in ["¿Cuántos empleados de IT ganan más de 50000?",
+                     "¿Cuántos tienen al menos 5 años de experiencia en Monterrey?",
+                     "¿Cuántos ganan entre 30,000 y 45 mil pesos?"]:
+        filtros = parse_filter_question(pregunta)
+        assert shards.count_filtered(compiler, filtros) == compiler.count(conn, filtros)
+    conn.close()
+
+def test_filas_en_orden_de_id(shards, empresa_db):
+    columns = "edad, experiencia_anos, departamento, nivel_educacion, salario"
+    expected = single(empresa_db, f"SELECT {columns} FROM empleados ORDER BY id")
+    assert shards.ordered(columns) == expected
+    assert shards.ordered(columns, limit=7) == expected[:7]
+
+def test_entrenamiento_lee_lo_mismo_que_con_un_archivo(shards, empresa_db):
+    sharded = SalaryPredictor(db_path=empresa_db, shards=shards).load_data()
+    assert sharded.equals(SalaryPredictor(db_path=empresa_db).load_data())
+
+def test_almacen_analitico_junta_los_shards(shards, empresa_db):
+    sharded = EmployeeColumnStore(db_path="no-existe.db", shards=shards)
+    single_file = EmployeeColumnStore(db_path=empresa_db)
+    try:
+        assert sharded.refresh() == single_file.refresh() == 200
+        assert sharded.group_by("salario", "departamento") == single_file.group_by("salario", "departamento")
+        assert sharded.percentiles("edad", agrupar_por="ciudad") == single_file.percentiles("edad", agrupar_por="ciudad")
+
+        # Una fila nueva en un shard se ve en el siguiente refresh incremental
+        shards.write(0, lambda conn: conn.execute(
+            "INSERT INTO empleados (id, nombre, departamento, salario, edad, ciudad, experiencia_anos, "
+            "nivel_educacion, fecha_ingreso) VALUES (1000, 'Ana', 'IT', 50000, 30, 'Monterrey', 5, "
+            "'Maestría', '2024-01-01')"
+        )).result(timeout=5)
+        assert sharded.refresh() == 201
+        assert sharded.columns["id"][-1] == 1000
+    finally:
+        sharded.close()
+        single_file.close()
+
+def test_exportacion_intercala_los_shards_en_orden(shards, empresa_db):
+    for filtros in [{}, {"departamento": "it"}]:
+        sql, params, columnas = build_export_query(filtros, ["nombre", "salario"])
+        expected = [row for chunk in iter_row_chunks(sql, params, 50, empresa_db) for row in chunk]
+        sql, params, _ = build_export_query(filtros, ["nombre", "salario"], with_id=True)
+        chunks = list(iter_shard_row_chunks(sql, params, shards, 50))
+        assert [row for chunk in chunks for row in chunk] == expected
+        assert all(len(chunk) <= 50 for chunk in chunks)
+
+def test_tenant_solo_con_shards_no_usa_empresa_db(tmp_path, empleados):
+    root = tmp_path / "acme"
+    (root / "models").mkdir(parents=True)
+    for name in MODEL_FILES:
+        shutil.copy(f"models/{name}", root / "models" / name)
+    create_sharded_database(str(root / "shards"), empleados, 2, PARTITION_HASH)
+    db_path = str(root / "empresa.db")
+
+    model_set = ModelSet("acme", db_path, str(root / "models"))
+    try:
+        model_set.load()
+        assert len(model_set.employee_store) == 200
+        assert warm_database(model_set)["filas"] == 200
+        assert model_set.reloader.validate_predictor(model_set.salary_predictor)["empleados"] > 0
+    finally:
+        model_set.close()
+    assert not os.path.exists(db_path)
@@ -0,0 +1,156 @@
+"""Pruebas de la coalescencia (models/singleflight.py) y de los plazos por petición (models/deadline.py).
+
+Uso:
+    python -m pytest -q test_singleflight.py
+"""
+import asyncio
+import sqlite3
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from models import deadline
+from models.deadline import DeadlineExceeded, DeadlineMiddleware, RequestDeadline, current_deadline
+from models.singleflight import SingleFlight
+
+def with_deadline(timeout, route_timeout=None):
+    """Plazo como lo fija DeadlineMiddleware: X-Request-Timeout acorta el de la ruta"""
+    request = RequestDeadline(timeout)
+    if route_timeout is not None:
+        request.budget = RequestDeadline(route_timeout)
+    return request
+
+async def call(flight, key, fn, request_deadline=None):
+    token = current_deadline.set(request_deadline)
+    try:
+        return await flight.do(key, fn)
+    finally:
+        current_deadline.reset(token)
+
+def test_llamadas_iguales_comparten_una_ejecucion():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"valor": 42}
+
+    async def main():
+        flight = SingleFlight("prueba")
+        results = await asyncio.gather(*[flight.do("k", work) for _ in range(5)])
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert calls == [1]
+    assert all(result is results[0] for result in results)
+    assert flight.get_stats()["coalescidas"] == 4 and flight.get_stats()["en_curso"] == 0
+
+def test_cancelar_un_solicitante_no_cancela_el_trabajo_compartido():
+    async def work():
+        await asyncio.sleep(0.1)
+        return "listo"
+
+    async def main():
+        flight = SingleFlight("prueba")
+        first = asyncio.ensure_future(flight.do("k", work))
+        second = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "listo"
+
+def test_agotar_la_espera_de_coalescencia_no_corta_al_resto():
+    async def work():
+        await asyncio.sleep(0.1)
+        return "listo"
+
+    async def main():
+        short = SingleFlight("prueba", timeout=0.01)
+        waiting = asyncio.ensure_future(short.do("k", work))
+        await asyncio.sleep(0)
+        # Otro solicitante de la misma ejecución que sí espera hasta el final
+        task = short.inflight["k"]
+        with pytest.raises(asyncio.TimeoutError) as error:
+            await waiting
+        assert not isinstance(error.value, DeadlineExceeded)
+        return await task, short.get_stats()["timeouts"]
+
+    assert asyncio.run(main()) == ("listo", 1)
+
+def test_el_trabajo_compartido_no_hereda_el_plazo_del_cliente():
+    seen = []
+
+    async def work():
+        seen.append(current_deadline.get())
+        await asyncio.sleep(0.1)
+        return "listo"
+
+    async def main():
+        flight = SingleFlight("prueba")
+        impatient = with_deadline(0.02, route_timeout=5)
+        patient = with_deadline(5)
+        leader = asyncio.ensure_future(call(flight, "k", work, impatient))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(call(flight, "k", work, patient))
+        with pytest.raises(DeadlineExceeded) as error:
+            await leader
+        return impatient, error.value, await follower
+
+    impatient, error, result = asyncio.run(main())
+    # Quien llegó primero con un plazo corto se va con 504, el trabajo sigue para los demás
+    assert error.stage == "coalescencia" and impatient.cancelled == "coalescencia"
+    assert result == "listo"
+    assert seen == [impatient.budget]
+
+def test_plazo_de_la_ruta_agotado_en_el_trabajo_compartido_corta_a_todos():
+    def interrupted_query():
+        conn = sqlite3.connect(":memory:")
+        conn.set_progress_handler(deadline.sqlite_progress_handler, 1)
+        # Vence a mitad de la consulta
+        current_deadline.get().expires = 0
+        conn.execute("SELECT 1").fetchone()
+
+    async def main():
+        flight = SingleFlight("prueba")
+        request = with_deadline(5)
+        with pytest.raises(DeadlineExceeded) as error:
+            await call(flight, "k", interrupted_query, request)
+        return request, error.value
+
+    request, error = asyncio.run(main())
+    assert error.stage == "sqlite" and request.cancelled == "sqlite"
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(DeadlineMiddleware, timeouts={"ligera": 5.0}, routes={"/lenta": "ligera"})
+    flight = SingleFlight("prueba", timeout=30)
+
+    async def slow():
+        await asyncio.sleep(0.3)
+        return {"ok": True}
+
+    @app.get("/lenta")
+    async def lenta():
+        # Igual que los endpoints de main.py: la espera agotada responde 504
+        try:
+            return await flight.do("k", slow)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Tiempo de espera agotado")
+
+    with TestClient(app) as client:
+        yield client
+
+def test_plazo_del_cliente_agotado_responde_504_con_la_etapa(client):
+    response = client.get("/lenta", headers={"X-Request-Timeout": "0.05"})
+    assert response.status_code == 504
+    assert response.json()["etapa"] == "coalescencia"
+    assert response.json()["plazo_segundos"] == 0.05
+
+def test_sin_cabecera_se_usa_el_plazo_de_la_ruta(client):
+    response = client.get("/lenta")
+    assert response.status_code == 200 and response.json() == {"ok": True}
@@ -0,0 +1,94 @@
+"""Pruebas del registro de tenants: LRU, fijado por petición y current() sin cargas.
+
+Uso:
+    python -m pytest -q test_tenancy.py
+"""
+import asyncio
+import shutil
+
+import pytest
+
+from models.tenancy import TenantLease, TenantRegistry, current_lease, current_tenant
+
+MODEL_FILES = ["intent_classifier.pkl", "intent_classifier.npz", "salary_predictor.pkl",
+               "label_encoders.pkl", "scaler.pkl"]
+
+@pytest.fixture
+def registry(tmp_path, empresa_db):
+    # Tres empresas con la misma base de datos y los modelos ya entrenados del repositorio
+    for tenant in ("acme", "globex", "initech"):
+        root = tmp_path / "tenants" / tenant
+        (root / "models").mkdir(parents=True)
+        shutil.copy(empresa_db, root / "empresa.db")
+        for name in MODEL_FILES:
+            shutil.copy(f"models/{name}", root / "models" / name)
+    registry = TenantRegistry(base_dir=str(tmp_path / "tenants"), max_tenants=1)
+    yield registry
+    registry.close_all()
+
+def in_request(tenant, fn):
+    """Ejecutar fn() como lo haría un endpoint detrás de TenantMiddleware"""
+    async def request():
+        lease = TenantLease()
+        tenant_token = current_tenant.set(tenant)
+        lease_token = current_lease.set(lease)
+        try:
+            return await fn()
+        finally:
+            current_lease.reset(lease_token)
+            current_tenant.reset(tenant_token)
+            lease.release()
+    return asyncio.run(request())
+
+def test_acquire_fija_el_modelset_hasta_terminar_la_peticion(registry):
+    async def endpoint():
+        first = await registry.acquire()
+        again = await registry.acquire()
+        assert again is first and first.refs == 1
+        # current() devuelve el mismo objeto sin buscar ni cargar
+        assert registry.current() is first
+        return first
+
+    model_set = in_request("acme", endpoint)
+    assert model_set.refs == 0
+
+def test_no_se_desaloja_un_tenant_con_peticiones_en_curso(registry):
+    acme = registry.get("acme", pin=True)
+    # max_tenants=1: cargar otro tenant desalojaría a acme si no estuviera fijado
+    globex = registry.get("globex")
+    assert registry.loaded() == [acme, globex]
+    assert registry.stats["desalojos"] == 0
+    assert acme.db.get_writer() is not None
+
+    # Al soltarlo se vuelve a aplicar el límite: sale el menos usado
+    registry.release(acme)
+    assert registry.loaded() == [globex]
+    assert registry.stats["desalojos"] == 1
+
+def test_hold_para_hilos_fuera_de_una_peticion(registry):
+    with registry.hold("acme") as acme:
+        assert acme.refs == 1
+        registry.get("globex")
+        assert acme in registry.loaded()
+    assert acme not in registry.loaded()
+
+def test_current_nunca_carga_un_tenant(registry):
+    token = current_tenant.set("initech")
+    try:
+        with pytest.raises(RuntimeError):
+            registry.current()
+    finally:
+        current_tenant.reset(token)
+    assert registry.stats["cargas"] == 0
+
+def test_la_peticion_conserva_su_modelset_aunque_otro_tenant_llene_el_lru(registry):
+    async def endpoint():
+        acme = await registry.acquire()
+        # Otra petición carga un segundo tenant mientras esta sigue en curso
+        await asyncio.get_running_loop().run_in_executor(None, registry.get, "globex")
+        assert registry.current() is acme
+        assert acme in registry.loaded()
+        return acme
+
+    acme = in_request("acme", endpoint)
+    assert acme not in registry.loaded()